@@ -0,0 +1,55 @@
+"""
+Mede o backtest vetorizado da carteira sobre um universo sintético.
+
+Os sinais vêm do pipeline real: indicadores em painel e regras compiladas
+avaliadas sobre as matrizes (ações × barras).
+
+Uso:
+    python benchmarks/bench_backtest.py [--anos 10] [--acoes 100] [--repeticoes 5]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from bench_kernel import medir
+from sintetico import gerar_ohlcv
+from trade_bot.config import PARAMS
+from trade_bot.src.backtest import executar_carteira
+from trade_bot.src.painel import montar_painel, calcular_indicadores_painel
+from trade_bot.src.strategy import calcular_sinais, PROGRAMA
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--anos', type=int, default=10)
+    parser.add_argument('--acoes', type=int, default=100)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    barras = args.anos * 252
+    painel = montar_painel({f'ACAO{i}': gerar_ohlcv(barras, semente=i) for i in range(args.acoes)})
+    indicadores = calcular_indicadores_painel(painel)
+    colunas = {col: indicadores[col] if col in indicadores else painel[col] for col in PROGRAMA.colunas(PARAMS)}
+    sinais = calcular_sinais(colunas).astype(np.int8)
+
+    casos = [
+        ('sinais (regras)', lambda: calcular_sinais(colunas)),
+        ('carteira, fixa', lambda: executar_carteira(painel.acoes, painel.datas, painel['Close'], sinais)),
+        ('carteira, ativos+vendido', lambda: executar_carteira(painel.acoes, painel.datas, painel['Close'], sinais,
+                                                              alocacao='ativos', peso_maximo=0.1, vendido=True)),
+    ]
+
+    print(f"{args.acoes} ações × {barras} barras, melhor de {args.repeticoes} execuções")
+    print(f"{'caso':<28}{'tempo (ms)':>12}{'pico (KiB)':>14}")
+    for nome, funcao in casos:
+        tempo, pico = medir(funcao, args.repeticoes)
+        print(f"{nome:<28}{tempo:>12.2f}{pico:>14.0f}")
+
+    resultado = executar_carteira(painel.acoes, painel.datas, painel['Close'], sinais)
+    print(resultado.resumo())
+
+if __name__ == '__main__':
+    main()
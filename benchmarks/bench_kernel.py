@@ -0,0 +1,116 @@
+"""
+Compara o kernel de indicadores com a implementação anterior em pandas.
+
+Mede tempo de execução e pico de memória alocada (tracemalloc) do cálculo dos
+indicadores de processar_dados para uma ação e para o universo em painel.
+
+Uso:
+    python benchmarks/bench_kernel.py [--barras 500] [--acoes 100] [--repeticoes 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sintetico import gerar_ohlcv
+from trade_bot.src.data_pipeline import processar_dados
+from trade_bot.src.painel import processar_painel
+
+def processar_dados_pandas(dados):
+    """Cálculo dos indicadores como era feito em processar_dados antes do kernel"""
+    df = dados.copy()
+
+    df['trend_sma_fast'] = df['Close'].rolling(window=20, min_periods=1).mean()
+    df['trend_sma_slow'] = df['Close'].rolling(window=50, min_periods=1).mean()
+
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
+    loss = loss.replace(0, np.inf)
+    rs = gain / loss
+    df['momentum_rsi'] = 100 - (100 / (1 + rs))
+
+    ema12 = df['Close'].ewm(span=12, adjust=False, min_periods=1).mean()
+    ema26 = df['Close'].ewm(span=26, adjust=False, min_periods=1).mean()
+    df['trend_macd'] = ema12 - ema26
+    df['trend_macd_signal'] = df['trend_macd'].ewm(span=9, adjust=False, min_periods=1).mean()
+    df['trend_macd_hist'] = df['trend_macd'] - df['trend_macd_signal']
+
+    sma20 = df['Close'].rolling(window=20, min_periods=1).mean()
+    std20 = df['Close'].rolling(window=20, min_periods=1).std()
+    df['trend_bb_upper'] = sma20 + (std20 * 2)
+    df['trend_bb_lower'] = sma20 - (std20 * 2)
+
+    df['volume_ma20'] = df['Volume'].rolling(window=20, min_periods=1).mean()
+    volume_ma = df['volume_ma20'].replace(0, 1)
+    df['volume_rel'] = df['Volume'] / volume_ma
+
+    tr1 = df['High'] - df['Low']
+    tr2 = abs(df['High'] - df['Close'].shift())
+    tr3 = abs(df['Low'] - df['Close'].shift())
+    tr = pd.DataFrame({'tr1': tr1, 'tr2': tr2, 'tr3': tr3}).max(axis=1)
+    up_move = df['High'].diff()
+    down_move = df['Low'].shift() - df['Low']
+    pos_dm = up_move.where((up_move > down_move) & (up_move > 0), 0)
+    neg_dm = down_move.where((down_move > up_move) & (down_move > 0), 0)
+    periodo = 14
+    tr14 = tr.ewm(alpha=1/periodo, min_periods=periodo).mean()
+    pos_dm14 = pos_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
+    neg_dm14 = neg_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
+    pos_di14 = 100 * pos_dm14 / tr14
+    neg_di14 = 100 * neg_dm14 / tr14
+    dx = 100 * abs(pos_di14 - neg_di14) / (pos_di14 + neg_di14)
+    df['trend_adx'] = dx.ewm(alpha=1/periodo, min_periods=periodo).mean()
+
+    return df.dropna()
+
+def medir(funcao, repeticoes):
+    """Retorna (melhor tempo em ms, pico de memória alocada em KiB)"""
+    tempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcao()  # aquecimento
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+
+        tracemalloc.start()
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return min(tempos) * 1000, pico / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--barras', type=int, default=500)
+    parser.add_argument('--acoes', type=int, default=100)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    dados = gerar_ohlcv(args.barras)
+    universo = {f'ACAO{i}': gerar_ohlcv(args.barras, semente=i) for i in range(args.acoes)}
+
+    casos = [
+        ('1 ação, pandas', lambda: processar_dados_pandas(dados)),
+        ('1 ação, kernel', lambda: processar_dados(dados)),
+        (f'{args.acoes} ações, pandas', lambda: [processar_dados_pandas(df) for df in universo.values()]),
+        (f'{args.acoes} ações, kernel', lambda: [processar_dados(df) for df in universo.values()]),
+        (f'{args.acoes} ações, painel', lambda: processar_painel(universo)),
+    ]
+
+    print(f"{args.barras} barras por ação, melhor de {args.repeticoes} execuções")
+    print(f"{'caso':<24}{'tempo (ms)':>12}{'pico (KiB)':>14}")
+    for nome, funcao in casos:
+        tempo, pico = medir(funcao, args.repeticoes)
+        print(f"{nome:<24}{tempo:>12.2f}{pico:>14.0f}")
+
+if __name__ == '__main__':
+    main()
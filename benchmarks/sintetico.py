@@ -0,0 +1,92 @@
+"""
+Gerador determinístico de dados OHLCV sintéticos para os benchmarks.
+
+Preços em passeio aleatório com volatilidade estocástica e saltos na
+abertura, volume com liquidez própria de cada ação, persistência e picos
+nos dias de maior movimento, e lacunas (barras ausentes e ações listadas
+depois do início do período). A mesma semente gera sempre os mesmos dados,
+sem acesso à rede.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from trade_bot.src.kernel_indicadores import recorrencia
+
+BARRAS_ANO = 252
+FIM_PADRAO = '2025-12-31'
+
+@lru_cache(maxsize=64)
+def _datas(fim, n_barras):
+    return pd.bdate_range(end=fim, periods=n_barras, name='Date')
+
+def gerar_ohlcv(n_barras, semente=0, fim=FIM_PADRAO, lacunas=0.0, preco_inicial=30.0, liquidez=13.0):
+    """
+    Série OHLCV sintética de uma ação
+
+    Args:
+        n_barras: Barras (dias úteis) antes da remoção das lacunas
+        fim: Última data do índice
+        lacunas: Fração das barras removidas (suspensões, dias sem negócio)
+        liquidez: Logaritmo do volume típico (em ações)
+    """
+    rng = np.random.default_rng(semente)
+
+    # Volatilidade estocástica: log da volatilidade em AR(1) em torno de 1,5% ao dia
+    choques = rng.normal(0, 0.15, n_barras) + 0.03 * np.log(0.015)
+    choques[0] = np.log(0.015)
+    volatilidade = np.exp(recorrencia(choques[None, :], 0.97)[0])
+
+    retornos = rng.normal(0.0002, 1, n_barras) * volatilidade
+    fechamento = preco_inicial * np.exp(np.cumsum(retornos))
+
+    # Abertura com salto em relação ao fechamento anterior (ocasionalmente grande)
+    salto = rng.normal(0, 0.3, n_barras) * volatilidade
+    salto[rng.random(n_barras) < 0.01] *= 8
+    anterior = np.r_[preco_inicial, fechamento[:-1]]
+    abertura = anterior * np.exp(salto)
+    alta = np.maximum(abertura, fechamento) * (1 + np.abs(rng.normal(0, 0.5, n_barras)) * volatilidade)
+    baixa = np.minimum(abertura, fechamento) * (1 - np.abs(rng.normal(0, 0.5, n_barras)) * volatilidade)
+
+    # Volume: persistente (AR(1) no log) e maior nos dias de movimento forte
+    log_volume = recorrencia(rng.normal(0, 0.35, n_barras)[None, :], 0.6)[0]
+    intensidade = np.abs(retornos) / volatilidade
+    volume = np.exp(liquidez + log_volume + 0.4 * intensidade).round()
+
+    indice = _datas(fim, n_barras)
+    dados = pd.DataFrame({'Open': abertura, 'High': alta, 'Low': baixa, 'Close': fechamento, 'Volume': volume},
+                         index=indice)
+    if lacunas > 0:
+        dados = dados[rng.random(n_barras) >= lacunas]
+    return dados
+
+def gerar_universo(n_acoes, n_barras, semente=0, fim=FIM_PADRAO, lacunas=0.002, listadas_depois=0.1):
+    """
+    Universo sintético {ação: DataFrame OHLCV}
+
+    Args:
+        lacunas: Fração de barras ausentes em cada ação
+        listadas_depois: Fração das ações que começam em uma data aleatória do período
+    """
+    rng = np.random.default_rng(semente)
+    universo = {}
+    for i in range(n_acoes):
+        barras = n_barras
+        if rng.random() < listadas_depois:
+            barras = int(rng.integers(max(1, n_barras // 4), n_barras + 1))
+        universo[f'SINT{i:04d}.SA'] = gerar_ohlcv(
+            barras, semente=semente * 100_003 + i, fim=fim, lacunas=lacunas,
+            preco_inicial=float(np.exp(rng.uniform(np.log(2), np.log(150)))),
+            liquidez=float(rng.uniform(10, 16)),
+        )
+    return universo
+
+def gravar_fixtures(universo, diretorio):
+    """Grava o universo como fixtures CSV de data_source.FonteArquivo"""
+    from trade_bot.src.data_source import FonteArquivo
+
+    fonte = FonteArquivo(diretorio)
+    for acao, dados in universo.items():
+        fonte.gravar(acao, dados)
+    return fonte
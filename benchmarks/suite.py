@@ -0,0 +1,358 @@
+"""
+Suíte de benchmarks do pipeline sobre dados sintéticos (sem rede).
+
+Para cada combinação de número de ações e anos de histórico, mede tempo
+(melhor de N execuções) e pico de memória alocada (tracemalloc) de cada
+etapa: indicadores por ação e em painel, sinais, backtest, gráfico e a
+interface web (construção do snapshot e endpoints via cliente de teste do
+Flask). Cada combinação roda em um processo próprio, para que caches,
+threads e memória de uma não afetem as outras.
+
+Também mede, com python -X importtime, o custo de importação de cada
+subcomando da linha de comando (trade_bot/cli.py), que pesa na partida de
+workers e em execuções curtas agendadas; acima de ORCAMENTO_IMPORTACAO o
+subcomando é apontado como regressão.
+
+Os resultados podem ser gravados como baseline; execuções seguintes são
+comparadas a ela e as etapas mais lentas ou com mais memória que a
+tolerância são apontadas como regressão (código de saída 1).
+
+Uso:
+    python benchmarks/suite.py [--acoes 10 100 1000] [--anos 1 5 20] [--repeticoes 3]
+                               [--etapas processar_painel gerar_sinais ...]
+                               [--baseline benchmarks/baseline.json] [--salvar-baseline]
+                               [--tolerancia 0.25] [--saida resultados.json]
+                               [--comandos serve monitor ...] [--apenas-importacao]
+"""
+import argparse
+import atexit
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Antes de importar trade_bot: config lê estas variáveis na importação
+_TEMPORARIO = tempfile.mkdtemp(prefix='trade_bot_bench_')
+atexit.register(shutil.rmtree, _TEMPORARIO, ignore_errors=True)
+os.environ['TRADE_BOT_FONTE'] = 'arquivo'
+os.environ['TRADE_BOT_FIXTURES'] = os.path.join(_TEMPORARIO, 'fixtures')
+os.environ['TRADE_BOT_DADOS'] = os.path.join(_TEMPORARIO, 'dados')
+os.environ['TRADE_BOT_GRAFICOS'] = os.path.join(_TEMPORARIO, 'graficos')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sintetico import BARRAS_ANO, gerar_universo, gravar_fixtures
+
+BASELINE_PADRAO = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+ETAPAS = [
+    'processar_dados',    # indicadores, uma ação por vez
+    'processar_painel',   # indicadores do universo de uma vez
+    'gerar_sinais',
+    'backtest_carteira',
+    'executar_backtest',  # backtest de cada ação isoladamente
+    'plotar_analise',     # gráfico de uma ação (depende só do histórico)
+    'snapshot',           # construção do snapshot da interface web
+    'api_stocks',         # /api/stocks serializando a resposta
+    'api_stocks_304',     # /api/stocks com ETag válido
+    'api_historico',      # /api/historico/<ação> serializando a resposta
+]
+
+# Etapas rápidas são repetidas; acima disso uma execução basta
+LIMITE_REPETICAO = 1.0
+
+# Custo máximo de importação (ms) de cada subcomando da linha de comando. A
+# maior parte é do pandas (~450 ms); acoes não deve carregar nada pesado.
+ORCAMENTO_IMPORTACAO = {
+    'acoes': 50,
+    'serve': 900,
+    'produce': 800,
+    'monitor': 800,
+    'backtest': 750,
+    'scan': 750,
+}
+
+def medir(funcao, repeticoes):
+    """
+    Tempo (melhor execução, em ms) e pico de memória alocada (KiB) de funcao
+
+    A saída impressa pelo pipeline é descartada.
+    """
+    tempos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(max(1, repeticoes)):
+            gc.collect()
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+            if tempos[-1] > LIMITE_REPETICAO:
+                break
+
+        gc.collect()
+        tracemalloc.start()
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {'tempo_ms': round(min(tempos) * 1000, 3), 'pico_kib': round(pico / 1024, 1)}
+
+def executar_caso(n_acoes, anos, etapas, repeticoes):
+    """Mede as etapas para um universo sintético de n_acoes × anos"""
+    from trade_bot.src.backtest import backtest_carteira, executar_backtest
+    from trade_bot.src.data_pipeline import processar_dados
+    from trade_bot.src.painel import processar_painel
+    from trade_bot.src.strategy import gerar_sinais
+
+    universo = gerar_universo(n_acoes, anos * BARRAS_ANO, semente=n_acoes * 1000 + anos)
+    resultados = {}
+
+    def etapa(nome, funcao):
+        if nome in etapas:
+            resultados[nome] = medir(funcao, repeticoes)
+
+    etapa('processar_dados', lambda: [processar_dados(dados, min_periodos=50) for dados in universo.values()])
+    etapa('processar_painel', lambda: processar_painel(universo, min_periodos=50))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        processados = processar_painel(universo, min_periodos=50)
+        com_sinais = {acao: gerar_sinais(dados) for acao, dados in processados.items()}
+    etapa('gerar_sinais', lambda: [gerar_sinais(dados) for dados in processados.values()])
+    etapa('backtest_carteira', lambda: backtest_carteira(com_sinais))
+    etapa('executar_backtest', lambda: [executar_backtest(dados) for dados in com_sinais.values()])
+
+    if 'plotar_analise' in etapas and com_sinais:
+        import matplotlib
+        matplotlib.use('Agg')
+        from trade_bot.src.visualizacao import plotar_analise
+
+        acao, dados = next(iter(com_sinais.items()))
+        etapa('plotar_analise', lambda: plotar_analise(dados, acao, forcar=True))
+
+    if any(nome in etapas for nome in ('snapshot', 'api_stocks', 'api_stocks_304', 'api_historico')):
+        resultados.update(_executar_web(universo, etapas, repeticoes))
+    return resultados
+
+def _executar_web(universo, etapas, repeticoes):
+    """Etapas da interface web, com o universo gravado como fixtures locais"""
+    gravar_fixtures(universo, os.environ['TRADE_BOT_FIXTURES'])
+
+    from trade_bot.src import coleta
+    from trade_bot.src.web import server, snapshot
+    from trade_bot.src.web.cache_http import cache
+
+    # Sem limite de taxa: mede o código, não o limitador de requisições
+    coleta._coletor = coleta.Coletor(taxa=1e9, rajada=1e9)
+    acoes = list(universo)
+    server.ACOES_TESTE = acoes
+    resultados = {}
+
+    if 'snapshot' in etapas:
+        resultados['snapshot'] = medir(lambda: snapshot.construir_snapshot(acoes, False), repeticoes)
+
+    # O atualizador em segundo plano faz a primeira construção antes das medições
+    snapshot.iniciar_atualizador(acoes, server.is_mercado_aberto)
+    snapshot.armazem.aguardar(600)
+    cliente = server.app.test_client()
+    acao = acoes[0]
+
+    def sem_cache(rota):
+        def requisitar():
+            cache.limpar()
+            return cliente.get(rota)
+        return requisitar
+
+    if 'api_stocks' in etapas:
+        resultados['api_stocks'] = medir(sem_cache('/api/stocks'), repeticoes)
+    if 'api_stocks_304' in etapas:
+        etag = cliente.get('/api/stocks').headers['ETag']
+        resultados['api_stocks_304'] = medir(lambda: cliente.get('/api/stocks', headers={'If-None-Match': etag}),
+                                             repeticoes)
+    if 'api_historico' in etapas:
+        resultados['api_historico'] = medir(sem_cache(f'/api/historico/{acao}'), repeticoes)
+    return resultados
+
+def _importtime(codigo):
+    """Linhas de python -X importtime: [(nome com a indentação da profundidade, acumulado em µs)]"""
+    ambiente = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'), os.environ.get('PYTHONPATH')])))
+    processo = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], capture_output=True, text=True,
+                              env=ambiente, check=True)
+    modulos = []
+    for linha in processo.stderr.splitlines():
+        partes = linha.split('|')
+        if len(partes) != 3 or not partes[1].strip().isdigit():
+            continue
+        modulos.append((partes[2][1:], int(partes[1])))
+    return modulos
+
+def medir_importacao(comando, repeticoes):
+    """
+    Custo de importação de um subcomando (melhor de N processos, em ms)
+
+    Soma o tempo acumulado das importações feitas pelo subcomando, sem as da
+    partida do interpretador, e aponta os pacotes mais pesados.
+    """
+    partida = {nome.strip() for nome, _ in _importtime('pass')}
+    melhor = None
+    for _ in range(max(1, repeticoes)):
+        modulos = [(nome, us) for nome, us in _importtime(f'from trade_bot import cli; cli.carregar({comando!r})')
+                   if nome.strip() not in partida]
+        total = sum(us for nome, us in modulos if not nome.startswith(' '))
+        if melhor is None or total < melhor[0]:
+            melhor = (total, modulos)
+    total, modulos = melhor
+    pacotes = sorted(((nome.strip(), us) for nome, us in modulos if '.' not in nome.strip()), key=lambda item: -item[1])
+    return {'tempo_ms': round(total / 1000, 3), 'maiores': [f'{nome} ({us / 1000:.0f} ms)' for nome, us in pacotes[:4]]}
+
+def acima_do_orcamento(importacao, orcamento=ORCAMENTO_IMPORTACAO):
+    """Subcomandos cujo custo de importação passa do orçamento: [(comando, orçamento, atual)]"""
+    return [(comando, orcamento[comando], medidas['tempo_ms']) for comando, medidas in importacao.items()
+            if comando in orcamento and medidas['tempo_ms'] > orcamento[comando]]
+
+def _chave(n_acoes, anos):
+    return f'{n_acoes}x{anos}a'
+
+def executar_suite(acoes, anos, etapas, repeticoes, timeout):
+    """
+    Executa cada combinação em um subprocesso
+
+    O gráfico depende apenas do histórico e é medido só na menor quantidade
+    de ações de cada histórico.
+
+    Returns:
+        {combinação: {etapa: medidas}} (combinações com falha trazem 'erro')
+    """
+    resultados = {}
+    for n_anos in anos:
+        for n_acoes in acoes:
+            etapas_caso = [e for e in etapas if e != 'plotar_analise' or n_acoes == min(acoes)]
+            chave = _chave(n_acoes, n_anos)
+            print(f"{chave}: {', '.join(etapas_caso)}", file=sys.stderr, flush=True)
+            comando = [sys.executable, __file__, '--caso', str(n_acoes), str(n_anos),
+                       '--repeticoes', str(repeticoes), '--etapas', *etapas_caso]
+            try:
+                processo = subprocess.run(comando, capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                resultados[chave] = {'erro': f'tempo esgotado ({timeout}s)'}
+                continue
+            if processo.returncode != 0:
+                erro = (processo.stderr.strip().splitlines() or [f'código {processo.returncode}'])[-1]
+                resultados[chave] = {'erro': erro}
+                continue
+            resultados[chave] = json.loads(processo.stdout.strip().splitlines()[-1])
+    return resultados
+
+def comparar(resultados, baseline, tolerancia, minimo_ms=1.0, minimo_kib=64.0):
+    """
+    Regressões em relação à baseline
+
+    Uma etapa regride quando o tempo ou o pico de memória passam da baseline
+    em mais que a tolerância (fração) e em mais que o mínimo absoluto, que
+    evita apontar ruído em etapas muito rápidas ou pequenas.
+
+    Returns:
+        Lista de (combinação, etapa, medida, baseline, atual)
+    """
+    regressoes = []
+    for chave, etapas in resultados.items():
+        referencia = baseline.get(chave, {})
+        for etapa, medidas in etapas.items():
+            if etapa not in referencia or not isinstance(medidas, dict):
+                continue
+            for medida, minimo in (('tempo_ms', minimo_ms), ('pico_kib', minimo_kib)):
+                antes, agora = referencia[etapa].get(medida), medidas.get(medida)
+                if antes is None or agora is None:
+                    continue
+                if agora > antes * (1 + tolerancia) and agora - antes > minimo:
+                    regressoes.append((chave, etapa, medida, antes, agora))
+    return regressoes
+
+def imprimir(resultados, baseline=None):
+    """Tabela com tempo e pico de memória, e a variação em relação à baseline"""
+    baseline = baseline or {}
+    print(f"{'combinação':<12}{'etapa':<20}{'tempo (ms)':>14}{'pico (KiB)':>14}{'Δ tempo':>10}{'Δ pico':>10}")
+    for chave, etapas in resultados.items():
+        if 'erro' in etapas:
+            print(f"{chave:<12}{'ERRO: ' + etapas['erro']}")
+            continue
+        for etapa, medidas in etapas.items():
+            referencia = baseline.get(chave, {}).get(etapa, {})
+            variacoes = []
+            for medida in ('tempo_ms', 'pico_kib'):
+                antes = referencia.get(medida)
+                variacoes.append(f"{medidas[medida] / antes - 1:+.0%}" if antes and medida in medidas else '')
+            # A importação não tem pico de memória; no lugar dele vão os pacotes mais pesados
+            pico = f"{medidas['pico_kib']:>14.0f}" if 'pico_kib' in medidas else f"{'':>14}"
+            extra = f"  {', '.join(medidas['maiores'])}" if medidas.get('maiores') else ''
+            print(f"{chave:<12}{etapa:<20}{medidas['tempo_ms']:>14.2f}{pico}{variacoes[0]:>10}{variacoes[1]:>10}{extra}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--acoes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--anos', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--etapas', nargs='+', default=ETAPAS, choices=ETAPAS)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--timeout', type=int, default=1800, help='Segundos por combinação')
+    parser.add_argument('--baseline', default=BASELINE_PADRAO)
+    parser.add_argument('--salvar-baseline', action='store_true', help='Grava os resultados como nova baseline')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Piora relativa aceita (0.25 = 25%%)')
+    parser.add_argument('--saida', help='Arquivo JSON para os resultados')
+    parser.add_argument('--comandos', nargs='*', default=list(ORCAMENTO_IMPORTACAO), choices=ORCAMENTO_IMPORTACAO,
+                        help='Subcomandos com o custo de importação medido (vazio = nenhum)')
+    parser.add_argument('--apenas-importacao', action='store_true', help='Mede só o custo de importação')
+    parser.add_argument('--caso', type=int, nargs=2, metavar=('ACOES', 'ANOS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.caso:
+        # Processo filho: uma combinação, resultado em JSON na última linha
+        print(json.dumps(executar_caso(*args.caso, args.etapas, args.repeticoes)))
+        return
+
+    resultados = {}
+    if not args.apenas_importacao:
+        resultados = executar_suite(args.acoes, args.anos, args.etapas, args.repeticoes, args.timeout)
+    if args.comandos:
+        print(f"importacao: {', '.join(args.comandos)}", file=sys.stderr, flush=True)
+        resultados['importacao'] = {comando: medir_importacao(comando, max(args.repeticoes, 5))
+                                    for comando in args.comandos}
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.salvar_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f).get('resultados', {})
+
+    imprimir(resultados, baseline)
+    documento = {
+        'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'maquina': platform.machine(),
+        'processadores': os.cpu_count(),
+        'resultados': resultados,
+    }
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, indent=2)
+    if args.salvar_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(documento, f, indent=2)
+        print(f"Baseline gravada em {args.baseline}")
+        return
+
+    regressoes = comparar(resultados, baseline, args.tolerancia)
+    for chave, etapa, medida, antes, agora in regressoes:
+        print(f"REGRESSÃO {chave} {etapa} {medida}: {antes:.1f} -> {agora:.1f} ({agora / antes - 1:+.0%})")
+    acima = acima_do_orcamento(resultados.get('importacao', {}))
+    for comando, orcamento, agora in acima:
+        print(f"ACIMA DO ORÇAMENTO importação de {comando}: {agora:.0f} ms (orçamento {orcamento} ms)")
+    if regressoes or acima:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -4,15 +4,18 @@ import sys
 from pathlib import Path
 import logging
 
-# Configurar logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
 # Configurar os caminhos
 ROOT_DIR = Path(__file__).resolve().parent
 sys.path.append(str(ROOT_DIR))
-logger.debug(f"Python path: {sys.path}")
 
+from trade_bot.config import LOG_NIVEL
+
+# Configurar logging (TRADE_BOT_LOG=DEBUG para o detalhamento do pipeline)
+logging.basicConfig(level=LOG_NIVEL)
+logger = logging.getLogger(__name__)
+logger.debug("Python path: %s", sys.path)
+
+# Servidor de desenvolvimento (um processo, recarga automática); em produção use trade-bot serve --workers N
 # Configurar variáveis de ambiente para o Flask
 os.environ['FLASK_APP'] = 'trade_bot.src.web.server'
 os.environ['FLASK_ENV'] = 'development'
@@ -21,9 +24,9 @@ os.environ['FLASK_DEBUG'] = '1'
 if __name__ == '__main__':
     try:
         from trade_bot.src.web.server import app
-        logger.info(f"Server starting at http://localhost:5000")
-        logger.info(f"Static folder: {app.static_folder}")
-        logger.info(f"Template folder: {app.template_folder}")
+        logger.info("Server starting at http://localhost:5000")
+        logger.info("Static folder: %s", app.static_folder)
+        logger.info("Template folder: %s", app.template_folder)
         app.run(host='0.0.0.0', port=5000, debug=True)
     except Exception as e:
-        logger.error(f"Erro ao iniciar o servidor: {e}", exc_info=True)
+        logger.error("Erro ao iniciar o servidor: %s", e, exc_info=True)
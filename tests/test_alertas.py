@@ -0,0 +1,159 @@
+import time
+
+import pytest
+
+from trade_bot.src import alert_system
+from trade_bot.src.alert_system import CanalEmail, Despachante, PoolSMTP, criar_mensagem
+from trade_bot.src.smtp_local import ServidorSMTPLocal
+
+def _aguardar(condicao, timeout=5.0):
+    limite = time.monotonic() + timeout
+    while not condicao():
+        if time.monotonic() >= limite:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def servidor():
+    with ServidorSMTPLocal() as servidor:
+        yield servidor
+
+@pytest.fixture
+def config(servidor):
+    return {'remetente': 'bot@exemplo.com', 'destinatario': 'a@exemplo.com, b@exemplo.com',
+            'servidor': servidor.host, 'porta': servidor.porta, 'seguranca': 'nenhuma', 'timeout': 5}
+
+@pytest.fixture
+def despachantes(config, tmp_path):
+    """Cria despachantes com e-mail pelo servidor local e os encerra no fim do teste"""
+    criados = []
+
+    def criar(intervalo=0.2, **kwargs):
+        canal = CanalEmail(PoolSMTP(config, tamanho=2, senha=''), config)
+        despachante = Despachante([canal], intervalo=intervalo, limites={},
+                                  arquivo_estado=str(tmp_path / 'alertas.json'), **kwargs)
+        criados.append(despachante)
+        return despachante
+
+    yield criar
+    for despachante in criados:
+        despachante.parar(descarregar=False, timeout=5)
+
+def test_mudancas_do_intervalo_em_uma_mensagem(servidor, despachantes):
+    despachante = despachantes(intervalo=0.3)
+
+    inicio = time.monotonic()
+    assert despachante.notificar('PETR4.SA', 1, preco=30.5, data='2024-05-02')
+    assert despachante.notificar('VALE3.SA', -1, preco=61.2)
+    assert despachante.notificar('ITUB4.SA', 1)
+    assert time.monotonic() - inicio < 0.1  # notificar só enfileira
+
+    assert servidor.aguardar(1)
+    time.sleep(0.5)
+    assert len(servidor.mensagens) == 1
+    remetente, destinatarios, mensagem = servidor.mensagens[0]
+    assert remetente == 'bot@exemplo.com'
+    assert destinatarios == ['a@exemplo.com', 'b@exemplo.com']
+    assert mensagem['Subject'] == 'Alertas de Trading: 3 ações'
+    assert mensagem.get_content().splitlines() == [
+        'COMPRAR ITUB4.SA (antes: MANTER)',
+        'COMPRAR PETR4.SA a R$30.50 em 2024-05-02 (antes: MANTER)',
+        'VENDER VALE3.SA a R$61.20 (antes: MANTER)',
+    ]
+
+def test_mudancas_seguintes_em_nova_mensagem(servidor, despachantes):
+    despachante = despachantes(intervalo=0.1)
+
+    despachante.notificar('PETR4.SA', 1)
+    assert servidor.aguardar(1)
+    despachante.notificar('PETR4.SA', -1)
+    assert servidor.aguardar(2)
+
+    assert servidor.mensagens[1][2]['Subject'] == 'Alerta de Trading: PETR4.SA'
+    assert servidor.mensagens[1][2].get_content().strip() == 'VENDER PETR4.SA (antes: COMPRAR)'
+    assert servidor.conexoes == 1  # a conexão é reaproveitada
+
+def test_sinal_repetido_nao_gera_alerta(servidor, despachantes):
+    despachante = despachantes(intervalo=0.1)
+
+    assert despachante.notificar('PETR4.SA', 1)
+    assert not despachante.notificar('PETR4.SA', 1)
+    assert servidor.aguardar(1)
+    assert not despachante.notificar('PETR4.SA', 1)
+    despachante.parar()
+
+    # O último sinal alertado sobrevive a um reinício
+    reiniciado = despachantes(intervalo=0.1)
+    assert reiniciado.ultimo_sinal('PETR4.SA') == 1
+    assert not reiniciado.notificar('PETR4.SA', 1)
+    reiniciado.parar()
+    assert len(servidor.mensagens) == 1
+
+def test_mudanca_desfeita_no_intervalo_nao_gera_alerta(servidor, despachantes):
+    despachante = despachantes(intervalo=30)
+
+    despachante.notificar('PETR4.SA', 1)
+    despachante.notificar('PETR4.SA', 0)
+    despachante.notificar('VALE3.SA', -1)
+    despachante.parar(descarregar=True)
+
+    assert len(servidor.mensagens) == 1
+    assert servidor.mensagens[0][2].get_content().strip() == 'VENDER VALE3.SA (antes: MANTER)'
+
+@pytest.mark.parametrize('ociosa_max', [0, 60], ids=['testada com NOOP', 'falha no envio'])
+def test_reconecta_apos_queda_da_conexao(servidor, config, ociosa_max):
+    pool = PoolSMTP(config, tamanho=1, ociosa_max=ociosa_max, senha='')
+    try:
+        pool.enviar(criar_mensagem('Primeira', 'corpo', config))
+        assert servidor.aguardar(1)
+
+        servidor.derrubar_conexoes()
+        pool.enviar(criar_mensagem('Segunda', 'corpo', config))
+
+        assert servidor.aguardar(2)
+        assert [mensagem['Subject'] for _, _, mensagem in servidor.mensagens] == ['Primeira', 'Segunda']
+        assert pool.conexoes_abertas == 2
+    finally:
+        pool.fechar()
+
+class CanalInstavel:
+    """Canal de teste que falha enquanto falhar for True"""
+
+    nome = 'teste'
+
+    def __init__(self):
+        self.falhar = True
+        self.tentativas = 0
+        self.enviadas = []
+
+    def enviar(self, assunto, corpo):
+        self.tentativas += 1
+        if self.falhar:
+            raise ConnectionError('canal indisponível')
+        self.enviadas.append(corpo)
+
+def test_falha_na_entrega_mantem_alerta_pendente(monkeypatch, tmp_path):
+    monkeypatch.setattr(alert_system, 'ALERTAS_TENTATIVAS', 1)
+    monkeypatch.setattr(alert_system, 'backoff', lambda tentativa: 0.01)
+    canal = CanalInstavel()
+    estado = str(tmp_path / 'alertas.json')
+    despachante = Despachante([canal], intervalo=0.05, limites={}, arquivo_estado=estado)
+    try:
+        assert despachante.notificar('PETR4.SA', 1)
+        assert _aguardar(lambda: canal.tentativas >= 1)
+
+        # Nada foi entregue: o sinal não conta como alertado, nem no arquivo de estado
+        assert despachante.ultimo_sinal('PETR4.SA') == 0
+        assert Despachante([], arquivo_estado=estado).ultimo_sinal('PETR4.SA') == 0
+        # O mesmo sinal não gera outro evento, mas a mensagem pendente é reenviada
+        assert not despachante.notificar('PETR4.SA', 1)
+        assert _aguardar(lambda: canal.tentativas >= 2)
+
+        canal.falhar = False
+        assert _aguardar(lambda: canal.enviadas)
+        assert canal.enviadas == ['COMPRAR PETR4.SA (antes: MANTER)']
+        assert _aguardar(lambda: despachante.ultimo_sinal('PETR4.SA') == 1)
+    finally:
+        despachante.parar(descarregar=False, timeout=5)
+    assert Despachante([], arquivo_estado=estado).ultimo_sinal('PETR4.SA') == 1
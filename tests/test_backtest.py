@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trade_bot.src.backtest import calcular_posicoes, executar_carteira, extrair_trades
+
+SEM_CUSTOS = {'corretagem_ordem': 0.0, 'corretagem_percentual': 0.0, 'emolumentos': 0.0, 'slippage': 0.0}
+COM_CUSTOS = {'corretagem_ordem': 4.9, 'corretagem_percentual': 0.0005, 'emolumentos': 0.0003, 'slippage': 0.001}
+
+def _dados(n_acoes=3, n_barras=250, semente=7):
+    """Preços em passeio aleatório (com uma lacuna) e sinais que persistem por algumas barras"""
+    rng = np.random.default_rng(semente)
+    fechamento = 20 * np.exp(np.cumsum(rng.normal(0, 0.015, (n_acoes, n_barras)), axis=1))
+    fechamento[1, 100:104] = np.nan
+    sinais = np.repeat(rng.integers(-2, 3, (n_acoes, n_barras // 5 + 1)), 5, axis=1)[:, :n_barras]
+    sinais[1, 100:104] = 0
+    datas = pd.bdate_range('2023-01-02', periods=n_barras)
+    return [f'A{i}' for i in range(n_acoes)], datas, fechamento, sinais.astype(np.int8)
+
+def _posicoes_laco(sinais, entrada, saida, vendido, tamanhos):
+    """Referência barra a barra de calcular_posicoes"""
+    tabela = {1: 1.0, 2: 1.0} if tamanhos is None else {nivel: tamanhos.get(nivel, 0.0) for nivel in (1, 2)}
+    posicoes = np.zeros(sinais.shape)
+    for i, linha in enumerate(sinais):
+        comprado = vendido_em = None  # nível do sinal de entrada da posição aberta
+        for t, sinal in enumerate(linha):
+            if sinal >= entrada:
+                comprado = abs(sinal)
+            elif sinal <= -saida:
+                comprado = None
+            if vendido:
+                if sinal <= -entrada:
+                    vendido_em = abs(sinal)
+                elif sinal >= saida:
+                    vendido_em = None
+            posicoes[i, t] = (tabela[comprado] if comprado else 0.0) - (tabela[vendido_em] if vendido_em else 0.0)
+    return posicoes
+
+def _retornos_laco(fechamento):
+    retornos = np.zeros(fechamento.shape)
+    for i, linha in enumerate(fechamento):
+        anterior = None
+        for t, preco in enumerate(linha):
+            if np.isnan(preco):
+                continue
+            if anterior is not None:
+                retornos[i, t] = preco / anterior - 1
+            anterior = preco
+    return retornos
+
+def _carteira_laco(fechamento, sinais, capital, custos, vendido):
+    """Patrimônio e pesos barra a barra: alocação fixa e execução no fechamento seguinte"""
+    n_acoes, n_barras = fechamento.shape
+    alvo = _posicoes_laco(sinais, 1, 1, vendido, None) / n_acoes
+    retornos = _retornos_laco(fechamento)
+    custo_percentual = custos['corretagem_percentual'] + custos['emolumentos'] + custos['slippage']
+
+    pesos = np.zeros((n_acoes, n_barras))
+    patrimonio = np.zeros(n_barras)
+    atual, anteriores = capital, np.zeros(n_acoes)
+    for t in range(n_barras):
+        if t > 0:
+            pesos[:, t] = alvo[:, t - 1]
+        bruto = sum(anteriores[i] * retornos[i, t] for i in range(n_acoes))
+        variacoes = [abs(pesos[i, t] - anteriores[i]) for i in range(n_acoes)]
+        # Custos proporcionais sobre o patrimônio da barra anterior, mais a corretagem por ordem
+        custo = atual * sum(variacoes) * custo_percentual
+        atual = atual * (1 + bruto) - custo - custos['corretagem_ordem'] * sum(variacao > 0 for variacao in variacoes)
+        patrimonio[t] = atual
+        anteriores = pesos[:, t]
+    return patrimonio, pesos, retornos
+
+def _trades_laco(acoes, datas, pesos, retornos, custo_percentual):
+    trades = []
+    n_barras = pesos.shape[1]
+    for i, acao in enumerate(acoes):
+        t = 0
+        while t < n_barras:
+            sentido = np.sign(pesos[i, t])
+            if sentido == 0:
+                t += 1
+                continue
+            inicio, acumulado = t, 1.0
+            while t < n_barras and np.sign(pesos[i, t]) == sentido:
+                if t + 1 < n_barras:
+                    acumulado *= 1 + sentido * retornos[i, t + 1]
+                t += 1
+            aberto = t >= n_barras
+            acumulado *= (1 - custo_percentual) * (1.0 if aberto else 1 - custo_percentual)
+            trades.append((acao, 'compra' if sentido > 0 else 'venda', datas[inicio], datas[min(t, n_barras - 1)],
+                           t - inicio, acumulado - 1, aberto))
+    return sorted(trades)
+
+@pytest.mark.parametrize('entrada, saida, vendido, tamanhos', [
+    (1, 1, False, None),
+    (2, 1, False, None),
+    (1, 0, True, None),
+    (2, 2, True, {1: 0.5, 2: 1.0}),
+    (2, 0, True, {2: 0.75}),
+])
+def test_posicoes_iguais_ao_laco(entrada, saida, vendido, tamanhos):
+    _, _, _, sinais = _dados()
+
+    obtidas = calcular_posicoes(sinais, entrada, saida, vendido, tamanhos)
+
+    np.testing.assert_array_equal(obtidas, _posicoes_laco(sinais, entrada, saida, vendido, tamanhos))
+
+@pytest.mark.parametrize('custos', [SEM_CUSTOS, COM_CUSTOS], ids=['sem custos', 'com custos'])
+@pytest.mark.parametrize('vendido', [False, True], ids=['comprado', 'vendido'])
+def test_carteira_em_forma_fechada_igual_ao_laco(custos, vendido):
+    acoes, datas, fechamento, sinais = _dados()
+
+    resultado = executar_carteira(acoes, datas, fechamento, sinais, capital=100_000.0, vendido=vendido, **custos)
+    patrimonio, pesos, _ = _carteira_laco(fechamento, sinais, 100_000.0, custos, vendido)
+
+    np.testing.assert_allclose(resultado.pesos, pesos)
+    np.testing.assert_allclose(resultado.patrimonio.to_numpy(), patrimonio, rtol=1e-10)
+    if custos is SEM_CUSTOS:
+        assert resultado.metricas['custos_totais'] == 0.0
+    else:
+        assert resultado.metricas['custos_totais'] > 0.0
+
+@pytest.mark.parametrize('custos', [SEM_CUSTOS, COM_CUSTOS], ids=['sem custos', 'com custos'])
+def test_trades_iguais_ao_laco(custos):
+    acoes, datas, fechamento, sinais = _dados()
+    _, pesos, retornos = _carteira_laco(fechamento, sinais, 100_000.0, custos, vendido=True)
+    custo_percentual = custos['corretagem_percentual'] + custos['emolumentos'] + custos['slippage']
+
+    trades = extrair_trades(acoes, datas, pesos, retornos, custo_percentual)
+    esperados = _trades_laco(acoes, datas, pesos, retornos, custo_percentual)
+
+    obtidos = sorted(trades.itertuples(index=False, name=None))
+    assert len(obtidos) == len(esperados) > 10
+    for obtido, esperado in zip(obtidos, esperados):
+        assert obtido[:5] == esperado[:5] and obtido[6] == esperado[6]
+        assert obtido[5] == pytest.approx(esperado[5], rel=1e-9, abs=1e-12)
@@ -0,0 +1,63 @@
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from trade_bot.src.agendador import BARRA, CONSOLIDACAO, Agendador
+from trade_bot.src.calendario import FUSO, eh_pregao, feriados, horario_pregao, mercado_aberto, proximo_pregao
+
+@pytest.fixture
+def maquina_em_utc(monkeypatch):
+    """Fuso local da máquina em UTC, diferente do da B3"""
+    monkeypatch.setenv('TZ', 'UTC')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def _b3(*args):
+    return datetime(*args, tzinfo=FUSO)
+
+def test_carnaval_e_quarta_feira_de_cinzas():
+    assert feriados(2025)[date(2025, 3, 3)] == 'Carnaval'
+    assert feriados(2025)[date(2025, 3, 4)] == 'Carnaval'
+    assert not eh_pregao(date(2025, 3, 3)) and not eh_pregao(date(2025, 3, 4))
+    # Quarta-feira de Cinzas abre às 13:00
+    assert horario_pregao(date(2025, 3, 5)) == (_b3(2025, 3, 5, 13, 0), _b3(2025, 3, 5, 17, 55))
+    assert not mercado_aberto(datetime(2025, 3, 5, 11, 0))
+    assert mercado_aberto(datetime(2025, 3, 5, 13, 30))
+
+def test_fim_de_ano():
+    # Sem pregão na véspera de Natal, no Natal e no último dia útil do ano
+    for dia in (date(2025, 12, 24), date(2025, 12, 25), date(2025, 12, 31), date(2026, 1, 1)):
+        assert not eh_pregao(dia)
+    assert eh_pregao(date(2025, 12, 26)) and eh_pregao(date(2025, 12, 30))
+    assert proximo_pregao(date(2025, 12, 31)) == date(2026, 1, 2)
+    # Último dia útil num fim de semana: vale a sexta-feira anterior
+    assert feriados(2028)[date(2028, 12, 29)] == 'Último dia útil do ano'
+
+def test_proximo_sem_fuso_no_horario_da_b3(maquina_em_utc):
+    agendador = Agendador(3600)
+
+    # 20:00 na B3, depois da consolidação: próximo pregão é 26/12 (24 e 25 sem pregão)
+    assert agendador.proximo(datetime(2025, 12, 23, 20, 0)) == (_b3(2025, 12, 26, 11, 2), BARRA)
+    # O mesmo relógio em UTC é 17:00 na B3, ainda no pregão
+    assert agendador.proximo(datetime(2025, 12, 23, 20, 0, tzinfo=timezone.utc)) == (_b3(2025, 12, 23, 17, 2), BARRA)
+
+def test_proximo_atravessa_feriados():
+    agendador = Agendador(3600)
+
+    # Sexta antes do Carnaval: a próxima barra é a primeira da Quarta-feira de Cinzas
+    assert agendador.proximo(_b3(2025, 2, 28, 19, 0)) == (_b3(2025, 3, 5, 14, 2), BARRA)
+    # Depois do último pregão do ano, o próximo é em 2 de janeiro
+    assert agendador.proximo(_b3(2025, 12, 30, 17, 56)) == (_b3(2025, 12, 30, 17, 57), BARRA)
+    assert agendador.proximo(_b3(2025, 12, 30, 17, 57)) == (_b3(2025, 12, 30, 18, 25), CONSOLIDACAO)
+    assert agendador.proximo(_b3(2025, 12, 30, 18, 25)) == (_b3(2026, 1, 2, 11, 2), BARRA)
+
+def test_disparos_da_quarta_feira_de_cinzas():
+    disparos = Agendador(3600).disparos(date(2025, 3, 5))
+
+    assert [momento.strftime('%H:%M') for momento, _ in disparos] == [
+        '14:02', '15:02', '16:02', '17:02', '17:57', '18:25']
+    assert disparos[-1][1] == CONSOLIDACAO
+    assert Agendador(3600).disparos(date(2025, 3, 4)) == []
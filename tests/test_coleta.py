@@ -0,0 +1,144 @@
+import random
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from trade_bot.src import coleta
+from trade_bot.src.coleta import BaldeTokens, Coletor, Disjuntor, FonteInstavel, backoff
+from trade_bot.src.data_source import FonteArquivo
+
+ACOES = ['AAAA3.SA', 'BBBB3.SA', 'CCCC3.SA', 'DDDD3.SA', 'EEEE3.SA']
+
+class Relogio:
+    """Relógio manual para o disjuntor e o balde de tokens"""
+
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+    def avancar(self, segundos):
+        self.agora += segundos
+
+@pytest.fixture
+def fonte(tmp_path):
+    arquivo = FonteArquivo(str(tmp_path))
+    indice = pd.bdate_range('2024-01-02', periods=10)
+    fechamento = np.linspace(10, 11, len(indice))
+    barras = pd.DataFrame({'Open': fechamento, 'High': fechamento + 0.1, 'Low': fechamento - 0.1,
+                           'Close': fechamento, 'Volume': 1000.0}, index=indice)
+    for acao in ACOES:
+        arquivo.gravar(acao, barras)
+    return arquivo
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Substitui o backoff por uma espera curta e registra as tentativas que o usaram"""
+    registradas = []
+    monkeypatch.setattr(coleta, 'backoff', lambda tentativa: registradas.append(tentativa) or 0.01)
+    return registradas
+
+def _coletar(coletor, acoes=ACOES):
+    return {acao: (dados, erro) for acao, dados, erro in coletor.coletar(acoes)}
+
+def test_backoff_exponencial_com_jitter():
+    rng = random.Random(1)
+    for tentativa in range(8):
+        atraso = min(8.0, 0.5 * 2 ** tentativa)
+        for _ in range(50):
+            assert atraso / 2 <= backoff(tentativa, base=0.5, maximo=8.0, rng=rng) <= atraso
+
+def test_novas_tentativas_ate_obter_os_dados(fonte, esperas):
+    instavel = FonteInstavel(fonte, prob_falha=0.5, semente=3)
+    coletor = Coletor(instavel, tentativas=20, lote=1, taxa=1e9, rajada=1e9, disjuntor=Disjuntor(limite=100))
+
+    resultados = _coletar(coletor)
+
+    assert all(dados is not None and erro is None for dados, erro in resultados.values())
+    assert instavel.requisicoes == len(ACOES) + len(esperas)
+    assert esperas  # a semente faz requisições falharem
+
+def test_desiste_apos_as_tentativas(fonte, esperas):
+    instavel = FonteInstavel(fonte, prob_falha=1.0)
+    coletor = Coletor(instavel, tentativas=3, lote=1, taxa=1e9, rajada=1e9, disjuntor=Disjuntor(limite=100))
+
+    dados, erro = _coletar(coletor, ['AAAA3.SA'])['AAAA3.SA']
+
+    assert dados is None and erro == 'falha injetada'
+    assert instavel.requisicoes == 3
+    assert esperas == [0, 1]  # backoff antes da segunda e da terceira tentativa
+
+def test_tempo_esgotado(fonte, esperas):
+    instavel = FonteInstavel(fonte, prob_lenta=1.0, lentidao=0.5)
+    coletor = Coletor(instavel, tentativas=1, timeout=0.05, taxa=1e9, rajada=1e9, disjuntor=Disjuntor(limite=100))
+
+    inicio = time.monotonic()
+    dados, erro = _coletar(coletor, ['AAAA3.SA'])['AAAA3.SA']
+
+    assert dados is None and erro.startswith('tempo esgotado')
+    assert time.monotonic() - inicio < 0.4
+
+def test_disjuntor_abre_e_se_recupera(fonte):
+    relogio = Relogio()
+    disjuntor = Disjuntor(limite=2, pausa=60, relogio=relogio)
+    instavel = FonteInstavel(fonte, sempre_falham={'AAAA3.SA'})
+    coletor = Coletor(instavel, tentativas=1, taxa=1e9, rajada=1e9, disjuntor=disjuntor)
+
+    # Falhas seguidas até o limite abrem o circuito
+    for _ in range(2):
+        assert _coletar(coletor, ['AAAA3.SA'])['AAAA3.SA'] == (None, 'sem dados')
+    assert disjuntor.abertos() == ['AAAA3.SA']
+
+    # Com o circuito aberto a ação não gera requisições; as demais seguem normalmente
+    requisicoes = instavel.requisicoes
+    resultados = _coletar(coletor, ['AAAA3.SA', 'BBBB3.SA'])
+    assert resultados['AAAA3.SA'] == (None, 'circuito aberto')
+    assert resultados['BBBB3.SA'][0] is not None
+    assert instavel.requisicoes == requisicoes + 1
+
+    # Passada a pausa, uma tentativa é liberada: se falhar, o circuito abre de novo
+    relogio.avancar(61)
+    assert _coletar(coletor, ['AAAA3.SA'])['AAAA3.SA'] == (None, 'sem dados')
+    assert disjuntor.abertos() == ['AAAA3.SA']
+
+    # Se der certo, o circuito fecha
+    instavel.sempre_falham.clear()
+    relogio.avancar(61)
+    dados, erro = _coletar(coletor, ['AAAA3.SA'])['AAAA3.SA']
+    assert dados is not None and erro is None
+    assert disjuntor.abertos() == []
+
+def test_balde_de_tokens():
+    relogio = Relogio()
+    balde = BaldeTokens(taxa=2.0, capacidade=2, relogio=relogio)
+
+    assert balde.tentar() and balde.tentar()
+    assert not balde.tentar()
+    assert balde.espera() == pytest.approx(0.5)
+
+    relogio.avancar(0.25)
+    assert not balde.tentar()
+    assert balde.espera() == pytest.approx(0.25)
+    relogio.avancar(0.25)
+    assert balde.tentar()
+
+    # Os tokens acumulam só até a capacidade
+    relogio.avancar(100)
+    assert balde.tentar() and balde.tentar()
+    assert not balde.tentar()
+
+def test_coleta_respeita_a_taxa(fonte):
+    instavel = FonteInstavel(fonte)
+    coletor = Coletor(instavel, lote=1, taxa=20.0, rajada=1, disjuntor=Disjuntor(limite=100))
+
+    inicio = time.monotonic()
+    resultados = _coletar(coletor)
+    duracao = time.monotonic() - inicio
+
+    assert all(dados is not None for dados, _ in resultados.values())
+    assert instavel.requisicoes == len(ACOES)
+    # Rajada de 1: depois da primeira, uma requisição a cada 1/20 s
+    assert duracao >= (len(ACOES) - 1) / 20.0 * 0.9
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trade_bot.config import SOBREPOSICAO_BARRAS
+from trade_bot.src.historico_sinais import HistoricoSinais
+
+DATAS = pd.bdate_range('2024-01-02', periods=20)
+
+def _barras(sinais, datas=DATAS, fechamento=None):
+    fechamento = np.linspace(10, 12, len(datas)) if fechamento is None else fechamento
+    return pd.DataFrame({'Close': fechamento, 'Volume': 1000.0, 'Sinal': sinais}, index=datas)
+
+@pytest.fixture
+def historico(tmp_path):
+    historico = HistoricoSinais(str(tmp_path / 'historico.sqlite3'), retencao_dias=365, retencao_intradiario_dias=30,
+                                intervalo_compactacao=None)
+    yield historico
+    historico.fechar()
+
+def _mudancas(historico, acao='PETR4.SA', timeframe='1d'):
+    return [(m['date'][:10], m['previous'], m['signal'])
+            for m in reversed(historico.mudancas(acao, timeframe=timeframe))]
+
+def test_regrava_so_a_sobreposicao(historico):
+    assert historico.gravar({'PETR4.SA': _barras(np.zeros(20))}) == 20
+
+    # Mesmo histórico revisado por inteiro e uma barra nova: só as últimas barras já gravadas são reescritas
+    datas = pd.bdate_range(DATAS[0], periods=21)
+    fechamento = np.linspace(10, 12, 21) * 1.01
+    assert historico.gravar({'PETR4.SA': _barras(np.zeros(21), datas, fechamento)}) == SOBREPOSICAO_BARRAS + 1
+
+    precos = [barra['price'] for barra in historico.intervalo('PETR4.SA')]
+    assert len(precos) == 21
+    np.testing.assert_allclose(precos[:20 - SOBREPOSICAO_BARRAS], np.linspace(10, 12, 20)[:20 - SOBREPOSICAO_BARRAS])
+    np.testing.assert_allclose(precos[20 - SOBREPOSICAO_BARRAS:], fechamento[20 - SOBREPOSICAO_BARRAS:])
+
+def test_completa_barras_faltantes(historico):
+    # Um ciclo que gravou só a última barra não impede gravar o histórico depois
+    historico.gravar({'PETR4.SA': _barras(np.zeros(1), DATAS[-1:])})
+
+    assert historico.gravar({'PETR4.SA': _barras(np.zeros(20))}) == 20
+    assert len(historico.intervalo('PETR4.SA')) == 20
+
+def test_mudanca_de_sinal_dentro_da_sobreposicao(historico):
+    sinais = np.zeros(20, dtype=int)
+    sinais[17:] = 1
+    historico.gravar({'PETR4.SA': _barras(sinais)})
+    assert _mudancas(historico) == [('2024-01-25', 0, 1)]
+
+    # As barras reescritas desfazem a compra e trazem uma venda na última
+    revisados = np.zeros(20, dtype=int)
+    revisados[19] = -1
+    historico.gravar({'PETR4.SA': _barras(revisados)})
+    assert _mudancas(historico) == [('2024-01-29', 0, -1)]
+
+    # Barra nova com o mesmo sinal: nenhuma mudança a mais
+    datas = pd.bdate_range(DATAS[0], periods=21)
+    historico.gravar({'PETR4.SA': _barras(np.r_[revisados, -1], datas)})
+    assert _mudancas(historico) == [('2024-01-29', 0, -1)]
+
+def test_ultimas_acompanham_a_barra_mais_recente(historico):
+    historico.gravar({'PETR4.SA': _barras(np.zeros(20)), 'VALE3.SA': _barras(np.ones(10), DATAS[:10])})
+
+    ultimas = {barra['symbol']: barra for barra in historico.ultimos()}
+    assert ultimas['PETR4.SA']['date'][:10] == '2024-01-29'
+    assert ultimas['VALE3.SA']['date'][:10] == '2024-01-15'
+
+    # A última barra revisada (mesma data) e uma barra nova de outra ação atualizam a tabela
+    fechamento = np.linspace(10, 12, 20)
+    fechamento[-1] = 13.0
+    datas = pd.bdate_range(DATAS[0], periods=11)
+    historico.gravar({'PETR4.SA': _barras(np.zeros(20), fechamento=fechamento),
+                      'VALE3.SA': _barras(np.ones(11), datas)})
+
+    ultimas = {barra['symbol']: barra for barra in historico.ultimos()}
+    assert ultimas['PETR4.SA']['price'] == 13.0
+    assert ultimas['VALE3.SA']['date'][:10] == '2024-01-16'
+    assert [barra['symbol'] for barra in historico.ultimos(acoes=['VALE3.SA'])] == ['VALE3.SA']
+
+def test_retencao_por_timeframe(historico):
+    agora = pd.Timestamp('2025-06-30')
+    antigos = pd.bdate_range('2024-01-02', periods=20)
+    recentes = pd.bdate_range('2025-06-02', periods=20)
+    intradiarias = pd.date_range('2025-05-02 10:00', periods=20, freq='5min')
+    sinais = np.zeros(20, dtype=int)
+    sinais[10:] = 1
+    historico.gravar({'PETR4.SA': _barras(sinais, recentes), 'VALE3.SA': _barras(sinais, antigos)})
+    historico.gravar({'PETR4.SA': _barras(sinais, intradiarias)}, timeframe='5m')
+
+    # Diárias com mais de 365 dias e intradiárias com mais de 30 dias saem; as mudanças de sinal ficam
+    assert historico.compactar(agora) == 40
+    assert len(historico.intervalo('PETR4.SA')) == 20
+    assert historico.intervalo('VALE3.SA') == []
+    assert historico.intervalo('PETR4.SA', timeframe='5m') == []
+    assert _mudancas(historico, 'VALE3.SA') == [('2024-01-16', 0, 1)]
+    assert [barra['symbol'] for barra in historico.ultimos()] == ['PETR4.SA']
+    assert historico.ultimos(timeframe='5m') == []
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from trade_bot.src import indicadores
+from trade_bot.src import kernel_indicadores as kernel
+from trade_bot.src.indicadores import calcular_matrizes
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+from trade_bot.src.otimizacao import preparar_matrizes
+from trade_bot.src.painel import montar_painel
+
+def _barras(n, inicio=0, semente=0):
+    rng = np.random.default_rng(semente)
+    fechamento = 30 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    indice = pd.bdate_range('2023-01-02', periods=n + inicio)[inicio:]
+    return pd.DataFrame({'Open': fechamento * (1 + rng.normal(0, 0.003, n)),
+                         'High': fechamento * (1 + rng.uniform(0, 0.02, n)),
+                         'Low': fechamento * (1 - rng.uniform(0, 0.02, n)),
+                         'Close': fechamento, 'Volume': rng.uniform(1e5, 1e6, n)}, index=indice)
+
+def _painel():
+    # Ações com históricos de tamanhos diferentes (NaN antes da listagem)
+    return montar_painel({'AAAA3.SA': _barras(300), 'BBBB3.SA': _barras(220, inicio=80, semente=1),
+                          'CCCC3.SA': _barras(300, semente=2)})
+
+def test_registro_igual_ao_kernel():
+    painel = _painel()
+    esperado = kernel.calcular_indicadores(painel['High'], painel['Low'], painel['Close'], painel['Volume'])
+
+    obtido = calcular_matrizes(painel.valores, COLUNAS_INDICADORES)
+
+    for i, coluna in enumerate(COLUNAS_INDICADORES):
+        np.testing.assert_allclose(obtido[coluna], esperado[i], rtol=1e-9, atol=1e-9, equal_nan=True,
+                                   err_msg=coluna)
+
+def test_otimizacao_usa_o_registro():
+    dados = {'AAAA3.SA': _barras(300), 'CCCC3.SA': _barras(300, semente=2)}
+    painel = montar_painel(dados)
+    esperado = kernel.calcular_indicadores(painel['High'], painel['Low'], painel['Close'], painel['Volume'])
+
+    acoes, datas, matrizes = preparar_matrizes(dados)
+
+    assert acoes == ['AAAA3.SA', 'CCCC3.SA']
+    for coluna, matriz in matrizes.items():
+        referencia = painel[coluna] if coluna in painel.valores else esperado[kernel.INDICE[coluna]]
+        np.testing.assert_allclose(matriz, referencia, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=coluna)
+
+def test_memoria_pelo_conteudo_das_barras():
+    indicadores.limpar_memoria()
+    painel = _painel()
+    primeiro = calcular_matrizes(painel.valores, ['trend_sma_fast'], memorizar=True)
+
+    # Mesmo conteúdo (outra cópia): resultado memorizado
+    copia = {coluna: matriz.copy() for coluna, matriz in painel.valores.items()}
+    assert calcular_matrizes(copia, ['trend_sma_fast'], memorizar=True)['trend_sma_fast'] is primeiro['trend_sma_fast']
+
+    # Barra revisada no meio do histórico, última barra igual: recalcula
+    copia['Close'][0, 150] *= 1.1
+    revisado = calcular_matrizes(copia, ['trend_sma_fast'], memorizar=True)['trend_sma_fast']
+    assert revisado is not primeiro['trend_sma_fast']
+    assert not np.allclose(revisado[0, 150:160], primeiro['trend_sma_fast'][0, 150:160])
+    indicadores.limpar_memoria()
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trade_bot.src import indicadores_incrementais
+from trade_bot.src.data_pipeline import processar_dados
+from trade_bot.src.indicadores_incrementais import MotorIndicadores
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+
+TOLERANCIA = 1e-8
+
+def _barras(n=300, semente=7):
+    """Barras OHLCV sintéticas (passeio aleatório) em dias úteis"""
+    rng = np.random.default_rng(semente)
+    fechamento = 50 + np.cumsum(rng.normal(0, 1, n))
+    abertura = fechamento + rng.normal(0, 0.3, n)
+    amplitude = np.abs(rng.normal(0, 0.8, n))
+    return pd.DataFrame({
+        'Open': abertura,
+        'High': np.maximum(abertura, fechamento) + amplitude,
+        'Low': np.minimum(abertura, fechamento) - amplitude,
+        'Close': fechamento,
+        'Volume': rng.integers(100_000, 1_000_000, n).astype(float),
+    }, index=pd.bdate_range('2023-01-02', periods=n))
+
+def _comparar(obtido, esperado):
+    for coluna in COLUNAS_INDICADORES:
+        np.testing.assert_allclose(np.asarray(obtido[coluna], dtype='float64'),
+                                   np.asarray(esperado[coluna], dtype='float64'),
+                                   rtol=TOLERANCIA, atol=TOLERANCIA, err_msg=coluna)
+
+@pytest.fixture(autouse=True)
+def _motores_limpos():
+    indicadores_incrementais._motores.clear()
+    yield
+    indicadores_incrementais._motores.clear()
+
+def test_aquecer_igual_ao_calculo_em_lote():
+    dados = _barras()
+    lote = processar_dados(dados, min_periodos=1, compacto=False)
+    incremental = MotorIndicadores().aquecer(dados)
+
+    _comparar(incremental.loc[lote.index], lote)
+
+def test_nova_barra_igual_ao_calculo_em_lote():
+    dados = _barras()
+    motor = MotorIndicadores()
+    motor.aquecer(dados.iloc[:-1])
+    linha = motor.update(dados.iloc[-1], dados.index[-1])
+
+    lote = processar_dados(dados, min_periodos=1, compacto=False)
+    _comparar(pd.DataFrame([linha]), lote.iloc[[-1]])
+
+def test_revisao_da_ultima_barra_igual_ao_calculo_em_lote():
+    dados = _barras()
+    motor = MotorIndicadores()
+    motor.aquecer(dados)
+
+    # Pregão em andamento: a última barra chega de novo com outros preços e volume
+    revisados = dados.copy()
+    revisados.iloc[-1, revisados.columns.get_indexer(['High', 'Close', 'Volume'])] = [
+        revisados['High'].iloc[-1] + 2, revisados['Close'].iloc[-1] + 1.5, revisados['Volume'].iloc[-1] * 3]
+    linha = motor.update(revisados.iloc[-1], revisados.index[-1])
+
+    lote = processar_dados(revisados, min_periodos=1, compacto=False)
+    _comparar(pd.DataFrame([linha]), lote.iloc[[-1]])
+    assert motor.completas == len(lote)
+
+def test_atualizar_processa_so_barras_novas_e_refaz_apos_ajuste():
+    dados = _barras()
+    indicadores_incrementais.atualizar('TESTE', dados.iloc[:-5])
+    motor = indicadores_incrementais.obter_motor('TESTE')
+    linha = indicadores_incrementais.atualizar('TESTE', dados)
+
+    assert indicadores_incrementais.obter_motor('TESTE') is motor
+    _comparar(pd.DataFrame([linha]), processar_dados(dados, min_periodos=1, compacto=False).iloc[[-1]])
+
+    # Histórico reajustado pela fonte (ex.: dividendos): o motor é recriado
+    ajustados = dados.copy()
+    ajustados[['Open', 'High', 'Low', 'Close']] *= 0.9
+    linha = indicadores_incrementais.atualizar('TESTE', ajustados)
+
+    assert indicadores_incrementais.obter_motor('TESTE') is not motor
+    _comparar(pd.DataFrame([linha]), processar_dados(ajustados, min_periodos=1, compacto=False).iloc[[-1]])
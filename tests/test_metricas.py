@@ -0,0 +1,32 @@
+from trade_bot.src.metricas import Registro, combinar
+
+def _exposicao(duracoes, requisicoes=0):
+    registro = Registro()
+    etapas = registro.histograma('trade_bot_stage_duration_seconds', 'Duração de cada etapa', ('stage',),
+                                 limites=(0.1, 1.0))
+    for etapa, duracao in duracoes:
+        etapas.observar(duracao, stage=etapa)
+    http = registro.contador('trade_bot_http_requests_total', 'Requisições HTTP')
+    if requisicoes:
+        http.inc(requisicoes)
+    return registro.exportar()
+
+def _amostras(texto):
+    return {linha.rsplit(' ', 1)[0]: linha.rsplit(' ', 1)[1] for linha in texto.splitlines() if not linha.startswith('#')}
+
+def test_combinar_mantem_as_amostras_dos_dois_processos():
+    worker = _exposicao([('indicadores', 0.05)], requisicoes=3)
+    produtor = _exposicao([('download', 0.5), ('indicadores', 0.05)])
+
+    texto = combinar(worker, produtor)
+    amostras = _amostras(texto)
+
+    # A mesma família aparece uma vez, com as etapas dos dois processos
+    assert texto.count('# HELP trade_bot_stage_duration_seconds ') == 1
+    assert texto.count('# TYPE trade_bot_stage_duration_seconds ') == 1
+    assert amostras['trade_bot_stage_duration_seconds_count{process="worker",stage="indicadores"}'] == '1'
+    assert amostras['trade_bot_stage_duration_seconds_count{process="producer",stage="indicadores"}'] == '1'
+    assert amostras['trade_bot_stage_duration_seconds_bucket{process="producer",stage="download",le="1.0"}'] == '1'
+    # Métricas sem rótulos também ganham o do processo
+    assert amostras['trade_bot_http_requests_total{process="worker"}'] == '3'
+    assert 'trade_bot_http_requests_total{process="producer"}' not in amostras  # sem amostras no produtor
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from trade_bot.src import otimizacao
+from trade_bot.src.otimizacao import carregar_resultados, espaco_aleatorio, espaco_grade, identificador, otimizar
+
+ESPACO = {'rsi_compra': [25, 30, 35, 40], 'rsi_venda': [60, 65, 70, 75], 'adx_min': [20, 25, 30]}
+
+def test_busca_aleatoria_sem_repeticoes():
+    amostras = list(espaco_aleatorio(ESPACO, 20))
+
+    assert len(amostras) == 20
+    assert len({identificador(amostra) for amostra in amostras}) == 20
+
+def test_busca_aleatoria_limitada_a_grade():
+    grade = {identificador(configuracao) for configuracao in espaco_grade(ESPACO)}
+    amostras = list(espaco_aleatorio(ESPACO, 1000))
+
+    assert {identificador(amostra) for amostra in amostras} == grade
+    assert len(amostras) == len(grade)
+
+def test_busca_aleatoria_reprodutivel():
+    assert list(espaco_aleatorio(ESPACO, 10, semente=3)) == list(espaco_aleatorio(ESPACO, 10, semente=3))
+
+def test_configuracoes_com_erro_refeitas_na_retomada(monkeypatch, tmp_path):
+    falhar = {'rsi_compra': 30}
+
+    def avaliar(configuracao, acoes, datas, matrizes, opcoes=None):
+        if configuracao['rsi_compra'] == falhar.get('rsi_compra'):
+            raise ValueError('falha injetada')
+        return {'sharpe': configuracao['rsi_compra'] / 100}
+
+    # Os processos do pool herdam a substituição (fork)
+    monkeypatch.setattr(otimizacao, 'avaliar', avaliar)
+    acoes = ['AAAA3.SA']
+    datas = pd.bdate_range('2024-01-02', periods=5)
+    matrizes = {'Close': np.ones((1, 5))}
+    configuracoes = [{'rsi_compra': valor} for valor in (25, 30, 35)]
+    arquivo = str(tmp_path / 'otimizacao.jsonl')
+
+    melhores = otimizar(acoes, datas, matrizes, configuracoes, arquivo=arquivo, processos=1, tamanho_lote=1)
+
+    assert [r['configuracao']['rsi_compra'] for r in melhores] == [35, 25]
+    assert [r['configuracao'] for r in carregar_resultados(str(tmp_path / 'otimizacao_erros.jsonl'))] == [
+        {'rsi_compra': 30}]
+
+    # Na retomada só a configuração que falhou é avaliada de novo
+    falhar.clear()
+    melhores = otimizar(acoes, datas, matrizes, configuracoes, arquivo=arquivo, processos=1, tamanho_lote=1)
+
+    assert [r['configuracao']['rsi_compra'] for r in melhores] == [35, 30, 25]
+    assert len(carregar_resultados(arquivo)) == 3
@@ -0,0 +1,127 @@
+import pytest
+
+from trade_bot.src.web import snapshot
+from trade_bot.src.web.snapshot import ArmazemSnapshot, Atualizador, FilaSobDemanda
+from trade_bot.src.web.snapshot_compartilhado import ArmazemCompartilhado, diretorio_pedidos, publicar
+
+RESULTADO = {'universo': 3, 'com_dados': 3, 'pre_selecionadas': 1,
+             'ranking': [{'symbol': 'PETR4.SA', 'signal': 1, 'score': 0.5}], 'tempos': {}}
+
+@pytest.fixture
+def triagens(monkeypatch):
+    """Substitui triar por um resultado fixo e conta as execuções"""
+    chamadas = []
+
+    def triar(resultados=None):
+        chamadas.append(resultados)
+        return RESULTADO
+
+    monkeypatch.setattr(snapshot, 'triar', triar)
+    return chamadas
+
+@pytest.fixture
+def calculos(monkeypatch):
+    """Substitui construir_snapshot por resumos fixos e registra as ações calculadas"""
+    chamadas = []
+
+    def construir_snapshot(acoes, mercado_aberto, sob_demanda=False):
+        chamadas.append((list(acoes), sob_demanda))
+        return {acao: {'symbol': acao, 'price': 10.0} for acao in acoes}
+
+    monkeypatch.setattr(snapshot, 'construir_snapshot', construir_snapshot)
+    return chamadas
+
+def test_triagem_feita_pelo_atualizador(triagens):
+    armazem = ArmazemSnapshot()
+    publicados = []
+    atualizador = Atualizador(armazem, [], lambda: False, publicar=publicados.append)
+
+    assert armazem.triagem() is None
+    atualizador.atualizar_triagem()
+    atualizador.atualizar_triagem()
+
+    versao, vencimento, resultado = armazem.triagem()
+    assert versao == 2 and resultado == RESULTADO
+    assert vencimento == atualizador.agendador_triagem.proximo()[0].timestamp()
+    assert triagens == [None, None]
+    assert publicados == [armazem, armazem]
+
+def test_triagem_publicada_aos_workers(triagens, tmp_path):
+    caminho = str(tmp_path / 'snapshot.bin')
+    armazem = ArmazemSnapshot()
+    Atualizador(armazem, [], lambda: False).atualizar_triagem()
+
+    publicar(armazem, caminho)
+    leitor = ArmazemCompartilhado(caminho)
+
+    assert leitor.triagem() == armazem.triagem()
+
+@pytest.mark.parametrize('em_arquivos', [False, True], ids=['memória', 'diretório'])
+def test_fila_sob_demanda_junta_pedidos(tmp_path, em_arquivos):
+    fila = FilaSobDemanda(str(tmp_path / 'pedidos') if em_arquivos else None, intervalo=0.01)
+
+    assert fila.retirar(0.02) == []
+    fila.pedir('VALE3.SA')
+    fila.pedir('PETR4.SA')
+    fila.pedir('VALE3.SA')
+
+    assert fila.retirar(1.0) == ['PETR4.SA', 'VALE3.SA']
+    assert fila.retirar(0.02) == []
+
+def test_acao_pedida_calculada_pelo_atualizador(calculos):
+    armazem = ArmazemSnapshot()
+    publicados = []
+    atualizador = Atualizador(armazem, [], lambda: False, publicar=publicados.append, triagem=False)
+
+    assert armazem.obter_sob_demanda('WEGE3.SA') is None
+    armazem.pedidos.pedir('WEGE3.SA')
+    atualizador.atender_pedidos(timeout=0)
+
+    assert calculos == [(['WEGE3.SA'], True)]
+    dados = armazem.obter_sob_demanda('WEGE3.SA')
+    assert dados['price'] == 10.0 and not dados['stale']
+    assert publicados == [armazem]
+
+    # Sem pedidos, nada é calculado nem publicado
+    atualizador.atender_pedidos(timeout=0)
+    assert len(calculos) == 1 and len(publicados) == 1
+
+def test_pedido_do_worker_atendido_pelo_produtor(calculos, tmp_path):
+    caminho = str(tmp_path / 'snapshot.bin')
+    produtor = ArmazemSnapshot()
+    produtor.pedidos = FilaSobDemanda(diretorio_pedidos(caminho))
+    atualizador = Atualizador(produtor, [], lambda: False, publicar=lambda armazem: publicar(armazem, caminho),
+                              triagem=False)
+    publicar(produtor, caminho)
+    worker = ArmazemCompartilhado(caminho)
+
+    assert worker.obter_sob_demanda('WEGE3.SA') is None
+    worker.pedidos.pedir('WEGE3.SA')
+    atualizador.atender_pedidos(timeout=0)
+
+    assert calculos == [(['WEGE3.SA'], True)]
+    assert worker.obter_sob_demanda('WEGE3.SA')['price'] == 10.0
+
+def test_republicacao_lida_pelo_worker(tmp_path):
+    caminho = str(tmp_path / 'snapshot.bin')
+    produtor = ArmazemSnapshot()
+    produtor.atualizar({'PETR4.SA': {'symbol': 'PETR4.SA', 'price': 30.0},
+                        'VALE3.SA': {'symbol': 'VALE3.SA', 'price': 60.0}})
+    publicar(produtor, caminho)
+    worker = ArmazemCompartilhado(caminho)
+
+    assert worker.obter('PETR4.SA')['price'] == 30.0
+    assert worker.versao == 1
+    mapeados = worker._itens
+
+    produtor.atualizar({'PETR4.SA': {'symbol': 'PETR4.SA', 'price': 31.0}})
+    publicar(produtor, caminho)
+
+    # A troca é atômica: nenhum temporário fica para trás e o worker lê a nova versão
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['snapshot.bin']
+    assert worker.obter('PETR4.SA')['price'] == 31.0
+    assert worker.versao == 2
+    assert [delta['price'] for _, delta in worker.eventos_desde(2)] == [31.0]
+    # O mapeamento anterior continua válido para quem ainda o lê
+    assert mapeados['VALE3.SA'][0]['price'] == 60.0
+    assert mapeados['PETR4.SA'][0]['price'] == 30.0
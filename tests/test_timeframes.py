@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from trade_bot.src import timeframes
+from trade_bot.src.timeframes import baixar_timeframes, reamostrar
+
+def _barras(indice, semente=5):
+    rng = np.random.default_rng(semente)
+    fechamento = 20 + np.cumsum(rng.normal(0, 0.05, len(indice)))
+    return pd.DataFrame({'Open': fechamento, 'High': fechamento + 0.02, 'Low': fechamento - 0.02,
+                         'Close': fechamento, 'Volume': 100.0}, index=pd.DatetimeIndex(indice, name='Date'))
+
+def _intradiarias(dias):
+    """Barras de 5 minutos das 10h às 17h (sem a última) em cada dia"""
+    return pd.DatetimeIndex([dia + pd.Timedelta(minutes=minutos) for dia in dias for minutos in range(600, 1020, 5)])
+
+def _fonte(monkeypatch, por_intervalo):
+    chamadas = []
+
+    def baixar_conforme_chegam(acoes, periodo='2y', intervalo='1d', **kwargs):
+        chamadas.append(intervalo)
+        for acao in acoes:
+            yield acao, por_intervalo[intervalo]
+
+    monkeypatch.setattr(timeframes, 'baixar_conforme_chegam', baixar_conforme_chegam)
+    return chamadas
+
+def test_intervalo_intradiario_completa_o_historico_diario(monkeypatch):
+    dias = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=500)
+    recentes = _intradiarias(dias[-41:])
+    diarios = _barras(dias)
+    intradiarios = _barras(recentes, semente=6)
+    chamadas = _fonte(monkeypatch, {'5m': intradiarios, '1d': diarios})
+
+    resultado = baixar_timeframes(['PETR4.SA'], timeframes=['15m', '1d', '1wk'], periodo='2y', intervalo='5m')
+
+    assert sorted(chamadas) == ['1d', '5m']
+    diario = resultado['1d']['PETR4.SA']
+    assert len(diario) == len(dias)
+    # Histórico antigo do download diário, dias cobertos pelas barras de 5m reamostrados delas
+    pd.testing.assert_frame_equal(diario.iloc[:-41], diarios.iloc[:-41], check_freq=False)
+    pd.testing.assert_frame_equal(diario.iloc[-41:], reamostrar(intradiarios, '1d'), check_freq=False)
+    pd.testing.assert_frame_equal(resultado['1wk']['PETR4.SA'], reamostrar(diario, '1wk'))
+    pd.testing.assert_frame_equal(resultado['15m']['PETR4.SA'], reamostrar(intradiarios, '15m'))
+
+def test_intervalo_diario_baixa_uma_vez(monkeypatch):
+    dias = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=100)
+    chamadas = _fonte(monkeypatch, {'1d': _barras(dias)})
+
+    resultado = baixar_timeframes(['PETR4.SA'], timeframes=['1d', '1wk'], periodo='2y', intervalo='1d')
+
+    assert chamadas == ['1d']
+    assert len(resultado['1d']['PETR4.SA']) == 100
+
+def test_registra_timeframe_com_barras_insuficientes(monkeypatch, caplog):
+    dias = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=30)
+    _fonte(monkeypatch, {'1d': _barras(dias)})
+    monkeypatch.setattr(timeframes, '_avisados', {})
+
+    with caplog.at_level('WARNING', logger=timeframes.__name__):
+        baixar_timeframes(['PETR4.SA'], timeframes=['1d'], periodo='2y', intervalo='1d', min_periodos=50)
+        baixar_timeframes(['PETR4.SA'], timeframes=['1d'], periodo='2y', intervalo='1d', min_periodos=50)
+
+    avisos = [registro.getMessage() for registro in caplog.records]
+    assert len(avisos) == 1 and 'PETR4.SA' in avisos[0]
+
+def test_entrega_cada_acao_assim_que_chega(monkeypatch):
+    dias = pd.bdate_range(end=pd.Timestamp.now().normalize(), periods=100)
+    baixadas = []
+
+    def baixar_conforme_chegam(acoes, periodo='2y', intervalo='1d', **kwargs):
+        for acao in acoes:
+            baixadas.append(acao)
+            yield acao, _barras(dias)
+
+    monkeypatch.setattr(timeframes, 'baixar_conforme_chegam', baixar_conforme_chegam)
+    entregas = timeframes.timeframes_conforme_chegam(['PETR4.SA', 'VALE3.SA'], timeframes=['1d', '1wk'],
+                                                     intervalo='1d')
+
+    acao, derivados = next(entregas)
+    assert acao == 'PETR4.SA' and baixadas == ['PETR4.SA']  # a segunda ação ainda não chegou
+    pd.testing.assert_frame_equal(derivados['1wk'], reamostrar(derivados['1d'], '1wk'))
+    assert [acao for acao, _ in entregas] == ['VALE3.SA']
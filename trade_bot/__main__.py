@@ -0,0 +1,3 @@
+from trade_bot.cli import main
+
+main()
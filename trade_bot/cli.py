@@ -0,0 +1,102 @@
+"""
+Linha de comando do trade_bot.
+
+Cada subcomando importa apenas os módulos do seu caminho: listar as ações
+não carrega pandas, e o servidor não carrega matplotlib nem yfinance (este
+só é importado quando a fonte Yahoo é usada). O custo de importação de cada
+subcomando é medido na suíte de benchmarks (benchmarks/suite.py).
+
+Uso:
+    trade-bot serve [--host 0.0.0.0] [--porta 5000] [--debug | --workers N]
+    trade-bot produce [--arquivo snapshot.bin]
+    trade-bot monitor
+    trade-bot backtest [PETR4.SA ...] [--periodo 5y] [--alocacao ativos] [--vendido]
+    trade-bot scan [--universo arquivo.txt] [--resultados 20]
+    trade-bot acoes
+
+(ou python -m trade_bot <subcomando>)
+"""
+import argparse
+import importlib
+import logging
+import sys
+
+from trade_bot.config import ACOES, LOG_NIVEL
+
+# Módulo carregado por cada subcomando
+MODULOS = {
+    'serve': 'trade_bot.src.web.server',
+    'produce': 'trade_bot.src.web.snapshot_compartilhado',
+    'monitor': 'trade_bot.src.main',
+    'backtest': 'trade_bot.src.backtest',
+    'scan': 'trade_bot.src.triagem',
+    'acoes': 'trade_bot.config',
+}
+
+def carregar(comando):
+    """Importa o módulo do subcomando (é o que a suíte de benchmarks mede)"""
+    return importlib.import_module(MODULOS[comando])
+
+def _serve(args, resto):
+    if args.workers is not None:
+        # Modo de produção: o servidor é importado pelo processo principal, depois de iniciar o produtor
+        importlib.import_module('trade_bot.src.web.producao').servir(args.workers or None, args.host, args.porta)
+        return
+    server = carregar('serve')
+    server.app.run(host=args.host, port=args.porta, debug=args.debug)
+
+def _produce(args, resto):
+    carregar('produce').main(['--arquivo', args.arquivo] if args.arquivo else [])
+
+def _monitor(args, resto):
+    carregar('monitor').main()
+
+def _backtest(args, resto):
+    carregar('backtest').main(resto, prog='trade-bot backtest')
+
+def _scan(args, resto):
+    carregar('scan').main(resto, prog='trade-bot scan')
+
+def _acoes(args, resto):
+    for acao in carregar('acoes').ACOES:
+        print(acao)
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='trade-bot', description=__doc__.strip().splitlines()[0])
+    subcomandos = parser.add_subparsers(dest='comando', required=True, metavar='{serve,produce,monitor,backtest,scan,acoes}')
+
+    serve = subcomandos.add_parser('serve', help='Servidor web (dashboard, APIs e /metrics)')
+    serve.add_argument('--host', default='0.0.0.0')
+    serve.add_argument('--porta', type=int, default=5000)
+    modo = serve.add_mutually_exclusive_group()
+    modo.add_argument('--debug', action='store_true', help='Modo de desenvolvimento do Flask (recarga automática)')
+    modo.add_argument('--workers', type=int, metavar='N',
+                      help='Modo de produção: N processos (0 = um por núcleo) e um único produtor do snapshot')
+    serve.set_defaults(executar=_serve)
+
+    produce = subcomandos.add_parser('produce', help='Produtor do snapshot para workers externos (ex.: gunicorn)')
+    produce.add_argument('--arquivo', help='Arquivo publicado (padrão: TRADE_BOT_SNAPSHOT)')
+    produce.set_defaults(executar=_produce)
+
+    monitor = subcomandos.add_parser('monitor', help='Monitoramento agendado pelo calendário da B3')
+    monitor.set_defaults(executar=_monitor)
+
+    # backtest e scan repassam as opções para o módulo (python -m trade_bot.src.<módulo> --help)
+    backtest = subcomandos.add_parser('backtest', help='Backtest da carteira', add_help=False)
+    backtest.set_defaults(executar=_backtest)
+    scan = subcomandos.add_parser('scan', help='Triagem do universo de ações', add_help=False)
+    scan.set_defaults(executar=_scan)
+
+    acoes = subcomandos.add_parser('acoes', help=f'Lista as ações monitoradas ({len(ACOES)})')
+    acoes.set_defaults(executar=_acoes)
+    return parser
+
+def main(argv=None):
+    args, resto = criar_parser().parse_known_args(argv)
+    if resto and args.comando not in ('backtest', 'scan'):
+        criar_parser().error(f"argumentos não reconhecidos: {' '.join(resto)}")
+    logging.basicConfig(level=LOG_NIVEL, format='%(levelname)s %(name)s: %(message)s')
+    args.executar(args, resto)
+
+if __name__ == '__main__':
+    sys.exit(main())
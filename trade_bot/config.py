@@ -1,7 +1,122 @@
+import os
+
 # Configurações gerais
 PERIODO_DADOS = "2y"
 MIN_PERIODOS = 50
 
+# Nível de log (DEBUG, INFO, WARNING...): mensagens abaixo dele não são formatadas nem emitidas
+LOG_NIVEL = os.getenv('TRADE_BOT_LOG', 'INFO').upper()
+
+# Armazenamento local de dados (um arquivo por ação)
+DIRETORIO_DADOS = os.getenv('TRADE_BOT_DADOS', os.path.join(os.path.expanduser('~'), '.trade_bot', 'dados'))
+SOBREPOSICAO_BARRAS = 5  # Barras baixadas novamente para detectar ajustes no histórico
+
+# Múltiplos timeframes: as barras de INTERVALO_BASE são baixadas uma única vez e
+# os demais timeframes são obtidos localmente por reamostragem (ex.: '5m' com
+# TIMEFRAMES = ['15m', '60m', '1d']). Com um intervalo intradiário, o histórico
+# diário anterior ao que a fonte fornece nele é baixado à parte
+INTERVALO_BASE = '1d'
+TIMEFRAMES = ['1d']
+# Dias de histórico que a fonte fornece por intervalo intradiário (limites do Yahoo)
+HISTORICO_MAXIMO_INTERVALO = {'1m': 7, '2m': 60, '5m': 60, '15m': 60, '30m': 60, '60m': 730, '90m': 60, '1h': 730}
+
+# Fonte de dados: 'yahoo' ou 'arquivo' (fixtures CSV locais, para uso offline)
+FONTE_DADOS = os.getenv('TRADE_BOT_FONTE', 'yahoo')
+DIRETORIO_FIXTURES = os.getenv('TRADE_BOT_FIXTURES', os.path.join(os.path.expanduser('~'), '.trade_bot', 'fixtures'))
+
+# Snapshot das ações servido pela interface web (atualizado em segundo plano)
+SNAPSHOT_INTERVALO = 60  # Segundos entre atualizações durante o pregão
+SNAPSHOT_TTL = 120  # Segundos de atraso sobre a próxima atualização agendada até o snapshot ser marcado como desatualizado
+SNAPSHOT_ESPERA_INICIAL = 30  # Segundos que a primeira requisição espera pelo snapshot inicial
+SOB_DEMANDA_MAXIMO = 100  # Ações do universo da triagem (fora de ACOES) calculadas sob demanda e mantidas em memória
+SSE_HEARTBEAT = 15  # Segundos sem mudanças até enviar um heartbeat no streaming
+SSE_HISTORICO = 1000  # Deltas mantidos em memória para retomada (Last-Event-ID)
+SSE_RETRY_MS = 5000  # Intervalo de reconexão sugerido aos navegadores
+
+# Modo de produção (trade-bot serve --workers N): um único produtor calcula o snapshot e o publica em um
+# arquivo mapeado em memória, lido por todos os workers. Com TRADE_BOT_SNAPSHOT_COMPARTILHADO=1 o servidor
+# só lê o arquivo, sem calcular o snapshot (ex.: workers do gunicorn ao lado de um trade-bot produce)
+ARQUIVO_SNAPSHOT = os.getenv('TRADE_BOT_SNAPSHOT', os.path.join(os.path.expanduser('~'), '.trade_bot', 'snapshot.bin'))
+SNAPSHOT_COMPARTILHADO = os.getenv('TRADE_BOT_SNAPSHOT_COMPARTILHADO') == '1'
+SNAPSHOT_SINCRONIZACAO = 0.5  # Segundos entre verificações de nova versão do arquivo no streaming
+SERVIDOR_WORKERS = None  # Processos do servidor de produção (None = um por núcleo)
+
+# Cache HTTP das APIs (Cache-Control max-age, em segundos, conforme o status do mercado; nunca passa da próxima atualização)
+CACHE_MAX_AGE_ABERTO = 30
+CACHE_MAX_AGE_FECHADO = 3600
+NIVEL_GZIP = 6
+
+# Coleta concorrente de dados na fonte
+COLETA_CONCORRENCIA = 4  # Requisições simultâneas
+COLETA_TAXA = 2.0  # Requisições por segundo (balde de tokens)
+COLETA_RAJADA = 4  # Requisições acumuladas que podem sair de uma vez
+COLETA_TENTATIVAS = 3  # Tentativas por ação
+COLETA_TIMEOUT = 30  # Prazo de cada requisição, em segundos
+COLETA_BACKOFF_BASE = 1.0  # Espera base entre tentativas (dobra a cada falha, com jitter)
+COLETA_BACKOFF_MAX = 30.0
+COLETA_LOTE = 10  # Ações por requisição (1 = uma requisição por ação)
+DISJUNTOR_FALHAS = 5  # Falhas seguidas até abrir o circuito da ação
+DISJUNTOR_PAUSA = 300  # Segundos sem requisições para a ação com circuito aberto
+
+# Calendário da B3 e agendamento
+FUSO_HORARIO = 'America/Sao_Paulo'
+PREGAO_ABERTURA = '10:00'
+PREGAO_FECHAMENTO = '17:55'
+FERIADOS_EXTRAS = []  # Datas 'AAAA-MM-DD' sem pregão além dos feriados regulares
+PREGOES_ESPECIAIS = {}  # {'AAAA-MM-DD': ('abertura', 'fechamento')} para horários especiais
+INTERVALO_MONITORAMENTO = 3600  # Segundos por barra no monitoramento (main)
+ATRASO_BARRA = 120  # Segundos após o fechamento da barra até a análise
+ATRASO_CONSOLIDACAO = 1800  # Segundos após o fechamento do pregão até a consolidação do dia
+
+# Gráficos de análise
+DIRETORIO_GRAFICOS = os.getenv('TRADE_BOT_GRAFICOS', '.')
+GRAFICOS_DPI = 300
+GRAFICOS_RAPIDO = False  # Figura reutilizada e barras agrupadas
+GRAFICOS_MAX_BARRAS = 300  # Barras de volume/MACD no modo rápido
+GRAFICOS_PROCESSOS = None  # Processos para gerar gráficos (None = número de núcleos)
+
+# Alertas por e-mail (a senha fica na variável de ambiente EMAIL_PASSWORD, ou no .env)
+EMAIL_CONFIG = {
+    'remetente': os.getenv('EMAIL_REMETENTE', ''),
+    'destinatario': os.getenv('EMAIL_DESTINATARIO', ''),  # Vários separados por vírgula
+    'servidor': os.getenv('EMAIL_SERVIDOR', 'smtp.gmail.com'),
+    'porta': int(os.getenv('EMAIL_PORTA', '465')),
+    'seguranca': os.getenv('EMAIL_SEGURANCA', 'ssl'),  # 'ssl', 'starttls' ou 'nenhuma' (servidor local de teste)
+    'timeout': 30,
+}
+ALERTAS_ATIVOS = os.getenv('TRADE_BOT_ALERTAS', '0') == '1'  # Alertas de mudança de sinal no monitoramento
+ALERTAS_CANAIS = ['email']  # 'email' e/ou 'log'
+ALERTAS_INTERVALO_DIGEST = 60  # Segundos acumulando mudanças de sinal em uma única mensagem (0 = envio imediato)
+ALERTAS_LIMITES = {'email': (20, 5), 'log': (3600, 60)}  # Por canal: (mensagens por hora, rajada)
+ALERTAS_TENTATIVAS = 3  # Tentativas de envio de cada mensagem (com backoff)
+ALERTAS_ESTADO = os.getenv('TRADE_BOT_ALERTAS_ESTADO', os.path.join(os.path.expanduser('~'), '.trade_bot', 'alertas.json'))  # Último sinal alertado por ação
+SMTP_CONEXOES = 2  # Conexões SMTP mantidas abertas
+SMTP_OCIOSA_MAX = 240  # Segundos sem uso até a conexão ser testada (NOOP) antes de reaproveitada
+
+# Histórico de sinais: indicadores e Sinal de cada barra avaliada, por ação e timeframe (SQLite)
+HISTORICO_ATIVO = True
+ARQUIVO_HISTORICO = os.getenv('TRADE_BOT_HISTORICO', os.path.join(os.path.expanduser('~'), '.trade_bot', 'historico.sqlite3'))
+HISTORICO_RETENCAO_DIAS = None  # Barras diárias mantidas (None = sem limite); as mudanças de sinal são sempre mantidas
+HISTORICO_RETENCAO_INTRADIARIO_DIAS = 180  # Barras dos timeframes intradiários
+HISTORICO_INTERVALO_COMPACTACAO = 24 * 3600  # Segundos entre as limpezas automáticas (retenção + liberação de espaço)
+HISTORICO_LIMITE_CONSULTA = 5000  # Linhas por resposta da API
+
+# Representação compacta dos dados processados (universos grandes ou históricos longos)
+MODO_COMPACTO = os.getenv('TRADE_BOT_COMPACTO', '0') == '1'  # Indicadores em float32 e Sinal em int8
+DESCARTAR_INTERMEDIARIAS = False  # Remove Open/High/Low depois do cálculo dos indicadores
+ORCAMENTO_MEMORIA_ACAO = 1024 * 1024  # Bytes por ação nos dados mantidos pelo pipeline; acima disso o pipeline avisa (None = sem limite)
+
+# Triagem do universo (pré-filtro nas últimas barras + pipeline completo nas sobreviventes)
+ARQUIVO_UNIVERSO = os.getenv('TRADE_BOT_UNIVERSO', os.path.join(os.path.expanduser('~'), '.trade_bot', 'universo.txt'))
+PERIODO_TRIAGEM = '3mo'  # Histórico baixado para o pré-filtro de todo o universo
+TRIAGEM_LIQUIDEZ_MIN = 1_000_000  # Volume financeiro médio mínimo (R$ por barra)
+TRIAGEM_VOLUME_REL = 1.5  # Volume relativo que aprova a ação no pré-filtro
+TRIAGEM_MARGEM_RSI = 5  # Pontos de RSI antes dos limites de sobrecompra/sobrevenda
+TRIAGEM_RESULTADOS = 20  # Ações no ranking
+TRIAGEM_ATIVA = False  # Executa a triagem a cada ciclo do monitoramento
+INTERVALO_TRIAGEM = 900  # Segundos por ciclo da triagem na interface web, durante o pregão
+TRIAGEM_SERVIDOR = True  # Triagem em segundo plano para /api/triagem (no atualizador do servidor ou no produtor)
+
 # Lista de ações para monitorar
 #ACOES = ["PETR4.SA"]
 
@@ -18,13 +133,29 @@ SMA_LENTA = 50
 ADX_PERIODO = 14
 ADX_LIMITE = 25  # Força mínima da tendência
 
+# MACD
+MACD_RAPIDA = 12
+MACD_LENTA = 26
+MACD_SINAL = 9
+
 # Configurações de volume
 VOLUME_MIN = 1.5  # Volume mínimo em relação à média
+VOLUME_PERIODO = 20  # Janela da média de volume
 
 # Configurações de Bollinger Bands
 BB_PERIODO = 20
 BB_DESVIO = 2
 
+# Backtest (custos de negociação na B3, em fração do valor negociado)
+CAPITAL_INICIAL = 100000.0
+CORRETAGEM_ORDEM = 0.0  # Corretagem fixa por ordem, em R$
+CORRETAGEM_PERCENTUAL = 0.0  # Corretagem proporcional ao valor da ordem
+EMOLUMENTOS = 0.0003  # Negociação (0,005%) + liquidação (0,025%)
+SLIPPAGE = 0.0005  # Diferença estimada entre o preço do sinal e o executado
+TAXA_LIVRE_RISCO = 0.0  # Taxa anual usada no Sharpe (ex.: CDI)
+BARRAS_ANO = 252  # Pregões por ano
+MEMORIA_ROBUSTEZ_MB = 256  # Memória das matrizes temporárias por lote na simulação de Monte Carlo
+
 # Configurações da estratégia
 PARAMS = {
     # RSI
@@ -44,4 +175,13 @@ PARAMS = {
 }
 
 # Lista de ações
-ACOES = ['PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'ABEV3.SA', 'WEGE3.SA', 'MGLU3.SA', 'LREN3.SA', 'BBAS3.SA', 'BPAC11.SA']
\ No newline at end of file
+ACOES = ['PETR4.SA', 'VALE3.SA', 'ITUB4.SA', 'BBDC4.SA', 'ABEV3.SA', 'WEGE3.SA', 'MGLU3.SA', 'LREN3.SA', 'BBAS3.SA', 'BPAC11.SA']
+
+# Espaço de busca da otimização (listas = valores da grade; tuplas = intervalos na busca aleatória)
+ESPACO_PARAMS = {
+    'rsi_compra': [25, 30, 35, 40],
+    'rsi_venda': [60, 65, 70, 75],
+    'volume_min': [1.0, 1.25, 1.5, 2.0],
+    'adx_min': [20, 25, 30],
+    # usar_adx fica de fora: strategy.gerar_sinais não o lê, o filtro de ADX está sempre ativo
+}
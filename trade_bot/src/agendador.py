@@ -0,0 +1,86 @@
+"""
+Agendamento de tarefas pelo calendário da B3.
+
+Durante o pregão a tarefa roda logo após o fechamento de cada barra (barras
+de intervalo segundos contadas a partir da abertura, mais a última, que
+termina no fechamento). Fora do pregão nada roda, exceto uma consolidação
+por dia, um pouco depois do fechamento, quando os dados do dia já estão
+definitivos. Usado pelo monitoramento (main) e pelo atualizador do
+snapshot da interface web.
+"""
+import threading
+from datetime import timedelta
+
+from trade_bot.config import ATRASO_BARRA, ATRASO_CONSOLIDACAO
+from trade_bot.src.calendario import agora_b3, horario_pregao, FUSO
+
+# Dias procurados à frente até achar um pregão (cobre Carnaval e fim de ano)
+DIAS_BUSCA = 15
+
+BARRA = 'barra'
+CONSOLIDACAO = 'consolidacao'
+
+class Agendador:
+    """
+    Horários de execução alinhados ao fechamento das barras
+
+    Args:
+        intervalo: Duração da barra, em segundos
+        atraso: Segundos após o fechamento da barra até a execução
+        consolidacao: Segundos após o fechamento do pregão até a consolidação
+    """
+
+    def __init__(self, intervalo, atraso=ATRASO_BARRA, consolidacao=ATRASO_CONSOLIDACAO):
+        self.intervalo = timedelta(seconds=intervalo)
+        self.atraso = timedelta(seconds=atraso)
+        self.consolidacao = timedelta(seconds=consolidacao)
+
+    def disparos(self, dia):
+        """Execuções da data: lista de (momento, tipo), em ordem; vazia sem pregão"""
+        horario = horario_pregao(dia)
+        if horario is None:
+            return []
+        abertura, fechamento = horario
+        disparos = []
+        fim_barra = abertura + self.intervalo
+        while fim_barra < fechamento:
+            disparos.append((fim_barra + self.atraso, BARRA))
+            fim_barra += self.intervalo
+        disparos.append((fechamento + self.atraso, BARRA))
+        if self.consolidacao > self.atraso:
+            disparos.append((fechamento + self.consolidacao, CONSOLIDACAO))
+        else:
+            disparos[-1] = (fechamento + self.atraso, CONSOLIDACAO)
+        return disparos
+
+    def proximo(self, apos=None):
+        """Próxima execução depois do momento informado (sem fuso, é tomado como horário da B3): (momento, tipo)"""
+        if apos is None:
+            apos = agora_b3()
+        else:
+            apos = apos.replace(tzinfo=FUSO) if apos.tzinfo is None else apos.astimezone(FUSO)
+        dia = apos.date()
+        for _ in range(DIAS_BUSCA):
+            for momento, tipo in self.disparos(dia):
+                if momento > apos:
+                    return momento, tipo
+            dia += timedelta(days=1)
+        raise RuntimeError(f"Nenhum pregão nos próximos {DIAS_BUSCA} dias a partir de {apos.date()}")
+
+    def executar(self, tarefa, parar=None, espera_maxima=300):
+        """
+        Chama tarefa(tipo) em cada horário até parar (threading.Event) ser sinalizado
+
+        A espera é feita em etapas de no máximo espera_maxima segundos, para
+        acompanhar ajustes do relógio e suspensões da máquina.
+        """
+        parar = parar or threading.Event()
+        while not parar.is_set():
+            momento, tipo = self.proximo()
+            while not parar.is_set():
+                restante = (momento - agora_b3()).total_seconds()
+                if restante <= 0:
+                    break
+                parar.wait(min(restante, espera_maxima))
+            if not parar.is_set():
+                tarefa(tipo)
@@ -1,17 +1,415 @@
-import smtplib
-from email.mime.text import MIMEText
-from config import EMAIL_CONFIG
+"""
+Alertas de mudança de sinal.
+
+O monitoramento chama Despachante.notificar para cada ação; só mudanças em
+relação ao último sinal alertado da ação (guardado em config.ALERTAS_ESTADO)
+viram alertas. A chamada apenas enfileira o evento: uma thread do
+despachante acumula as mudanças de cada intervalo (config.ALERTAS_INTERVALO_DIGEST)
+em uma única mensagem por canal, respeitando o limite de mensagens de cada
+canal (config.ALERTAS_LIMITES). O sinal de uma ação só é gravado como
+alertado depois da entrega; mensagens que falham continuam pendentes e são
+reenviadas no prazo seguinte. O e-mail usa conexões SMTP persistentes,
+refeitas quando o servidor as encerra.
+
+Para testar sem um provedor de e-mail, veja smtp_local.py.
+"""
+import json
+import logging
 import os
+import queue
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from email.message import EmailMessage
+
 from dotenv import load_dotenv
 
+from trade_bot.config import (EMAIL_CONFIG, ALERTAS_CANAIS, ALERTAS_INTERVALO_DIGEST, ALERTAS_LIMITES, ALERTAS_TENTATIVAS,
+                              ALERTAS_ESTADO, SMTP_CONEXOES, SMTP_OCIOSA_MAX)
+from trade_bot.src.coleta import BaldeTokens, backoff
+from trade_bot.src.metricas import registro
+
 load_dotenv()  # Carrega variáveis do .env
 
+logger = logging.getLogger(__name__)
+
+ALERTAS = registro.contador(
+    'trade_bot_alerts_total', 'Mensagens de alerta por canal e resultado (enviado, falha, adiado)', ('channel', 'result'))
+EVENTOS = registro.contador(
+    'trade_bot_alert_events_total', 'Sinais recebidos pelo despachante (transicao, repetido)', ('result',))
+LATENCIA = registro.histograma(
+    'trade_bot_alert_latency_seconds', 'Tempo entre a mudança de sinal e a entrega do alerta', ('channel',))
+PENDENTES = registro.medidor(
+    'trade_bot_alert_pending', 'Mudanças de sinal aguardando envio, por canal', ('channel',))
+
+Evento = namedtuple('Evento', 'acao sinal anterior preco data criado')
+
+def rotulo(sinal):
+    """COMPRAR, VENDER ou MANTER"""
+    return 'COMPRAR' if sinal > 0 else 'VENDER' if sinal < 0 else 'MANTER'
+
+def criar_mensagem(assunto, corpo, config=EMAIL_CONFIG):
+    mensagem = EmailMessage()
+    mensagem['Subject'] = assunto
+    mensagem['From'] = config['remetente']
+    mensagem['To'] = ', '.join(destinatarios(config))
+    mensagem.set_content(corpo)
+    return mensagem
+
+def destinatarios(config=EMAIL_CONFIG):
+    return [endereco.strip() for endereco in config['destinatario'].split(',') if endereco.strip()]
+
+class PoolSMTP:
+    """
+    Conexões SMTP persistentes, reaproveitadas entre mensagens
+
+    Uma conexão parada há mais de ociosa_max segundos é testada com NOOP
+    antes de reaproveitada. Se o servidor tiver encerrado a conexão, a
+    mensagem é reenviada uma vez por uma conexão nova.
+
+    Args:
+        config: Servidor, porta, segurança ('ssl', 'starttls' ou 'nenhuma') e remetente
+        tamanho: Conexões simultâneas
+        ociosa_max: Segundos sem uso até a conexão ser testada
+        senha: Senha do remetente (padrão: variável EMAIL_PASSWORD; sem senha não há login)
+    """
+
+    def __init__(self, config=EMAIL_CONFIG, tamanho=SMTP_CONEXOES, ociosa_max=SMTP_OCIOSA_MAX, senha=None):
+        self.config = config
+        self.ociosa_max = ociosa_max
+        self.senha = os.getenv('EMAIL_PASSWORD') if senha is None else senha
+        self.conexoes_abertas = 0  # Conexões criadas desde o início
+        self._livres = []  # (conexão, último uso)
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._lock = threading.Lock()
+
+    def _conectar(self):
+        servidor, porta, timeout = self.config['servidor'], self.config['porta'], self.config.get('timeout', 30)
+        if self.config.get('seguranca', 'ssl') == 'ssl':
+            conexao = smtplib.SMTP_SSL(servidor, porta, timeout=timeout)
+        else:
+            conexao = smtplib.SMTP(servidor, porta, timeout=timeout)
+            if self.config.get('seguranca') == 'starttls':
+                conexao.starttls()
+        try:
+            if self.senha:
+                conexao.login(self.config['remetente'], self.senha)
+        except Exception:
+            self._descartar(conexao)
+            raise
+        with self._lock:
+            self.conexoes_abertas += 1
+        return conexao
+
+    @staticmethod
+    def _descartar(conexao):
+        try:
+            conexao.quit()
+        except Exception:
+            conexao.close()
+
+    def _obter(self):
+        with self._lock:
+            livre = self._livres.pop() if self._livres else None
+        if livre is None:
+            return self._conectar()
+        conexao, ultimo_uso = livre
+        if time.monotonic() - ultimo_uso > self.ociosa_max:
+            try:
+                ativa = conexao.noop()[0] == 250
+            except (smtplib.SMTPException, OSError):
+                ativa = False
+            if not ativa:
+                self._descartar(conexao)
+                return self._conectar()
+        return conexao
+
+    def _devolver(self, conexao):
+        with self._lock:
+            self._livres.append((conexao, time.monotonic()))
+
+    def enviar(self, mensagem):
+        """Envia uma email.message.EmailMessage (bloqueia enquanto todas as conexões estão em uso)"""
+        with self._vagas:
+            conexao = self._obter()
+            try:
+                conexao.send_message(mensagem)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # Recusa do servidor: uma nova conexão não resolveria
+                self._descartar(conexao)
+                raise
+            except OSError as e:
+                # Conexão encerrada pelo servidor (inatividade, reinício): uma nova tentativa
+                logger.info("Conexão SMTP perdida (%s); reconectando", e)
+                conexao.close()
+                conexao = self._conectar()
+                try:
+                    conexao.send_message(mensagem)
+                except Exception:
+                    self._descartar(conexao)
+                    raise
+            self._devolver(conexao)
+
+    def fechar(self):
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for conexao, _ in livres:
+            self._descartar(conexao)
+
+class CanalEmail:
+    """Alertas por e-mail para config.EMAIL_CONFIG['destinatario']"""
+
+    nome = 'email'
+
+    def __init__(self, pool=None, config=EMAIL_CONFIG):
+        self.config = config
+        self.pool = pool or obter_pool()
+
+    def enviar(self, assunto, corpo):
+        self.pool.enviar(criar_mensagem(assunto, corpo, self.config))
+
+    def fechar(self):
+        self.pool.fechar()
+
+class CanalLog:
+    """Alertas no log do processo (nível WARNING)"""
+
+    nome = 'log'
+
+    def enviar(self, assunto, corpo):
+        logger.warning("%s\n%s", assunto, corpo)
+
+CANAIS = {'email': CanalEmail, 'log': CanalLog}
+
+def formatar_digest(eventos):
+    """Assunto e corpo de uma mensagem com as mudanças de sinal de várias ações"""
+    eventos = sorted(eventos, key=lambda evento: evento.acao)
+    if len(eventos) == 1:
+        assunto = f"Alerta de Trading: {eventos[0].acao}"
+    else:
+        assunto = f"Alertas de Trading: {len(eventos)} ações"
+    linhas = []
+    for evento in eventos:
+        preco = f" a R${evento.preco:.2f}" if evento.preco is not None else ''
+        data = f" em {evento.data}" if evento.data is not None else ''
+        linhas.append(f"{rotulo(evento.sinal)} {evento.acao}{preco}{data} (antes: {rotulo(evento.anterior)})")
+    return assunto, '\n'.join(linhas)
+
+_PARAR = object()
+
+class Despachante:
+    """
+    Fila de alertas de mudança de sinal, com uma mensagem por intervalo e canal
+
+    Args:
+        canais: Canais de envio (padrão: config.ALERTAS_CANAIS)
+        intervalo: Segundos acumulando mudanças antes de enviar (0 = envio imediato)
+        limites: {canal: (mensagens por hora, rajada)}; acima do limite a mensagem
+            espera e recebe as mudanças seguintes
+        arquivo_estado: JSON com o último sinal alertado por ação (None = só em memória)
+    """
+
+    def __init__(self, canais=None, intervalo=ALERTAS_INTERVALO_DIGEST, limites=ALERTAS_LIMITES,
+                 arquivo_estado=ALERTAS_ESTADO):
+        self.canais = canais if canais is not None else [CANAIS[nome]() for nome in ALERTAS_CANAIS]
+        self.intervalo = intervalo
+        self.arquivo_estado = arquivo_estado
+        self._baldes = {}
+        for canal in self.canais:
+            por_hora, rajada = limites.get(canal.nome, (float('inf'), 1))
+            self._baldes[canal.nome] = BaldeTokens(por_hora / 3600, rajada) if por_hora != float('inf') else None
+        self._estado = self._carregar_estado()  # último sinal entregue por ação (gravado em arquivo_estado)
+        self._vistos = dict(self._estado)  # último sinal recebido por ação, entregue ou ainda pendente
+        self._alterado = False
+        self._fila = queue.Queue()
+        self._pendentes = {canal.nome: {} for canal in self.canais}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._descarregar = True
+
+    def _carregar_estado(self):
+        if not self.arquivo_estado or not os.path.exists(self.arquivo_estado):
+            return {}
+        try:
+            with open(self.arquivo_estado) as arquivo:
+                return {acao: int(sinal) for acao, sinal in json.load(arquivo).items()}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning("Estado dos alertas ilegível (%s): %s; recomeçando do zero", self.arquivo_estado, e)
+            return {}
+
+    def _salvar_estado(self):
+        with self._lock:
+            if not self._alterado or not self.arquivo_estado:
+                return
+            estado, self._alterado = dict(self._estado), False
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_estado) or '.', exist_ok=True)
+            temporario = f"{self.arquivo_estado}.{os.getpid()}.tmp"
+            with open(temporario, 'w') as arquivo:
+                json.dump(estado, arquivo, indent=1, sort_keys=True)
+            os.replace(temporario, self.arquivo_estado)
+        except OSError as e:
+            logger.warning("Erro ao salvar o estado dos alertas em %s: %s", self.arquivo_estado, e)
+
+    def ultimo_sinal(self, acao):
+        """Último sinal alertado (entregue) da ação (0 se nunca houve alerta)"""
+        with self._lock:
+            return self._estado.get(acao, 0)
+
+    def notificar(self, acao, sinal, preco=None, data=None):
+        """
+        Registra o sinal atual da ação; enfileira um alerta se ele mudou
+
+        Não bloqueia: o envio acontece na thread do despachante.
+
+        Returns:
+            True se houve mudança de sinal
+        """
+        sinal = int(sinal)
+        with self._lock:
+            anterior = self._vistos.get(acao, 0)
+            if sinal == anterior:
+                # Já alertado, ou pendente de entrega (reenviado pela thread do despachante)
+                EVENTOS.inc(result='repetido')
+                return False
+            self._vistos[acao] = sinal
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name='alertas', daemon=True)
+                self._thread.start()
+        EVENTOS.inc(result='transicao')
+        self._fila.put(Evento(acao, sinal, anterior, None if preco is None else float(preco), data, time.monotonic()))
+        return True
+
+    def parar(self, descarregar=True, timeout=30):
+        """
+        Encerra a thread do despachante e fecha as conexões
+
+        Args:
+            descarregar: Envia já as mensagens pendentes (sem esperar o intervalo nem o limite do canal)
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._descarregar = descarregar
+            self._fila.put(_PARAR)
+            thread.join(timeout)
+        self._salvar_estado()
+        for canal in self.canais:
+            if hasattr(canal, 'fechar'):
+                canal.fechar()
+
+    def _acumular(self, evento):
+        for canal in self.canais:
+            pendentes = self._pendentes[canal.nome]
+            anterior = pendentes.get(evento.acao)
+            if anterior is not None:
+                # Várias mudanças da mesma ação no intervalo: vale a líquida
+                evento = evento._replace(anterior=anterior.anterior, criado=anterior.criado)
+            if evento.sinal == evento.anterior:
+                pendentes.pop(evento.acao, None)
+            else:
+                pendentes[evento.acao] = evento
+        PENDENTES.substituir({(nome, ): len(pendentes) for nome, pendentes in self._pendentes.items()})
+
+    def _entregar(self, canal):
+        """Envia as mudanças pendentes do canal; se todas as tentativas falharem, elas continuam pendentes"""
+        eventos = list(self._pendentes[canal.nome].values())
+        assunto, corpo = formatar_digest(eventos)
+        for tentativa in range(ALERTAS_TENTATIVAS):
+            try:
+                canal.enviar(assunto, corpo)
+            except Exception as e:
+                if tentativa + 1 == ALERTAS_TENTATIVAS:
+                    ALERTAS.inc(channel=canal.nome, result='falha')
+                    logger.error("Falha ao enviar alerta por %s (%d ações): %s", canal.nome, len(eventos), e)
+                    return False
+                logger.warning("Erro ao enviar alerta por %s (tentativa %d): %s", canal.nome, tentativa + 1, e)
+                time.sleep(backoff(tentativa))
+            else:
+                ALERTAS.inc(channel=canal.nome, result='enviado')
+                LATENCIA.observar(time.monotonic() - min(evento.criado for evento in eventos), channel=canal.nome)
+                self._pendentes[canal.nome] = {}
+                PENDENTES.definir(0, channel=canal.nome)
+                self._confirmar(eventos)
+                return True
+
+    def _confirmar(self, eventos):
+        """Grava como alertado o sinal das ações entregues que não estão pendentes em outro canal"""
+        with self._lock:
+            for evento in eventos:
+                if not any(evento.acao in pendentes for pendentes in self._pendentes.values()):
+                    self._estado[evento.acao] = evento.sinal
+                    self._alterado = True
+        self._salvar_estado()
+
+    def _executar(self):
+        prazos = {}  # {canal: instante (monotônico) de envio da mensagem pendente}
+        while True:
+            espera = max(0.0, min(prazos.values()) - time.monotonic()) if prazos else None
+            try:
+                evento = self._fila.get(timeout=espera)
+            except queue.Empty:
+                evento = None
+            if evento is _PARAR:
+                if self._descarregar:
+                    for canal in self.canais:
+                        if self._pendentes[canal.nome]:
+                            self._entregar(canal)
+                return
+            if evento is not None:
+                self._acumular(evento)
+                # Mudanças que chegam juntas (um ciclo do monitoramento) entram na mesma mensagem
+                while True:
+                    try:
+                        evento = self._fila.get_nowait()
+                    except queue.Empty:
+                        break
+                    if evento is _PARAR:
+                        self._fila.put(_PARAR)
+                        break
+                    self._acumular(evento)
+
+            agora = time.monotonic()
+            for canal in self.canais:
+                if not self._pendentes[canal.nome]:
+                    prazos.pop(canal.nome, None)
+                    continue
+                prazo = prazos.setdefault(canal.nome, agora + self.intervalo)
+                if prazo > agora:
+                    continue
+                balde = self._baldes[canal.nome]
+                if balde is None or balde.tentar():
+                    if self._entregar(canal):
+                        del prazos[canal.nome]
+                    else:
+                        # Falhou: as mudanças ficam pendentes e são reenviadas no prazo seguinte
+                        prazos[canal.nome] = time.monotonic() + max(self.intervalo, backoff(ALERTAS_TENTATIVAS))
+                else:
+                    # Acima do limite do canal: a mensagem espera e acumula as mudanças seguintes
+                    ALERTAS.inc(channel=canal.nome, result='adiado')
+                    prazos[canal.nome] = agora + balde.espera()
+
+_pool = None
+_despachante = None
+_lock = threading.RLock()
+
+def obter_pool():
+    """Conexões SMTP compartilhadas pelo processo"""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = PoolSMTP()
+        return _pool
+
+def obter_despachante():
+    """Despachante compartilhado (mantém o último sinal de cada ação entre ciclos)"""
+    global _despachante
+    with _lock:
+        if _despachante is None:
+            _despachante = Despachante()
+        return _despachante
+
 def enviar_email(mensagem, acao):
-    msg = MIMEText(mensagem)
-    msg['Subject'] = f"Alerta de Trading: {acao}"
-    msg['From'] = EMAIL_CONFIG['remetente']
-    msg['To'] = EMAIL_CONFIG['destinatario']
-    
-    with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-        smtp.login(EMAIL_CONFIG['remetente'], os.getenv('EMAIL_PASSWORD'))
-        smtp.send_message(msg)
\ No newline at end of file
+    """Envia um alerta avulso por e-mail, na hora (sem fila, sem limite de envio)"""
+    obter_pool().enviar(criar_mensagem(f"Alerta de Trading: {acao}", mensagem))
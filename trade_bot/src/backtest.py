@@ -1,16 +1,361 @@
-import matplotlib.pyplot as plt
+import argparse
+import logging
 
-def executar_backtest(dados):
-    dados['Retorno_Strategy'] = dados['Retorno'] * dados['Sinal'].shift(1)
+import numpy as np
+import pandas as pd
+from trade_bot.config import (CAPITAL_INICIAL, CORRETAGEM_ORDEM, CORRETAGEM_PERCENTUAL, EMOLUMENTOS, SLIPPAGE,
+                              TAXA_LIVRE_RISCO, BARRAS_ANO, ACOES, PERIODO_DADOS, MIN_PERIODOS)
+
+logger = logging.getLogger(__name__)
+
+ALOCACOES = ('fixa', 'ativos')
+
+class ResultadoBacktest:
+    """
+    Resultado do backtest de uma carteira.
+
+    Séries no eixo de datas comum (patrimônio, retornos, drawdown), a matriz
+    de pesos efetivamente mantidos (ações × barras), os trades fechados ou em
+    aberto e o resumo das métricas.
+    """
+
+    def __init__(self, acoes, datas, patrimonio, retornos, pesos, negociado, custos, trades, capital):
+        self.acoes = list(acoes)
+        self.datas = datas
+        self.patrimonio = pd.Series(patrimonio, index=datas, name='Patrimonio')
+        self.retornos = pd.Series(retornos, index=datas, name='Retorno')
+        self.drawdown = self.patrimonio / self.patrimonio.cummax() - 1
+        self.pesos = pesos
+        self.negociado = negociado
+        self.custos = custos
+        self.trades = trades
+        self.capital = capital
+        self.metricas = calcular_metricas(self)
+
+    def resumo(self):
+        """Métricas formatadas para exibição"""
+        m = self.metricas
+        return (f"Retorno total: {m['retorno_total']:.2%} | Anual: {m['retorno_anual']:.2%} | "
+                f"Sharpe: {m['sharpe']:.2f} | Drawdown máx.: {m['drawdown_maximo']:.2%} | "
+                f"Giro anual: {m['giro_anual']:.2f} | Trades: {m['trades']} "
+                f"(acerto {m['taxa_acerto']:.1%})")
+
+def alinhar_sinais(com_sinais_por_acao):
+    """
+    Alinha a saída de gerar_sinais de várias ações em um eixo de datas comum
+
+    Returns:
+        (acoes, datas, fechamento, sinais): fechamento é uma matriz float64
+        (ações × barras) com NaN onde a ação não tem barra; sinais é int8 com 0
+        nessas posições
+    """
+    acoes = [acao for acao, df in com_sinais_por_acao.items() if df is not None and not df.empty]
+    if not acoes:
+        return [], pd.DatetimeIndex([]), np.empty((0, 0)), np.empty((0, 0), dtype=np.int8)
+
+    indices = [pd.DatetimeIndex(com_sinais_por_acao[acao].index) for acao in acoes]
+    datas = indices[0]
+    for indice in indices[1:]:
+        datas = datas.union(indice)
+
+    fechamento = np.full((len(acoes), len(datas)), np.nan)
+    sinais = np.zeros((len(acoes), len(datas)), dtype=np.int8)
+    for i, (acao, indice) in enumerate(zip(acoes, indices)):
+        df = com_sinais_por_acao[acao]
+        posicoes = datas.get_indexer(indice)
+        fechamento[i, posicoes] = df['Close'].to_numpy(dtype='float64')
+        sinais[i, posicoes] = df['Sinal'].to_numpy()
+    return acoes, datas, fechamento, sinais
+
+def _ultimo_evento(eventos):
+    """Índice da barra do último evento até cada barra (-1 antes do primeiro)"""
+    barras = np.arange(eventos.shape[-1])
+    return np.maximum.accumulate(np.where(eventos, barras, -1), axis=-1)
+
+def _nivel_no_evento(sinais, ultimo):
+    """Módulo do sinal na barra do último evento (0 antes do primeiro)"""
+    nivel = np.take_along_axis(np.abs(sinais), np.maximum(ultimo, 0), axis=-1)
+    return np.where(ultimo >= 0, nivel, 0)
+
+def calcular_posicoes(sinais, entrada=1, saida=1, vendido=False, tamanhos=None):
+    """
+    Converte sinais (-2 a 2) em posições, sem laços sobre as barras
+
+    Uma posição comprada é aberta quando o sinal atinge +entrada e mantida até
+    o sinal chegar a -saida; com vendido=True, a posição vendida é simétrica.
+    Como entrada >= saida, um sinal de entrada num sentido também encerra a
+    posição no sentido oposto.
+
+    Args:
+        sinais: Matriz (ações × barras) ou vetor de sinais
+        entrada: Nível mínimo (1 ou 2) para abrir posição
+        saida: Nível mínimo no sentido oposto (0 a 2) para encerrar; 0 encerra
+            assim que o sinal deixa de ser favorável
+        vendido: Permite posições vendidas
+        tamanhos: Dicionário {nível: fração} com o tamanho da posição conforme o
+            nível do último sinal de entrada (padrão: 1 para qualquer nível)
+
+    Returns:
+        Matriz float64 de posições em [-1, 1], decididas no fechamento da barra
+    """
+    if entrada not in (1, 2) or saida not in (0, 1, 2) or saida > entrada:
+        raise ValueError(f"Combinação inválida de entrada ({entrada}) e saída ({saida})")
+
+    sinais = np.asarray(sinais)
+    tabela = np.ones(3)
+    if tamanhos is not None:
+        tabela[:] = 0.0
+        for nivel, fracao in tamanhos.items():
+            tabela[abs(int(nivel))] = fracao
+
+    # Posição comprada: houve entrada depois da última saída
+    ultima_compra = _ultimo_evento(sinais >= entrada)
+    comprado = ultima_compra > _ultimo_evento(sinais <= -saida)
+    posicoes = np.where(comprado, tabela[_nivel_no_evento(sinais, ultima_compra)], 0.0)
+
+    if vendido:
+        ultima_venda = _ultimo_evento(sinais <= -entrada)
+        vendido_em = ultima_venda > _ultimo_evento(sinais >= saida)
+        posicoes -= np.where(vendido_em, tabela[_nivel_no_evento(sinais, ultima_venda)], 0.0)
+    return posicoes
+
+def alocar(posicoes, alocacao='fixa', peso_maximo=1.0):
+    """
+    Distribui o capital entre as posições
+
+    'fixa' reserva 1/N do capital para cada uma das N ações; 'ativos' divide o
+    capital igualmente entre as posições abertas na barra, limitado a
+    peso_maximo por ação (o restante fica em caixa).
+    """
+    if alocacao not in ALOCACOES:
+        raise ValueError(f"Alocação desconhecida: {alocacao} (use {', '.join(ALOCACOES)})")
+
+    posicoes = np.atleast_2d(posicoes)
+    if alocacao == 'fixa':
+        pesos = posicoes / posicoes.shape[0]
+    else:
+        abertas = np.count_nonzero(posicoes, axis=0)
+        pesos = posicoes / np.maximum(abertas, 1)
+    return np.clip(pesos, -peso_maximo, peso_maximo)
+
+def calcular_retornos(fechamento):
+    """
+    Retornos simples por barra (ações × barras)
+
+    Barras sem preço têm retorno 0; a barra seguinte é comparada com o último
+    preço conhecido, de modo que o retorno acumulado atravessa lacunas.
+    """
+    validos = ~np.isnan(fechamento)
+    ultimo = np.maximum.accumulate(np.where(validos, np.arange(fechamento.shape[-1]), 0), axis=-1)
+    precos = np.take_along_axis(fechamento, ultimo, axis=-1)
+
+    retornos = np.zeros_like(fechamento)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        retornos[:, 1:] = precos[:, 1:] / precos[:, :-1] - 1
+    retornos[~validos] = 0.0
+    return np.nan_to_num(retornos, nan=0.0, posinf=0.0, neginf=0.0)
+
+def _deslocar(matriz, barras):
+    """Desloca as colunas para a direita, preenchendo com zero"""
+    if barras == 0:
+        return matriz
+    saida = np.zeros_like(matriz)
+    saida[:, barras:] = matriz[:, :-barras]
+    return saida
+
+def extrair_trades(acoes, datas, pesos, retornos, custo_percentual):
+    """
+    Estatísticas por trade (sequência de barras com posição no mesmo sentido)
+
+    Args:
+        pesos: Pesos mantidos em cada barra (já com o atraso de execução)
+        retornos: Retornos por barra (ações × barras)
+        custo_percentual: Custo por lado, em fração do valor negociado
+
+    Returns:
+        DataFrame com ação, sentido, datas de entrada e saída, duração em barras,
+        retorno líquido de custos proporcionais e se o trade segue aberto
+    """
+    colunas = ['acao', 'sentido', 'entrada', 'saida', 'barras', 'retorno', 'aberto']
+    sentido = np.sign(pesos)
+    anterior = np.zeros_like(sentido)
+    anterior[:, 1:] = sentido[:, :-1]
+    inicios = (sentido != 0) & (sentido != anterior)
+    if not inicios.any():
+        return pd.DataFrame(columns=colunas)
+
+    # Cada barra mantida rende o retorno da barra seguinte
+    proximos = np.zeros_like(retornos)
+    proximos[:, :-1] = retornos[:, 1:]
+
+    mantidos = (sentido != 0).ravel()
+    ids = np.cumsum(inicios.ravel())[mantidos] - 1
+    log_retornos = np.log1p(np.maximum(sentido * proximos, -1 + 1e-12)).ravel()[mantidos]
+
+    n_trades = int(inicios.sum())
+    soma = np.bincount(ids, weights=log_retornos, minlength=n_trades)
+    barras = np.bincount(ids, minlength=n_trades)
+
+    linha, coluna_inicio = np.nonzero(inicios)
+    coluna_fim = coluna_inicio + barras - 1
+    aberto = coluna_fim >= len(datas) - 1
+    coluna_saida = np.minimum(coluna_fim + 1, len(datas) - 1)
+
+    retorno = np.exp(soma) * (1 - custo_percentual) * np.where(aberto, 1.0, 1 - custo_percentual) - 1
+
+    return pd.DataFrame({
+        'acao': np.asarray(acoes, dtype=object)[linha],
+        'sentido': np.where(sentido[linha, coluna_inicio] > 0, 'compra', 'venda'),
+        'entrada': datas[coluna_inicio],
+        'saida': datas[coluna_saida],
+        'barras': barras,
+        'retorno': retorno,
+        'aberto': aberto,
+    }, columns=colunas)
+
+def executar_carteira(acoes, datas, fechamento, sinais, capital=CAPITAL_INICIAL, entrada=1, saida=1,
+                      vendido=False, tamanhos=None, alocacao='fixa', peso_maximo=1.0, atraso=1,
+                      corretagem_ordem=CORRETAGEM_ORDEM, corretagem_percentual=CORRETAGEM_PERCENTUAL,
+                      emolumentos=EMOLUMENTOS, slippage=SLIPPAGE):
+    """
+    Backtest vetorizado de uma carteira
+
+    Todas as etapas operam sobre matrizes (ações × barras). Os pesos de cada
+    ação ficam constantes entre mudanças de sinal (rebalanceamento implícito,
+    sem custo); os custos incidem sobre a variação dos pesos.
+
+    Args:
+        acoes, datas, fechamento, sinais: Dados alinhados (ver alinhar_sinais)
+        capital: Patrimônio inicial em R$
+        entrada, saida, vendido, tamanhos: Regras de posição (ver calcular_posicoes)
+        alocacao, peso_maximo: Distribuição do capital (ver alocar)
+        atraso: Barras entre o sinal e a execução (1 = fechamento do pregão seguinte)
+        corretagem_ordem: R$ por ordem executada
+        corretagem_percentual, emolumentos, slippage: Frações do valor negociado
+
+    Returns:
+        ResultadoBacktest
+    """
+    fechamento = np.atleast_2d(np.asarray(fechamento, dtype='float64'))
+    sinais = np.atleast_2d(np.asarray(sinais))
+
+    retornos = calcular_retornos(fechamento)
+    pesos = _deslocar(alocar(calcular_posicoes(sinais, entrada, saida, vendido, tamanhos), alocacao, peso_maximo), atraso)
+
+    # Pesos mantidos em t rendem o retorno de t+1
+    bruto = np.zeros(fechamento.shape[1])
+    bruto[1:] = np.einsum('it,it->t', pesos[:, :-1], retornos[:, 1:])
+
+    variacao = np.abs(np.diff(pesos, axis=1, prepend=0.0))
+    negociado = variacao.sum(axis=0)
+    ordens = np.count_nonzero(variacao, axis=0)
+    custo_percentual = corretagem_percentual + emolumentos + slippage
+
+    # P[t] = P[t-1] * (1 + bruto[t] - custos[t]) - corretagem fixa[t], resolvido em forma fechada
+    fator = np.cumprod(1 + bruto - negociado * custo_percentual)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fixos = np.cumsum(np.where(fator > 0, corretagem_ordem * ordens / fator, 0.0))
+    patrimonio = np.maximum(fator * (capital - fixos), 0.0)
+
+    anterior = np.concatenate(([capital], patrimonio[:-1]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        retornos_carteira = np.where(anterior > 0, patrimonio / anterior - 1, 0.0)
+    custos = anterior * negociado * custo_percentual + corretagem_ordem * ordens
+
+    trades = extrair_trades(acoes, datas, pesos, retornos, custo_percentual)
+    return ResultadoBacktest(acoes, datas, patrimonio, retornos_carteira, pesos, negociado, custos, trades, capital)
+
+def backtest_carteira(com_sinais_por_acao, **opcoes):
+    """Backtest da carteira a partir de {ação: DataFrame de gerar_sinais}"""
+    acoes, datas, fechamento, sinais = alinhar_sinais(com_sinais_por_acao)
+    if not acoes:
+        logger.error("Nenhuma ação com sinais para o backtest")
+        return None
+    return executar_carteira(acoes, datas, fechamento, sinais, **opcoes)
+
+def calcular_metricas(resultado):
+    """Retorno, risco, giro e estatísticas de trades de um ResultadoBacktest"""
+    retornos = resultado.retornos.to_numpy()
+    patrimonio = resultado.patrimonio.to_numpy()
+    anos = max(len(retornos) / BARRAS_ANO, 1 / BARRAS_ANO)
+
+    final = patrimonio[-1] if len(patrimonio) else resultado.capital
+    retorno_total = final / resultado.capital - 1
+    retorno_anual = (final / resultado.capital) ** (1 / anos) - 1 if final > 0 else -1.0
+
+    excesso = retornos - ((1 + TAXA_LIVRE_RISCO) ** (1 / BARRAS_ANO) - 1)
+    desvio = retornos.std(ddof=1) if len(retornos) > 1 else 0.0
+    sharpe = excesso.mean() / desvio * np.sqrt(BARRAS_ANO) if desvio > 0 else 0.0
+
+    trades = resultado.trades
+    fechados = trades[~trades['aberto']] if len(trades) else trades
+    ganhos = fechados['retorno'][fechados['retorno'] > 0].sum() if len(fechados) else 0.0
+    perdas = -fechados['retorno'][fechados['retorno'] < 0].sum() if len(fechados) else 0.0
+
+    return {
+        'patrimonio_final': float(final),
+        'retorno_total': float(retorno_total),
+        'retorno_anual': float(retorno_anual),
+        'volatilidade_anual': float(desvio * np.sqrt(BARRAS_ANO)),
+        'sharpe': float(sharpe),
+        'drawdown_maximo': float(resultado.drawdown.min()) if len(patrimonio) else 0.0,
+        'giro_anual': float(resultado.negociado.sum() / 2 / anos),
+        'custos_totais': float(resultado.custos.sum()),
+        'exposicao_media': float(np.abs(resultado.pesos).sum(axis=0).mean()) if resultado.pesos.size else 0.0,
+        'trades': int(len(trades)),
+        'taxa_acerto': float((fechados['retorno'] > 0).mean()) if len(fechados) else 0.0,
+        'retorno_medio_trade': float(fechados['retorno'].mean()) if len(fechados) else 0.0,
+        'melhor_trade': float(fechados['retorno'].max()) if len(fechados) else 0.0,
+        'pior_trade': float(fechados['retorno'].min()) if len(fechados) else 0.0,
+        'duracao_media': float(trades['barras'].mean()) if len(trades) else 0.0,
+        'fator_lucro': float(ganhos / perdas) if perdas > 0 else float('inf') if ganhos > 0 else 0.0,
+    }
+
+def executar_backtest(dados, **opcoes):
+    """
+    Backtest de uma única ação a partir da saída de gerar_sinais
+
+    Acrescenta Retorno, Retorno_Strategy e os acumulados usados por
+    plotar_resultados. As opções são as de executar_carteira.
+    """
+    resultado = executar_carteira(['acao'], pd.DatetimeIndex(dados.index), dados['Close'].to_numpy()[None, :],
+                                  dados['Sinal'].to_numpy()[None, :], **opcoes)
+    dados['Retorno'] = dados['Close'].pct_change().fillna(0.0)
+    dados['Retorno_Strategy'] = resultado.retornos.to_numpy()
     dados['Retorno_Acum'] = (1 + dados['Retorno']).cumprod()
     dados['Retorno_Strategy_Acum'] = (1 + dados['Retorno_Strategy']).cumprod()
     return dados
 
 def plotar_resultados(dados, acao):
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12,6))
     plt.plot(dados['Retorno_Acum'], label='Buy & Hold')
     plt.plot(dados['Retorno_Strategy_Acum'], label='Estratégia')
     plt.title(f'Desempenho: {acao}')
     plt.legend()
     plt.savefig(f'resultados_{acao.split(".")[0]}.png')
-    plt.close()
\ No newline at end of file
+    plt.close()
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Backtest da carteira com os parâmetros de config.PARAMS')
+    parser.add_argument('acoes', nargs='*', help='Ações (padrão: config.ACOES)')
+    parser.add_argument('--periodo', default=PERIODO_DADOS)
+    parser.add_argument('--alocacao', choices=ALOCACOES, default='fixa')
+    parser.add_argument('--vendido', action='store_true', help='Opera vendido nos sinais de venda')
+    args = parser.parse_args(argv)
+
+    from trade_bot.src.data_pipeline import baixar_varios
+    from trade_bot.src.painel import processar_painel
+    from trade_bot.src.strategy import gerar_sinais
+
+    processados = processar_painel(baixar_varios(args.acoes or ACOES, periodo=args.periodo), min_periodos=MIN_PERIODOS)
+    com_sinais = {acao: gerar_sinais(dados) for acao, dados in processados.items()}
+    resultado = backtest_carteira(com_sinais, alocacao=args.alocacao, vendido=args.vendido)
+    if resultado is None:
+        return
+    print(f"{len(resultado.acoes)} ações, {resultado.datas[0]:%d/%m/%Y} a {resultado.datas[-1]:%d/%m/%Y}")
+    print(resultado.resumo())
+
+if __name__ == '__main__':
+    main()
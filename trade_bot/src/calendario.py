@@ -0,0 +1,112 @@
+"""
+Calendário de negociação da B3.
+
+Feriados nacionais (fixos e móveis, a partir da Páscoa), os dias sem pregão
+próprios da bolsa (24/12 e último dia útil do ano), pregões com horário
+especial (Quarta-feira de Cinzas abre às 13:00) e o fuso America/Sao_Paulo.
+Datas avulsas (feriados extras ou horários especiais divulgados pela B3) são
+configuradas em FERIADOS_EXTRAS e PREGOES_ESPECIAIS.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+from trade_bot.config import FUSO_HORARIO, PREGAO_ABERTURA, PREGAO_FECHAMENTO, FERIADOS_EXTRAS, PREGOES_ESPECIAIS
+
+FUSO = ZoneInfo(FUSO_HORARIO)
+
+def _hora(texto):
+    return time.fromisoformat(texto)
+
+def pascoa(ano):
+    """Domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)"""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return date(ano, mes, dia + 1)
+
+@lru_cache(maxsize=None)
+def feriados(ano):
+    """Dias sem pregão no ano: {data: descrição}"""
+    p = pascoa(ano)
+    dias = {
+        date(ano, 1, 1): 'Confraternização Universal',
+        p - timedelta(days=48): 'Carnaval',
+        p - timedelta(days=47): 'Carnaval',
+        p - timedelta(days=2): 'Sexta-feira Santa',
+        date(ano, 4, 21): 'Tiradentes',
+        date(ano, 5, 1): 'Dia do Trabalho',
+        p + timedelta(days=60): 'Corpus Christi',
+        date(ano, 9, 7): 'Independência do Brasil',
+        date(ano, 10, 12): 'Nossa Senhora Aparecida',
+        date(ano, 11, 2): 'Finados',
+        date(ano, 11, 15): 'Proclamação da República',
+        date(ano, 12, 24): 'Véspera de Natal',
+        date(ano, 12, 25): 'Natal',
+    }
+    if ano >= 2024:
+        dias[date(ano, 11, 20)] = 'Dia Nacional de Zumbi e da Consciência Negra'
+
+    # Não há pregão no último dia útil do ano
+    ultimo = date(ano, 12, 31)
+    while ultimo.weekday() >= 5:
+        ultimo -= timedelta(days=1)
+    dias.setdefault(ultimo, 'Último dia útil do ano')
+
+    for texto in FERIADOS_EXTRAS:
+        extra = date.fromisoformat(texto)
+        if extra.year == ano:
+            dias[extra] = 'Feriado extra'
+    return dias
+
+def eh_pregao(dia):
+    """Indica se há pregão na data"""
+    return dia.weekday() < 5 and dia not in feriados(dia.year)
+
+def horario_pregao(dia):
+    """
+    Abertura e fechamento do pregão na data, no fuso da B3
+
+    Returns:
+        (abertura, fechamento) como datetimes com fuso, ou None se não houver pregão
+    """
+    if not eh_pregao(dia):
+        return None
+    abertura, fechamento = _hora(PREGAO_ABERTURA), _hora(PREGAO_FECHAMENTO)
+    especial = PREGOES_ESPECIAIS.get(dia.isoformat())
+    if especial:
+        abertura, fechamento = _hora(especial[0]), _hora(especial[1])
+    elif dia == pascoa(dia.year) - timedelta(days=46):
+        abertura = time(13, 0)  # Quarta-feira de Cinzas
+    return datetime.combine(dia, abertura, FUSO), datetime.combine(dia, fechamento, FUSO)
+
+def agora_b3():
+    """Momento atual no fuso da B3"""
+    return datetime.now(FUSO)
+
+def mercado_aberto(momento=None):
+    """Indica se o pregão está em andamento (momento sem fuso é tomado como horário da B3)"""
+    momento = agora_b3() if momento is None else momento
+    momento = momento.replace(tzinfo=FUSO) if momento.tzinfo is None else momento.astimezone(FUSO)
+    horario = horario_pregao(momento.date())
+    return horario is not None and horario[0] <= momento <= horario[1]
+
+def proximo_pregao(dia):
+    """Primeira data com pregão a partir de dia (inclusive)"""
+    while not eh_pregao(dia):
+        dia += timedelta(days=1)
+    return dia
+
+def pregao_anterior(dia):
+    """Última data com pregão antes de dia (exclusive)"""
+    dia -= timedelta(days=1)
+    while not eh_pregao(dia):
+        dia -= timedelta(days=1)
+    return dia
@@ -0,0 +1,285 @@
+"""
+Coleta concorrente de dados, com limite de taxa, novas tentativas e disjuntor.
+
+As requisições à fonte (lotes de ações via fetch_many) rodam em um pool de
+threads com limite de concorrência. Um balde de tokens limita a taxa de
+requisições; falhas são repetidas com backoff exponencial com jitter; cada
+requisição tem prazo próprio; e ações que falham seguidamente têm o circuito
+aberto e ficam sem requisições por um tempo. Os resultados são entregues
+conforme ficam prontos.
+"""
+import heapq
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from trade_bot.config import (COLETA_CONCORRENCIA, COLETA_TAXA, COLETA_RAJADA, COLETA_TENTATIVAS, COLETA_TIMEOUT,
+                              COLETA_BACKOFF_BASE, COLETA_BACKOFF_MAX, COLETA_LOTE, DISJUNTOR_FALHAS, DISJUNTOR_PAUSA)
+from trade_bot.src.data_source import FonteDados, obter_fonte
+from trade_bot.src.metricas import registro
+
+DURACAO_REQUISICOES = registro.histograma(
+    'trade_bot_fetch_duration_seconds', 'Duração das requisições à fonte de dados', ('result',))
+RETENTATIVAS = registro.contador(
+    'trade_bot_fetch_retries_total', 'Novas tentativas de download por ação', ('symbol',))
+FALHAS = registro.contador(
+    'trade_bot_fetch_failures_total', 'Downloads que falharam em todas as tentativas, por ação e motivo',
+    ('symbol', 'reason'))
+CIRCUITOS_ABERTOS = registro.contador(
+    'trade_bot_circuit_opened_total', 'Aberturas do disjuntor por ação', ('symbol',))
+
+class BaldeTokens:
+    """Limitador de taxa: taxa tokens por segundo, acumulando até capacidade"""
+
+    def __init__(self, taxa, capacidade, relogio=time.monotonic):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.relogio = relogio
+        self._tokens = float(capacidade)
+        self._ultimo = relogio()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = self.relogio()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def tentar(self):
+        """Consome um token se houver; não bloqueia"""
+        with self._lock:
+            self._repor()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def espera(self):
+        """Segundos até haver um token disponível"""
+        with self._lock:
+            self._repor()
+            return max(0.0, (1 - self._tokens) / self.taxa) if self.taxa > 0 else float('inf')
+
+class Disjuntor:
+    """
+    Disjuntor por ação.
+
+    Após limite falhas seguidas o circuito da ação abre e ela não recebe
+    requisições por pausa segundos. Depois disso uma tentativa é liberada: se
+    der certo o circuito fecha, se falhar abre de novo.
+    """
+
+    def __init__(self, limite=DISJUNTOR_FALHAS, pausa=DISJUNTOR_PAUSA, relogio=time.monotonic):
+        self.limite = limite
+        self.pausa = pausa
+        self.relogio = relogio
+        self._falhas = {}
+        self._aberto_ate = {}
+        self._lock = threading.Lock()
+
+    def permite(self, ticker):
+        with self._lock:
+            return self.relogio() >= self._aberto_ate.get(ticker, 0.0)
+
+    def sucesso(self, ticker):
+        with self._lock:
+            self._falhas.pop(ticker, None)
+            self._aberto_ate.pop(ticker, None)
+
+    def falha(self, ticker):
+        """Registra uma falha; retorna True se o circuito abriu"""
+        with self._lock:
+            falhas = self._falhas.get(ticker, 0) + 1
+            self._falhas[ticker] = falhas
+            if falhas >= self.limite:
+                self._aberto_ate[ticker] = self.relogio() + self.pausa
+                return True
+            return False
+
+    def abertos(self):
+        """Ações com o circuito aberto neste momento"""
+        with self._lock:
+            agora = self.relogio()
+            return sorted(ticker for ticker, ate in self._aberto_ate.items() if ate > agora)
+
+def backoff(tentativa, base=COLETA_BACKOFF_BASE, maximo=COLETA_BACKOFF_MAX, rng=random):
+    """Espera antes da tentativa seguinte: exponencial com jitter (metade fixa, metade aleatória)"""
+    atraso = min(maximo, base * 2 ** tentativa)
+    return atraso / 2 + rng.uniform(0, atraso / 2)
+
+class Coletor:
+    """
+    Agendador de requisições concorrentes a uma fonte de dados
+
+    Args:
+        fonte: FonteDados (padrão: a fonte configurada)
+        concorrencia: Requisições simultâneas
+        taxa, rajada: Requisições por segundo e tamanho máximo da rajada
+        tentativas: Tentativas por ação
+        timeout: Prazo de cada requisição, em segundos
+        lote: Ações por requisição (1 = uma requisição por ação); as novas
+            tentativas são sempre individuais
+    """
+
+    def __init__(self, fonte=None, concorrencia=COLETA_CONCORRENCIA, taxa=COLETA_TAXA, rajada=COLETA_RAJADA,
+                 tentativas=COLETA_TENTATIVAS, timeout=COLETA_TIMEOUT, lote=COLETA_LOTE, disjuntor=None):
+        self.fonte = fonte
+        self.concorrencia = concorrencia
+        self.balde = BaldeTokens(taxa, rajada)
+        self.tentativas = tentativas
+        self.timeout = timeout
+        self.lote = max(1, lote)
+        self.disjuntor = disjuntor or Disjuntor()
+
+    def coletar(self, tickers, start=None, end=None, interval='1d', inicios=None):
+        """
+        Baixa os dados das ações, entregando cada uma assim que fica pronta
+
+        Args:
+            inicios: Dicionário {ticker: data inicial} que substitui start por ação;
+                ações com a mesma data inicial são agrupadas nas requisições
+
+        Yields:
+            (ticker, DataFrame ou None, mensagem de erro ou None)
+        """
+        fonte = self.fonte or obter_fonte()
+        inicios = inicios or {}
+
+        # Fila de (pronto_em, sequência, tickers, início, tentativa)
+        fila = []
+        sequencia = 0
+        grupos = {}
+        for ticker in dict.fromkeys(tickers):
+            grupos.setdefault(inicios.get(ticker, start), []).append(ticker)
+        for inicio, membros in grupos.items():
+            for i in range(0, len(membros), self.lote):
+                fila.append((0.0, sequencia, tuple(membros[i:i + self.lote]), inicio, 0))
+                sequencia += 1
+        heapq.heapify(fila)
+
+        em_voo = {}  # {future: (tickers, início, tentativa, prazo)}
+        # Requisições que estouram o prazo continuam ocupando uma thread até
+        # retornarem; as threads extras evitam que elas bloqueiem a coleta
+        pool = ThreadPoolExecutor(max_workers=self.concorrencia * 2, thread_name_prefix='coleta')
+        try:
+            while fila or em_voo:
+                agora = time.monotonic()
+                espera = None
+
+                # Dispara o que estiver pronto, respeitando concorrência, disjuntor e taxa
+                while fila and len(em_voo) < self.concorrencia and fila[0][0] <= agora:
+                    bloqueados = [t for t in fila[0][2] if not self.disjuntor.permite(t)]
+                    if bloqueados:
+                        pronto_em, seq, membros, inicio, tentativa = heapq.heappop(fila)
+                        for ticker in bloqueados:
+                            FALHAS.inc(symbol=ticker, reason='circuito_aberto')
+                            yield ticker, None, 'circuito aberto'
+                        restantes = tuple(t for t in membros if t not in bloqueados)
+                        if restantes:
+                            heapq.heappush(fila, (pronto_em, seq, restantes, inicio, tentativa))
+                        continue
+                    if not self.balde.tentar():
+                        espera = self.balde.espera()
+                        break
+                    _, _, membros, inicio, tentativa = heapq.heappop(fila)
+                    futuro = pool.submit(fonte.fetch_many, list(membros), start=inicio, end=end, interval=interval)
+                    em_voo[futuro] = (membros, inicio, tentativa, agora + self.timeout)
+
+                # Espera a primeira conclusão, prazo, item da fila ou token
+                agora = time.monotonic()
+                limites = [prazo - agora for _, _, _, prazo in em_voo.values()]
+                if fila and len(em_voo) < self.concorrencia:
+                    limites.append(espera if espera is not None else fila[0][0] - agora)
+                limite = max(0.0, min(limites)) if limites else 0.0
+                if em_voo:
+                    concluidos, _ = wait(list(em_voo), timeout=limite, return_when=FIRST_COMPLETED)
+                else:
+                    concluidos = set()
+                    time.sleep(limite)
+
+                agora = time.monotonic()
+                for futuro in list(em_voo):
+                    membros, inicio, tentativa, prazo = em_voo[futuro]
+                    if futuro in concluidos:
+                        del em_voo[futuro]
+                        try:
+                            dados = futuro.result()
+                            erro, motivo = 'sem dados', 'sem_dados'
+                        except Exception as e:
+                            dados = {}
+                            erro, motivo = str(e) or type(e).__name__, 'erro'
+                    elif agora >= prazo:
+                        del em_voo[futuro]
+                        futuro.cancel()
+                        dados = {}
+                        erro, motivo = f'tempo esgotado ({self.timeout:.0f}s)', 'tempo_esgotado'
+                    else:
+                        continue
+                    DURACAO_REQUISICOES.observar(agora - (prazo - self.timeout),
+                                                 result='ok' if dados else motivo)
+
+                    for ticker in membros:
+                        if dados.get(ticker) is not None:
+                            self.disjuntor.sucesso(ticker)
+                            yield ticker, dados[ticker], None
+                            continue
+                        abriu = self.disjuntor.falha(ticker)
+                        if abriu:
+                            CIRCUITOS_ABERTOS.inc(symbol=ticker)
+                        if tentativa + 1 < self.tentativas and not abriu:
+                            RETENTATIVAS.inc(symbol=ticker)
+                            heapq.heappush(fila, (agora + backoff(tentativa), sequencia, (ticker,), inicio, tentativa + 1))
+                            sequencia += 1
+                        else:
+                            FALHAS.inc(symbol=ticker, reason=motivo)
+                            yield ticker, None, erro
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+class FonteInstavel(FonteDados):
+    """
+    Fonte de teste que envolve outra fonte injetando latência e falhas.
+
+    Permite exercitar a coleta (concorrência, prazos, novas tentativas e
+    disjuntor) sem rede e de forma reprodutível pela semente.
+
+    Args:
+        fonte: Fonte real dos dados (ex.: FonteArquivo com fixtures)
+        latencia: (mínima, máxima) em segundos por requisição
+        prob_falha: Probabilidade de uma requisição lançar exceção
+        prob_lenta: Probabilidade de uma requisição demorar lentidao segundos
+        sempre_falham: Ações que nunca retornam dados
+    """
+
+    def __init__(self, fonte, latencia=(0.0, 0.0), prob_falha=0.0, prob_lenta=0.0, lentidao=60.0,
+                 sempre_falham=(), semente=None):
+        self.fonte = fonte
+        self.latencia = latencia
+        self.prob_falha = prob_falha
+        self.prob_lenta = prob_lenta
+        self.lentidao = lentidao
+        self.sempre_falham = set(sempre_falham)
+        self.requisicoes = 0
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def fetch_many(self, tickers, start=None, end=None, interval='1d'):
+        with self._lock:
+            self.requisicoes += 1
+            atraso = self._rng.uniform(*self.latencia)
+            lenta = self._rng.random() < self.prob_lenta
+            falha = self._rng.random() < self.prob_falha
+        time.sleep(self.lentidao if lenta else atraso)
+        if falha:
+            raise ConnectionError('falha injetada')
+        validos = [t for t in tickers if t not in self.sempre_falham]
+        return self.fonte.fetch_many(validos, start=start, end=end, interval=interval)
+
+_coletor = None
+
+def obter_coletor():
+    """Coletor compartilhado (mantém o estado do disjuntor entre ciclos)"""
+    global _coletor
+    if _coletor is None:
+        _coletor = Coletor()
+    return _coletor
@@ -1,162 +1,283 @@
 import warnings
 warnings.filterwarnings("ignore")
 
+import logging
+
 import numpy as np
 import pandas as pd
-import yfinance as yf
-import time
-from datetime import datetime, timedelta
+from trade_bot.config import (SOBREPOSICAO_BARRAS, HISTORICO_MAXIMO_INTERVALO, RSI_PERIODO, BB_PERIODO, BB_DESVIO, ADX_PERIODO,
+                              MACD_RAPIDA, MACD_LENTA, MACD_SINAL, VOLUME_PERIODO)
+from trade_bot.src import data_store
+from trade_bot.src import kernel_indicadores as kernel
+from trade_bot.src import indicadores as registro_indicadores
+from trade_bot.src.coleta import obter_coletor
+from trade_bot.src.memoria import descartar_intermediarias, dtype_indicadores
+from trade_bot.src.metricas import etapa
+
+logger = logging.getLogger(__name__)
+
+def baixar_dados(acao, periodo='2y', usar_cache=True, intervalo='1d'):
+    """Obtém os dados de uma ação (ver baixar_varios)"""
+    return baixar_varios([acao], periodo=periodo, usar_cache=usar_cache, intervalo=intervalo).get(acao)
+
+def baixar_varios(acoes, periodo='2y', usar_cache=True, intervalo='1d', atualizar=True):
+    """
+    Obtém os dados de várias ações a partir do armazenamento local.
+
+    Apenas as barras posteriores à última armazenada são baixadas, em
+    requisições concorrentes agrupadas por lote (ver coleta.Coletor). Se a
+    fonte tiver reajustado o histórico de uma ação (desdobramentos,
+    dividendos), o arquivo dela é reescrito com o período completo.
+
+    Barras intradiárias (intervalo '5m', '1h'...) são armazenadas em arquivo
+    próprio. A fonte só fornece um histórico limitado delas
+    (HISTORICO_MAXIMO_INTERVALO); o que já estiver armazenado além desse
+    limite é mantido e devolvido.
+
+    Com atualizar=False, ações cujo armazenamento já cobre o período são
+    lidas sem buscar barras novas (ex.: recém-atualizadas por outra chamada).
+
+    Returns:
+        Dicionário {acao: DataFrame} apenas com as ações que têm dados
+    """
+    with etapa('download'):
+        return dict(baixar_conforme_chegam(acoes, periodo=periodo, usar_cache=usar_cache, intervalo=intervalo,
+                                           atualizar=atualizar))
+
+def baixar_conforme_chegam(acoes, periodo='2y', usar_cache=True, intervalo='1d', atualizar=True):
+    """
+    Versão de baixar_varios que entrega cada ação assim que ela fica pronta,
+    permitindo processar umas enquanto outras ainda estão sendo baixadas
+
+    Yields:
+        (acao, DataFrame)
+    """
+    inicio_periodo = _inicio_periodo(periodo)
+    # Início que a fonte consegue atender neste intervalo
+    inicio_fonte = _limitar_inicio(inicio_periodo, intervalo)
+    if not usar_cache:
+        yield from _baixar(acoes, inicio_fonte, intervalo=intervalo)
+        return
+
+    armazenados = {}
+    inicios = {}
+    for acao in acoes:
+        try:
+            dados, inicio_armazenado = data_store.carregar(acao, intervalo=intervalo)
+        except Exception as e:
+            logger.error("Erro no armazenamento local de %s: %s", acao, e)
+            dados, inicio_armazenado = None, None
 
-def baixar_dados(acao, periodo='2y'):
-    """Baixa dados com tratamento robusto de erros"""
+        if _cobre_periodo(dados, inicio_armazenado, inicio_fonte):
+            armazenados[acao] = (dados, inicio_armazenado)
+        else:
+            inicios[acao] = inicio_fonte
+
+    if not atualizar:
+        for acao, (dados, _) in armazenados.items():
+            yield acao, _recortar(dados, inicio_periodo)
+        armazenados = {}
+
+    if armazenados:
+        # Um início comum (a sobreposição mais antiga) para agrupar as ações nas requisições
+        inicio = min(
+            dados.index[-min(SOBREPOSICAO_BARRAS, len(dados))]
+            for dados, _ in armazenados.values()
+        )
+        inicios.update({acao: inicio for acao in armazenados})
+
+    ajustados = []
+    recebidos = set()
+    for acao, novos in _baixar(list(inicios), inicios=inicios, intervalo=intervalo):
+        recebidos.add(acao)
+        if acao not in armazenados:
+            _salvar(acao, novos, inicio_fonte, intervalo)
+            yield acao, novos
+            continue
+
+        dados, inicio_armazenado = armazenados[acao]
+        if data_store.historico_ajustado(dados, novos):
+            logger.info("Histórico de %s foi ajustado pela fonte, baixando novamente", acao)
+            ajustados.append(acao)
+        else:
+            dados = data_store.anexar(dados, novos)
+            _salvar(acao, dados, inicio_armazenado, intervalo)
+            yield acao, _recortar(dados, inicio_periodo)
+
+    for acao, (dados, _) in armazenados.items():
+        if acao not in recebidos:
+            logger.warning("Usando dados armazenados de %s sem atualização", acao)
+            yield acao, _recortar(dados, inicio_periodo)
+
+    for acao, dados in _baixar(ajustados, inicio_fonte, intervalo=intervalo):
+        _salvar(acao, dados, inicio_fonte, intervalo)
+        yield acao, dados
+
+def _cobre_periodo(dados, inicio_armazenado, inicio_periodo):
+    """Verifica se os dados armazenados cobrem o período solicitado"""
+    if dados is None or dados.empty:
+        return False
+    if inicio_periodo is None:
+        return inicio_armazenado is None
+    return inicio_armazenado is None or inicio_armazenado <= inicio_periodo
+
+def _salvar(acao, dados, inicio_solicitado, intervalo='1d'):
+    """Grava no armazenamento local sem interromper o fluxo em caso de erro"""
     try:
-        # Tenta baixar os dados algumas vezes em caso de falha
-        for tentativa in range(3):
-            try:
-                dados = yf.download(
-                    acao, 
-                    period=periodo, 
-                    interval='1d', 
-                    progress=False,
-                    auto_adjust=True
-                )
-                
-                if dados is None or dados.empty:
-                    print(f"Tentativa {tentativa + 1}: Sem dados para {acao}")
-                    continue
-                    
-                # Verifica se temos as colunas necessárias
-                colunas_necessarias = ['Open', 'High', 'Low', 'Close', 'Volume']
-                if not all(col in dados.columns.get_level_values(0) for col in colunas_necessarias):
-                    print(f"Tentativa {tentativa + 1}: Dados incompletos para {acao}")
-                    continue
-                
-                # Simplifica as colunas se forem multiíndice
-                if isinstance(dados.columns, pd.MultiIndex):
-                    dados.columns = dados.columns.get_level_values(0)
-                
-                # Verifica se temos dados recentes
-                ultima_data = dados.index[-1]
-                if (pd.Timestamp.now() - ultima_data).days > 5:  # mais de 5 dias sem dados
-                    print(f"Aviso: Últimos dados de {acao} são de {ultima_data.date()}")
-                
-                return dados
-                
-            except Exception as e:
-                print(f"Tentativa {tentativa + 1} falhou para {acao}: {e}")
-                time.sleep(2)  # Espera 2 segundos antes da próxima tentativa
-                
-        print(f"Todas as tentativas falharam para {acao}")
-        return None
-        
+        data_store.salvar(acao, dados, inicio_solicitado, intervalo=intervalo)
     except Exception as e:
-        print(f"Erro ao baixar {acao}: {e}")
+        logger.error("Erro ao gravar dados de %s: %s", acao, e)
+
+def _inicio_periodo(periodo):
+    """Converte um período no formato do yfinance ('2y', '6mo', '5d') em data inicial"""
+    if periodo in (None, 'max'):
         return None
 
-def calcular_rsi(df):
+    hoje = pd.Timestamp.now().normalize()
+    if periodo == 'ytd':
+        return hoje.replace(month=1, day=1)
+
+    unidades = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+    for sufixo, unidade in unidades.items():
+        if periodo.endswith(sufixo) and periodo[:-len(sufixo)].isdigit():
+            return hoje - pd.DateOffset(**{unidade: int(periodo[:-len(sufixo)])})
+
+    raise ValueError(f"Período inválido: {periodo}")
+
+def historico_limitado(periodo, intervalo):
+    """Indica se a fonte fornece menos histórico de barras de intervalo do que o período pede"""
+    inicio = _inicio_periodo(periodo)
+    return _limitar_inicio(inicio, intervalo) != inicio
+
+def _limitar_inicio(inicio, intervalo):
+    """Data inicial limitada ao histórico que a fonte fornece para o intervalo"""
+    maximo = HISTORICO_MAXIMO_INTERVALO.get(intervalo)
+    if maximo is None:
+        return inicio
+    limite = pd.Timestamp.now().normalize() - pd.Timedelta(days=maximo - 1)
+    return limite if inicio is None or inicio < limite else inicio
+
+def _recortar(dados, inicio):
+    """Mantém apenas as barras a partir da data inicial"""
+    if inicio is None:
+        return dados
+    return dados[dados.index >= inicio]
+
+def _baixar(acoes, inicio=None, inicios=None, intervalo='1d'):
+    """
+    Baixa dados de várias ações da fonte configurada, com tratamento robusto de erros
+
+    As requisições são concorrentes, com limite de taxa, novas tentativas com
+    backoff e disjuntor para ações que falham seguidamente (ver coleta.Coletor).
+
+    Yields:
+        (acao, DataFrame) conforme cada ação fica pronta
+    """
+    if not acoes:
+        return
+    try:
+        for acao, dados, erro in obter_coletor().coletar(acoes, start=inicio, interval=intervalo, inicios=inicios):
+            if dados is None:
+                logger.warning("Todas as tentativas falharam para %s: %s", acao, erro)
+                continue
+
+            # Verifica se temos dados recentes
+            ultima_data = dados.index[-1]
+            if (pd.Timestamp.now() - ultima_data).days > 5:  # mais de 5 dias sem dados
+                logger.warning("Últimos dados de %s são de %s", acao, ultima_data.date())
+            yield acao, dados
+
+    except Exception as e:
+        logger.error("Erro ao baixar %s: %s", ', '.join(acoes), e, exc_info=True)
+
+def _linha(df, coluna):
+    """Coluna do DataFrame como matriz 1 × barras para o kernel de indicadores"""
+    return df[coluna].to_numpy(dtype='float64')[None, :]
+
+def calcular_rsi(df, periodo=RSI_PERIODO):
     """Calcula RSI manualmente"""
-    delta = df['Close'].diff()
-    gain = delta.where(delta > 0, 0)
-    loss = -delta.where(delta < 0, 0)
-    
-    avg_gain = gain.rolling(window=14, min_periods=1).mean()  # min_periods para evitar NaN
-    avg_loss = loss.rolling(window=14, min_periods=1).mean()
+    fechamento = _linha(df, 'Close')
+    delta = fechamento - kernel.deslocar(fechamento)
+    avg_gain, avg_loss = kernel.medias_ganhos_perdas(delta, ~np.isnan(fechamento), periodo)
     
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.fillna(50)  # Preencher valores NaN com 50 (neutro)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rs = avg_gain / avg_loss
+        rsi = 100 - (100 / (1 + rs))
+    return pd.Series(rsi[0], index=df.index).fillna(50)  # Preencher valores NaN com 50 (neutro)
 
 def calcular_macd(df):
     """Calcula MACD manualmente"""
-    ema12 = df['Close'].ewm(span=12, adjust=False, min_periods=1).mean()
-    ema26 = df['Close'].ewm(span=26, adjust=False, min_periods=1).mean()
+    fechamento = _linha(df, 'Close')
+    ema12 = kernel.media_exponencial(fechamento, 2 / (MACD_RAPIDA + 1), adjust=False)
+    ema26 = kernel.media_exponencial(fechamento, 2 / (MACD_LENTA + 1), adjust=False)
     macd = ema12 - ema26
-    signal = macd.ewm(span=9, adjust=False, min_periods=1).mean()
+    signal = kernel.media_exponencial(macd, 2 / (MACD_SINAL + 1), adjust=False)
     hist = macd - signal
-    return macd, signal, hist
+    return (pd.Series(macd[0], index=df.index), pd.Series(signal[0], index=df.index),
+            pd.Series(hist[0], index=df.index))
 
-def calcular_bollinger_bands(df, window=20, num_std=2):
+def calcular_bollinger_bands(df, window=BB_PERIODO, num_std=BB_DESVIO):
     """Calcula Bandas de Bollinger"""
-    sma = df['Close'].rolling(window=window, min_periods=1).mean()
-    std = df['Close'].rolling(window=window, min_periods=1).std()
-    upper_band = sma + (std * num_std).fillna(0)
-    lower_band = sma - (std * num_std).fillna(0)
-    return sma, upper_band, lower_band
+    fechamento = _linha(df, 'Close')
+    sma = kernel.media_movel(fechamento, window)[0]
+    desvio = np.nan_to_num(kernel.desvio_movel(fechamento, window)[0] * num_std)
+    return (pd.Series(sma, index=df.index), pd.Series(sma + desvio, index=df.index),
+            pd.Series(sma - desvio, index=df.index))
 
-def calcular_volume_relativo(df, window=20):
+def calcular_volume_relativo(df, window=VOLUME_PERIODO):
     """Calcula volume relativo"""
-    volume_ma = df['Volume'].rolling(window=window, min_periods=1).mean()
-    volume_ma = volume_ma.replace(0, 1)  # Evita divisão por zero
-    return df['Volume'] / volume_ma
+    volume = _linha(df, 'Volume')
+    volume_ma = kernel.media_movel(volume, window)
+    volume_ma[volume_ma == 0] = 1  # Evita divisão por zero
+    return pd.Series((volume / volume_ma)[0], index=df.index)
 
-def calcular_adx(df, periodo=14):
+def calcular_adx(df, periodo=ADX_PERIODO):
     """
     Calcula o ADX (Average Directional Index)
     Retorna uma Series com os valores do ADX
     """
     try:
-        # True Range
-        tr1 = df['High'] - df['Low']
-        tr2 = abs(df['High'] - df['Close'].shift())
-        tr3 = abs(df['Low'] - df['Close'].shift())
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # +DM e -DM
-        up_move = df['High'].diff()
-        down_move = df['Low'].shift() - df['Low']
-        
-        # Filtra movimentos positivos e negativos
-        pos_dm = pd.Series(0, index=df.index)
-        neg_dm = pd.Series(0, index=df.index)
-        
-        pos_dm.loc[up_move > down_move] = up_move.loc[up_move > down_move]
-        pos_dm.loc[up_move < 0] = 0
-        
-        neg_dm.loc[down_move > up_move] = down_move.loc[down_move > up_move]
-        neg_dm.loc[down_move < 0] = 0
-        
-        # Suavização
-        tr14 = tr.ewm(alpha=1/periodo, min_periods=periodo).mean()
-        pos_dm14 = pos_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
-        neg_dm14 = neg_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
-        
-        # +DI14 e -DI14
-        pos_di14 = 100 * pos_dm14 / tr14
-        neg_di14 = 100 * neg_dm14 / tr14
-        
-        # Calcula ADX
-        dx = 100 * abs(pos_di14 - neg_di14) / (pos_di14 + neg_di14)
-        adx = dx.ewm(alpha=1/periodo, min_periods=periodo).mean()
+        fechamento = _linha(df, 'Close')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            adx = kernel.adx_wilder(_linha(df, 'High'), _linha(df, 'Low'), fechamento,
+                                    ~np.isnan(fechamento), periodo)
         
         # Garante que retornamos uma Series
-        return pd.Series(adx, name='ADX')
+        return pd.Series(adx[0], index=df.index, name='ADX')
         
     except Exception as e:
-        print(f"Erro no cálculo do ADX: {e}")
+        logger.error("Erro no cálculo do ADX: %s", e)
         return pd.Series(0, index=df.index, name='ADX')
 
-def processar_dados(dados, min_periodos=30):
+@etapa('indicadores')
+def processar_dados(dados, min_periodos=30, colunas=None, acao=None, compacto=None, descartar=None):
     """
     Processa os dados com validações e cálculos de indicadores técnicos
     
     Args:
         dados: DataFrame com dados históricos
         min_periodos: Número mínimo de períodos necessários (default: 30)
+        colunas: Indicadores desejados (default: todos os de kernel.COLUNAS_INDICADORES,
+            calculados em uma única passagem); outras listas usam o registro de indicadores
+        acao: Se informado, os indicadores calculados pelo registro são memorizados
+        compacto: Indicadores em float32 (default: config.MODO_COMPACTO)
+        descartar: Remove Open/High/Low do resultado (default: config.DESCARTAR_INTERMEDIARIAS)
     """
     try:
         if dados is None or dados.empty:
             return None
             
-        # Cria cópia para evitar warnings do pandas
-        df = dados.copy()
-        
-        # Simplifica o índice e as colunas
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
+        df = dados
         
-        # Se as colunas são multiíndice, pega apenas o primeiro nível
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
+        # Simplifica o índice e as colunas (cópia apenas se for preciso alterá-los)
+        if not isinstance(df.index, pd.DatetimeIndex) or isinstance(df.columns, pd.MultiIndex):
+            df = dados.copy()
+            df.index = pd.to_datetime(df.index)
+            # Se as colunas são multiíndice, pega apenas o primeiro nível
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+        if not df.index.is_monotonic_increasing:
+            df = df.sort_index()
         
         # Debug
         #print(f"Quantidade inicial de dados: {len(df)}")
@@ -164,76 +285,37 @@ def processar_dados(dados, min_periodos=30):
         
         # Verifica quantidade mínima de dados
         if len(df) < min_periodos:
-            print(f"Aviso: Apenas {len(df)} períodos disponíveis (mínimo: {min_periodos})")
+            logger.warning("Apenas %d períodos disponíveis (mínimo: %d)", len(df), min_periodos)
             return None
         
-        print("Calculando indicadores técnicos...")
-        
-        # Médias móveis (SMA)
-        df['trend_sma_fast'] = df['Close'].rolling(window=20, min_periods=1).mean()
-        df['trend_sma_slow'] = df['Close'].rolling(window=50, min_periods=1).mean()
-        
-        # RSI
-        delta = df['Close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14, min_periods=1).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14, min_periods=1).mean()
-        loss = loss.replace(0, np.inf)  # Evita divisão por zero
-        rs = gain / loss
-        df['momentum_rsi'] = 100 - (100 / (1 + rs))
-        
-        # MACD
-        ema12 = df['Close'].ewm(span=12, adjust=False, min_periods=1).mean()
-        ema26 = df['Close'].ewm(span=26, adjust=False, min_periods=1).mean()
-        df['trend_macd'] = ema12 - ema26
-        df['trend_macd_signal'] = df['trend_macd'].ewm(span=9, adjust=False, min_periods=1).mean()
-        df['trend_macd_hist'] = df['trend_macd'] - df['trend_macd_signal']
+        logger.debug("Calculando indicadores técnicos")
         
-        # Bollinger Bands
-        sma20 = df['Close'].rolling(window=20, min_periods=1).mean()
-        std20 = df['Close'].rolling(window=20, min_periods=1).std()
-        df['trend_bb_upper'] = sma20 + (std20 * 2)
-        df['trend_bb_lower'] = sma20 - (std20 * 2)
-        
-        # Volume e indicadores de volume
-        df['volume_ma20'] = df['Volume'].rolling(window=20, min_periods=1).mean()
-        volume_ma = df['volume_ma20'].replace(0, 1)  # Evita divisão por zero
-        df['volume_rel'] = df['Volume'] / volume_ma
-        
-        print("Calculando ADX...")
-        try:
-            # True Range
-            tr1 = df['High'] - df['Low']
-            tr2 = abs(df['High'] - df['Close'].shift())
-            tr3 = abs(df['Low'] - df['Close'].shift())
-            tr = pd.DataFrame({'tr1': tr1, 'tr2': tr2, 'tr3': tr3}).max(axis=1)
-            
-            # Directional Movement
-            up_move = df['High'].diff()
-            down_move = df['Low'].shift() - df['Low']
-            
-            pos_dm = up_move.where((up_move > down_move) & (up_move > 0), 0)
-            neg_dm = down_move.where((down_move > up_move) & (down_move > 0), 0)
-            
-            # Suavização
-            periodo = 14
-            tr14 = tr.ewm(alpha=1/periodo, min_periods=periodo).mean()
-            pos_dm14 = pos_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
-            neg_dm14 = neg_dm.ewm(alpha=1/periodo, min_periods=periodo).mean()
-            
-            # Directional Indicators
-            pos_di14 = 100 * pos_dm14 / tr14
-            neg_di14 = 100 * neg_dm14 / tr14
-            
-            # ADX
-            dx = 100 * abs(pos_di14 - neg_di14) / (pos_di14 + neg_di14)
-            df['trend_adx'] = dx.ewm(alpha=1/periodo, min_periods=periodo).mean()
-            
-        except Exception as e:
-            print(f"Erro no cálculo do ADX: {e}")
-            df['trend_adx'] = 0
-        
-        # Remove linhas com valores NaN
-        df = df.dropna()
+        tipo = dtype_indicadores(compacto)
+        if colunas is None:
+            # Todos os indicadores em uma única passagem do kernel
+            saida = kernel.calcular_indicadores(
+                _linha(df, 'High'), _linha(df, 'Low'), _linha(df, 'Close'), _linha(df, 'Volume')
+            )[:, 0, :]
+            nomes = kernel.COLUNAS_INDICADORES
+            completas = ~np.isnan(saida).any(axis=0)
+        else:
+            # Apenas as colunas pedidas, calculando cada dependência uma vez
+            indicadores = registro_indicadores.calcular(df, colunas, memorizar=acao is not None)
+            saida = indicadores.to_numpy(dtype='float64').T
+            nomes = list(indicadores.columns)
+            completas = ~np.isnan(saida).any(axis=0)
+
+        # Remove linhas com valores NaN (em qualquer coluna, como um dropna do
+        # resultado), copiando cada coluna uma única vez já no tipo final
+        base = [coluna for coluna in df.columns if coluna not in nomes]
+        if len(base) != len(df.columns):
+            df = df[base]
+        completas &= df.notna().to_numpy().all(axis=1)
+        linhas = np.flatnonzero(completas)
+        manter = descartar_intermediarias(base, descartar)
+        df = df.take(linhas) if len(manter) == len(base) else df.iloc[linhas, df.columns.get_indexer(manter)]
+        indicadores = pd.DataFrame(saida[:, linhas].T.astype(tipo, copy=False), index=df.index, columns=nomes)
+        df = pd.concat([df, indicadores], axis=1, copy=False)
         
         # Debug
         #print(f"Quantidade de dados após processamento: {len(df)}")
@@ -241,13 +323,11 @@ def processar_dados(dados, min_periodos=30):
         
         # Verifica novamente após processamento
         if len(df) < min_periodos:
-            print(f"Aviso: Dados insuficientes após processamento ({len(df)} períodos)")
+            logger.warning("Dados insuficientes após processamento (%d períodos)", len(df))
             return None
             
         return df
         
     except Exception as e:
-        print(f"Erro no processamento dos dados: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("Erro no processamento dos dados: %s", e, exc_info=True)
         return None
\ No newline at end of file
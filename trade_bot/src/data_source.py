@@ -0,0 +1,144 @@
+import os
+import pandas as pd
+from trade_bot.config import FONTE_DADOS, DIRETORIO_FIXTURES
+
+COLUNAS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class FonteDados:
+    """
+    Interface comum das fontes de dados OHLCV.
+
+    As subclasses implementam fetch_many; fetch é apenas o caso de uma ação.
+    Os DataFrames retornados têm as colunas COLUNAS_OHLCV e índice de datas
+    sem fuso horário.
+    """
+
+    def fetch(self, ticker, start=None, end=None, interval='1d'):
+        """Obtém os dados de uma ação, ou None se não houver dados"""
+        return self.fetch_many([ticker], start=start, end=end, interval=interval).get(ticker)
+
+    def fetch_many(self, tickers, start=None, end=None, interval='1d'):
+        """Obtém os dados de várias ações; retorna {ticker: DataFrame} apenas para as que têm dados"""
+        raise NotImplementedError
+
+class FonteYahoo(FonteDados):
+    """Fonte de dados do Yahoo Finance, com download agrupado de todas as ações"""
+
+    def fetch_many(self, tickers, start=None, end=None, interval='1d'):
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+
+        if start is None and end is None:
+            intervalo_datas = {'period': 'max'}
+        else:
+            intervalo_datas = {'start': start, 'end': end}
+
+        # yfinance só é carregado quando a fonte é usada (fixtures locais e o servidor com dados em disco não o importam)
+        import yfinance as yf
+
+        dados = yf.download(
+            tickers,
+            interval=interval,
+            group_by='ticker',
+            progress=False,
+            auto_adjust=True,
+            threads=True,
+            **intervalo_datas
+        )
+        if dados is None or dados.empty:
+            return {}
+
+        resultado = {}
+        for ticker in tickers:
+            if ticker not in dados.columns.get_level_values(0):
+                continue
+            parte = _normalizar(dados[ticker])
+            if parte is not None:
+                resultado[ticker] = parte
+        return resultado
+
+class FonteArquivo(FonteDados):
+    """
+    Fonte de dados baseada em arquivos CSV locais (fixtures).
+
+    Cada ação fica em '<ticker>.csv' (barras diárias) ou '<ticker>_<interval>.csv'
+    dentro do diretório. Permite executar e medir o sistema sem rede, de forma
+    determinística.
+    """
+
+    def __init__(self, diretorio=None):
+        self.diretorio = diretorio or DIRETORIO_FIXTURES
+
+    def caminho(self, ticker, interval='1d'):
+        sufixo = '' if interval == '1d' else f'_{interval}'
+        return os.path.join(self.diretorio, f'{ticker}{sufixo}.csv')
+
+    def fetch_many(self, tickers, start=None, end=None, interval='1d'):
+        resultado = {}
+        for ticker in tickers:
+            caminho = self.caminho(ticker, interval)
+            if not os.path.exists(caminho):
+                continue
+
+            dados = pd.read_csv(caminho, index_col=0, parse_dates=True)
+            if start is not None:
+                dados = dados[dados.index >= pd.Timestamp(start)]
+            if end is not None:
+                dados = dados[dados.index < pd.Timestamp(end)]
+
+            dados = _normalizar(dados)
+            if dados is not None:
+                resultado[ticker] = dados
+        return resultado
+
+    def gravar(self, ticker, dados, interval='1d'):
+        """Grava os dados de uma ação como fixture"""
+        os.makedirs(self.diretorio, exist_ok=True)
+        dados[COLUNAS_OHLCV].to_csv(self.caminho(ticker, interval), index_label='Date')
+
+def _normalizar(dados):
+    """Padroniza colunas e índice; retorna None se faltarem colunas ou dados"""
+    if isinstance(dados.columns, pd.MultiIndex):
+        dados.columns = dados.columns.get_level_values(-1)
+
+    if not all(col in dados.columns for col in COLUNAS_OHLCV):
+        return None
+
+    dados = dados[COLUNAS_OHLCV].dropna(how='all')
+    if dados.empty:
+        return None
+
+    indice = pd.DatetimeIndex(dados.index)
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    dados.index = indice.rename('Date')
+    return dados.sort_index()
+
+_fonte_atual = None
+
+def obter_fonte():
+    """Retorna a fonte de dados configurada (FONTE_DADOS)"""
+    global _fonte_atual
+    if _fonte_atual is None:
+        if FONTE_DADOS == 'arquivo':
+            _fonte_atual = FonteArquivo()
+        elif FONTE_DADOS == 'yahoo':
+            _fonte_atual = FonteYahoo()
+        else:
+            raise ValueError(f"Fonte de dados desconhecida: {FONTE_DADOS}")
+    return _fonte_atual
+
+def definir_fonte(fonte):
+    """Substitui a fonte de dados usada por todo o sistema"""
+    global _fonte_atual
+    _fonte_atual = fonte
+
+def gravar_fixtures(tickers, diretorio=None, start=None, interval='1d', fonte=None):
+    """Copia os dados atuais de uma fonte (por padrão o Yahoo) para arquivos de fixture"""
+    fonte = fonte or FonteYahoo()
+    destino = FonteArquivo(diretorio)
+    dados = fonte.fetch_many(tickers, start=start, interval=interval)
+    for ticker, df in dados.items():
+        destino.gravar(ticker, df, interval)
+    return sorted(dados)
@@ -0,0 +1,87 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from trade_bot.config import DIRETORIO_DADOS
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+def caminho_arquivo(acao, diretorio=None, intervalo='1d'):
+    """Retorna o caminho do arquivo local de uma ação (um arquivo por intervalo de barras)"""
+    diretorio = diretorio or DIRETORIO_DADOS
+    sufixo = '' if intervalo == '1d' else f'_{intervalo}'
+    return os.path.join(diretorio, f"{acao.replace('^', '_')}{sufixo}.npz")
+
+def carregar(acao, diretorio=None, intervalo='1d'):
+    """
+    Carrega os dados armazenados de uma ação
+
+    Returns:
+        Tupla (DataFrame OHLCV, início solicitado) ou (None, None) se não houver arquivo
+    """
+    caminho = caminho_arquivo(acao, diretorio, intervalo)
+    if not os.path.exists(caminho):
+        return None, None
+
+    try:
+        with np.load(caminho) as arquivo:
+            indice = pd.DatetimeIndex(arquivo['index'].astype('datetime64[ns]'), name='Date')
+            dados = pd.DataFrame({col: arquivo[col] for col in COLUNAS_OHLCV}, index=indice)
+            inicio = arquivo['inicio_solicitado'].item()
+        inicio = None if inicio < 0 else pd.Timestamp(inicio)
+        return dados, inicio
+    except Exception as e:
+        logger.error("Erro ao ler dados armazenados de %s: %s", acao, e)
+        return None, None
+
+def salvar(acao, dados, inicio_solicitado=None, diretorio=None, intervalo='1d'):
+    """Grava os dados da ação em formato colunar, substituindo o arquivo de forma atômica"""
+    caminho = caminho_arquivo(acao, diretorio, intervalo)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+
+    indice = normalizar_indice(dados.index)
+    colunas = {col: dados[col].to_numpy(dtype='float64') for col in COLUNAS_OHLCV}
+    inicio = -1 if inicio_solicitado is None else pd.Timestamp(inicio_solicitado).value
+
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        np.savez(
+            arquivo,
+            index=indice.asi8,
+            inicio_solicitado=np.int64(inicio),
+            **colunas
+        )
+    os.replace(temporario, caminho)
+
+def anexar(armazenados, novos):
+    """Junta barras novas às armazenadas; em datas repetidas prevalecem as novas"""
+    if armazenados is None or armazenados.empty:
+        return novos
+    antigos = armazenados[armazenados.index < novos.index[0]]
+    return pd.concat([antigos, novos[COLUNAS_OHLCV]])
+
+def historico_ajustado(armazenados, novos, tolerancia=1e-4):
+    """
+    Verifica se o histórico foi reajustado pela fonte (desdobramento, dividendos).
+
+    Compara as barras sobrepostas, exceto a última armazenada, que pode ter sido
+    gravada com o pregão ainda em andamento.
+    """
+    comuns = armazenados.index[:-1].intersection(novos.index)
+    if len(comuns) == 0:
+        # Sem sobreposição não há como garantir continuidade
+        return True
+
+    antigos = armazenados.loc[comuns, 'Close'].to_numpy()
+    atuais = novos.loc[comuns, 'Close'].to_numpy()
+    return not np.allclose(antigos, atuais, rtol=tolerancia, atol=0)
+
+def normalizar_indice(indice):
+    """Converte o índice para DatetimeIndex sem fuso horário"""
+    indice = pd.DatetimeIndex(indice)
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    return indice
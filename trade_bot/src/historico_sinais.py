@@ -0,0 +1,347 @@
+"""
+Histórico dos sinais: indicadores e Sinal de cada barra avaliada pelo bot.
+
+As barras ficam em um banco SQLite (config.ARQUIVO_HISTORICO), indexadas
+por (ação, timeframe, data). A cada ciclo só as barras novas e as últimas
+SOBREPOSICAO_BARRAS já gravadas (que podem ter mudado, como a barra do dia
+em andamento) são escritas, todas as ações em uma única transação. Junto
+com as barras são mantidas as mudanças de sinal e a última barra de cada
+ação, de modo que as consultas da API leem apenas o trecho do índice que
+respondem.
+
+O banco usa WAL: o monitoramento e o servidor web podem gravar e consultar
+ao mesmo tempo, em processos diferentes.
+
+Uso (limpeza manual):
+    python -m trade_bot.src.historico_sinais --compactar
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from trade_bot.config import (ARQUIVO_HISTORICO, HISTORICO_RETENCAO_DIAS, HISTORICO_RETENCAO_INTRADIARIO_DIAS,
+                              HISTORICO_INTERVALO_COMPACTACAO, HISTORICO_LIMITE_CONSULTA, SOBREPOSICAO_BARRAS)
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+from trade_bot.src.metricas import etapa, registro
+from trade_bot.src.timeframes import intradiario
+
+logger = logging.getLogger(__name__)
+
+# Colunas de valores gravadas para cada barra: (coluna no DataFrame, coluna no banco)
+COLUNAS = [('Close', 'fechamento'), ('Volume', 'volume')] + [(coluna, coluna) for coluna in COLUNAS_INDICADORES]
+
+LINHAS_GRAVADAS = registro.contador(
+    'trade_bot_history_rows_written_total', 'Barras gravadas no histórico de sinais, por timeframe', ('timeframe',))
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS barras (
+    acao TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    data INTEGER NOT NULL,
+    sinal INTEGER NOT NULL,
+    {colunas},
+    PRIMARY KEY (acao, timeframe, data)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS mudancas (
+    acao TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    data INTEGER NOT NULL,
+    sinal INTEGER NOT NULL,
+    anterior INTEGER NOT NULL,
+    fechamento REAL,
+    PRIMARY KEY (acao, timeframe, data)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS mudancas_por_data ON mudancas (timeframe, data);
+CREATE TABLE IF NOT EXISTS ultimas (
+    acao TEXT NOT NULL,
+    timeframe TEXT NOT NULL,
+    data INTEGER NOT NULL,
+    PRIMARY KEY (acao, timeframe)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor);
+"""
+
+def _segundos(indice):
+    """Datas do índice em segundos (horário local da bolsa, sem fuso), a chave das barras no banco"""
+    if indice.tz is not None:
+        indice = indice.tz_localize(None)
+    return indice.asi8 // 10 ** 9
+
+def _data(segundos):
+    return pd.Timestamp(segundos, unit='s').strftime('%Y-%m-%d %H:%M:%S')
+
+def _para_segundos(valor):
+    """Data da consulta (ISO, ex.: 2024-01-31 ou 2024-01-31 10:15) em segundos; ValueError se inválida"""
+    if valor is None or valor == '':
+        return None
+    momento = pd.Timestamp(valor)
+    if momento.tz is not None:
+        momento = momento.tz_localize(None)
+    return int(momento.value // 10 ** 9)
+
+class HistoricoSinais:
+    """
+    Histórico de sinais em SQLite, uma conexão por thread
+
+    Args:
+        caminho: Arquivo do banco (':memory:' não é suportado: cada thread teria o seu)
+        retencao_dias, retencao_intradiario_dias: Dias de barras mantidos (None = sem limite)
+        intervalo_compactacao: Segundos entre as limpezas automáticas (None = só manual)
+    """
+
+    def __init__(self, caminho=ARQUIVO_HISTORICO, retencao_dias=HISTORICO_RETENCAO_DIAS,
+                 retencao_intradiario_dias=HISTORICO_RETENCAO_INTRADIARIO_DIAS,
+                 intervalo_compactacao=HISTORICO_INTERVALO_COMPACTACAO):
+        self.caminho = caminho
+        self.retencao_dias = retencao_dias
+        self.retencao_intradiario_dias = retencao_intradiario_dias
+        self.intervalo_compactacao = intervalo_compactacao
+        self._local = threading.local()
+        self._criar()
+
+    def _conexao(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=30)
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            self._local.conexao = conexao
+        return conexao
+
+    def _criar(self):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        conexao = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            # Precisa vir antes da primeira tabela para permitir liberar espaço sem VACUUM completo
+            conexao.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conexao.executescript(_ESQUEMA.format(colunas=',\n    '.join(f'{nome} REAL' for _, nome in COLUNAS)))
+            # Indicadores acrescentados depois da criação do banco
+            existentes = {linha[1] for linha in conexao.execute('PRAGMA table_info(barras)')}
+            for _, nome in COLUNAS:
+                if nome not in existentes:
+                    conexao.execute(f'ALTER TABLE barras ADD COLUMN {nome} REAL')
+            conexao.commit()
+        finally:
+            conexao.close()
+
+    def fechar(self):
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is not None:
+            conexao.close()
+            self._local.conexao = None
+
+    def _a_gravar(self, conexao, acao, timeframe, datas):
+        """Máscara das barras a gravar: novas, faltantes e as últimas SOBREPOSICAO_BARRAS já gravadas"""
+        chave = (acao, timeframe)
+        linha = conexao.execute(
+            'SELECT data FROM barras WHERE acao=? AND timeframe=? ORDER BY data DESC LIMIT 1 OFFSET ?',
+            (*chave, SOBREPOSICAO_BARRAS - 1)).fetchone()
+        if linha is None:
+            return np.ones(len(datas), dtype=bool)
+        corte = linha[0]
+        anteriores = datas < corte
+        if not anteriores.any():
+            return np.ones(len(datas), dtype=bool)
+        # Antes do corte só faltam barras se a contagem no banco for menor (ex.: ciclos que gravaram só a última barra)
+        gravadas = conexao.execute(
+            'SELECT COUNT(*) FROM barras WHERE acao=? AND timeframe=? AND data BETWEEN ? AND ?',
+            (*chave, int(datas[0]), corte - 1)).fetchone()[0]
+        if gravadas == int(anteriores.sum()):
+            return ~anteriores
+        existentes = np.fromiter((linha[0] for linha in conexao.execute(
+            'SELECT data FROM barras WHERE acao=? AND timeframe=? AND data BETWEEN ? AND ?',
+            (*chave, int(datas[0]), corte - 1))), dtype=np.int64)
+        return ~anteriores | ~np.isin(datas, existentes)
+
+    @etapa('historico')
+    def gravar(self, dados_por_acao, timeframe='1d'):
+        """
+        Grava as barras avaliadas de várias ações em uma única transação
+
+        Args:
+            dados_por_acao: {ação: DataFrame de gerar_sinais}
+            timeframe: Timeframe das barras
+
+        Returns:
+            Número de barras gravadas
+        """
+        conexao = self._conexao()
+        colunas = ', '.join(nome for _, nome in COLUNAS)
+        inserir = (f'INSERT OR REPLACE INTO barras (acao, timeframe, data, sinal, {colunas}) '
+                   f'VALUES (?, ?, ?, ?, {", ".join("?" * len(COLUNAS))})')
+        total = 0
+        with conexao:
+            for acao, dados in dados_por_acao.items():
+                if dados is None or dados.empty or 'Sinal' not in dados.columns:
+                    continue
+                datas = _segundos(dados.index)
+                mascara = self._a_gravar(conexao, acao, timeframe, datas)
+                if not mascara.any():
+                    continue
+                datas = datas[mascara]
+                sinais = dados['Sinal'].to_numpy()[mascara].astype(np.int64)
+                valores = [dados[origem].to_numpy(dtype=np.float64)[mascara] if origem in dados.columns
+                           else np.full(len(datas), np.nan) for origem, _ in COLUNAS]
+                # NaN vira NULL no SQLite
+                conexao.executemany(inserir, zip([acao] * len(datas), [timeframe] * len(datas), datas.tolist(),
+                                                 sinais.tolist(), *(coluna.tolist() for coluna in valores)))
+                self._atualizar_mudancas(conexao, acao, timeframe, int(datas[0]), int(datas[-1]))
+                conexao.execute(
+                    'INSERT INTO ultimas (acao, timeframe, data) VALUES (?, ?, ?) '
+                    'ON CONFLICT (acao, timeframe) DO UPDATE SET data=excluded.data WHERE excluded.data > ultimas.data',
+                    (acao, timeframe, int(datas[-1])))
+                total += len(datas)
+        LINHAS_GRAVADAS.inc(total, timeframe=timeframe)
+        self._compactar_se_preciso()
+        return total
+
+    @staticmethod
+    def _atualizar_mudancas(conexao, acao, timeframe, primeiro, ultimo):
+        """
+        Refaz as mudanças de sinal das barras gravadas entre primeiro e ultimo
+
+        A barra seguinte ao trecho também é refeita: ela pode ter deixado de
+        ser (ou passado a ser) uma mudança. Sem barra anterior, a base é 0.
+        """
+        chave = (acao, timeframe)
+        linha = conexao.execute(
+            'SELECT sinal FROM barras WHERE acao=? AND timeframe=? AND data<? ORDER BY data DESC LIMIT 1',
+            (*chave, primeiro)).fetchone()
+        trecho = conexao.execute(
+            'SELECT data, sinal, fechamento FROM barras WHERE acao=? AND timeframe=? AND data>=? AND data<=? ORDER BY data',
+            (*chave, primeiro, ultimo)).fetchall()
+        trecho += conexao.execute(
+            'SELECT data, sinal, fechamento FROM barras WHERE acao=? AND timeframe=? AND data>? ORDER BY data LIMIT 1',
+            (*chave, ultimo)).fetchall()
+        conexao.execute('DELETE FROM mudancas WHERE acao=? AND timeframe=? AND data>=? AND data<=?',
+                        (*chave, primeiro, trecho[-1][0]))
+        sinais = np.fromiter((sinal for _, sinal, _ in trecho), dtype=np.int64, count=len(trecho))
+        anteriores = np.concatenate([[linha[0] if linha else 0], sinais[:-1]])
+        conexao.executemany(
+            'INSERT INTO mudancas (acao, timeframe, data, sinal, anterior, fechamento) VALUES (?, ?, ?, ?, ?, ?)',
+            ((*chave, trecho[i][0], trecho[i][1], int(anteriores[i]), trecho[i][2])
+             for i in np.flatnonzero(sinais != anteriores)))
+
+    def _linhas(self, consulta, parametros):
+        cursor = self._conexao().execute(consulta, parametros)
+        nomes = [descricao[0] for descricao in cursor.description]
+        return [dict(zip(nomes, linha)) for linha in cursor]
+
+    @staticmethod
+    def _formatar_barra(linha):
+        barra = {'symbol': linha.pop('acao'), 'timeframe': linha.pop('timeframe'), 'date': _data(linha.pop('data')),
+                 'signal': linha.pop('sinal'), 'price': linha.pop('fechamento'), 'volume': linha.pop('volume')}
+        barra.update(linha)
+        return barra
+
+    def intervalo(self, acao, inicio=None, fim=None, timeframe='1d', limite=HISTORICO_LIMITE_CONSULTA):
+        """
+        Barras gravadas de uma ação entre inicio e fim (inclusive), em ordem de data
+
+        Com mais barras que o limite, retorna as mais recentes.
+        """
+        inicio, fim = _para_segundos(inicio), _para_segundos(fim)
+        linhas = self._linhas(
+            'SELECT * FROM barras WHERE acao=? AND timeframe=? AND data>=? AND data<=? ORDER BY data DESC LIMIT ?',
+            (acao, timeframe, inicio if inicio is not None else -2 ** 63, fim if fim is not None else 2 ** 63 - 1,
+             limite))
+        return [self._formatar_barra(linha) for linha in reversed(linhas)]
+
+    def ultimos(self, timeframe='1d', acoes=None):
+        """Última barra gravada de cada ação (ou das ações indicadas)"""
+        linhas = self._linhas(
+            'SELECT barras.* FROM ultimas JOIN barras USING (acao, timeframe, data) '
+            'WHERE ultimas.timeframe=? ORDER BY acao', (timeframe,))
+        if acoes is not None:
+            acoes = set(acoes)
+            linhas = [linha for linha in linhas if linha['acao'] in acoes]
+        return [self._formatar_barra(linha) for linha in linhas]
+
+    def mudancas(self, acao=None, inicio=None, fim=None, timeframe='1d', limite=HISTORICO_LIMITE_CONSULTA):
+        """Mudanças de sinal (de uma ação ou de todas), da mais recente para a mais antiga"""
+        inicio, fim = _para_segundos(inicio), _para_segundos(fim)
+        filtros, parametros = ['timeframe=?', 'data>=?', 'data<=?'], [
+            timeframe, inicio if inicio is not None else -2 ** 63, fim if fim is not None else 2 ** 63 - 1]
+        if acao is not None:
+            filtros.insert(0, 'acao=?')
+            parametros.insert(0, acao)
+        linhas = self._linhas(f'SELECT * FROM mudancas WHERE {" AND ".join(filtros)} ORDER BY data DESC LIMIT ?',
+                              (*parametros, limite))
+        return [{'symbol': linha['acao'], 'timeframe': linha['timeframe'], 'date': _data(linha['data']),
+                 'signal': linha['sinal'], 'previous': linha['anterior'], 'price': linha['fechamento']}
+                for linha in linhas]
+
+    def compactar(self, agora=None):
+        """
+        Aplica a retenção e devolve ao sistema o espaço liberado
+
+        Remove as barras mais antigas que a retenção do timeframe (as mudanças
+        de sinal ficam), libera as páginas vazias do arquivo e atualiza as
+        estatísticas do planejador de consultas.
+
+        Returns:
+            Número de barras removidas
+        """
+        agora = pd.Timestamp.now() if agora is None else pd.Timestamp(agora)
+        conexao = self._conexao()
+        removidas = 0
+        with conexao:
+            for timeframe, in conexao.execute('SELECT DISTINCT timeframe FROM ultimas').fetchall():
+                dias = self.retencao_intradiario_dias if intradiario(timeframe) else self.retencao_dias
+                if dias is None:
+                    continue
+                corte = int((agora - pd.Timedelta(days=dias)).value // 10 ** 9)
+                removidas += conexao.execute('DELETE FROM barras WHERE timeframe=? AND data<?',
+                                             (timeframe, corte)).rowcount
+            conexao.execute('DELETE FROM ultimas WHERE NOT EXISTS (SELECT 1 FROM barras WHERE barras.acao=ultimas.acao '
+                            'AND barras.timeframe=ultimas.timeframe AND barras.data=ultimas.data)')
+            conexao.execute("INSERT OR REPLACE INTO meta VALUES ('compactado_em', ?)", (time.time(),))
+        conexao.execute('PRAGMA incremental_vacuum')
+        conexao.execute('PRAGMA optimize')
+        conexao.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        if removidas:
+            logger.info("Histórico de sinais: %d barras fora da retenção removidas", removidas)
+        return removidas
+
+    def _compactar_se_preciso(self):
+        if self.intervalo_compactacao is None:
+            return
+        linha = self._conexao().execute("SELECT valor FROM meta WHERE chave='compactado_em'").fetchone()
+        if linha is None or time.time() - linha[0] >= self.intervalo_compactacao:
+            try:
+                self.compactar()
+            except sqlite3.Error as e:
+                logger.warning("Erro ao compactar o histórico de sinais: %s", e)
+
+_historico = None
+_lock = threading.Lock()
+
+def obter_historico():
+    """Histórico compartilhado pelo processo (config.ARQUIVO_HISTORICO)"""
+    global _historico
+    with _lock:
+        if _historico is None:
+            _historico = HistoricoSinais()
+        return _historico
+
+def main():
+    parser = argparse.ArgumentParser(description='Histórico de sinais')
+    parser.add_argument('--compactar', action='store_true', help='Aplica a retenção e libera o espaço do arquivo')
+    args = parser.parse_args()
+
+    historico = obter_historico()
+    if args.compactar:
+        antes = os.path.getsize(historico.caminho)
+        removidas = historico.compactar()
+        print(f"{removidas} barras removidas; {antes // 1024} KiB -> {os.path.getsize(historico.caminho) // 1024} KiB")
+    for barra in historico.ultimos():
+        print(f"{barra['symbol']}: {barra['date']} sinal {barra['signal']} (R${barra['price']:.2f})")
+
+if __name__ == '__main__':
+    main()
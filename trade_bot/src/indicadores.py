@@ -0,0 +1,242 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from trade_bot.config import (SMA_RAPIDA, SMA_LENTA, RSI_PERIODO, BB_PERIODO, BB_DESVIO, ADX_PERIODO,
+                              MACD_RAPIDA, MACD_LENTA, MACD_SINAL, VOLUME_PERIODO)
+from trade_bot.src import kernel_indicadores as kernel
+
+ENTRADAS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Quantidade máxima de resultados memorizados (os mais antigos são descartados)
+TAMANHO_MEMORIA = 4096
+
+class Indicador:
+    """
+    Nó do grafo de indicadores.
+
+    Declara a função de cálculo, os nós de entrada (colunas OHLCV ou outros
+    indicadores) e os parâmetros. A função recebe as matrizes (ações × barras)
+    das entradas, na ordem declarada, e os parâmetros como argumentos nomeados.
+    """
+
+    def __init__(self, nome, funcao, entradas, parametros):
+        self.nome = nome
+        self.funcao = funcao
+        self.entradas = tuple(entradas)
+        self.parametros = dict(parametros)
+
+    def __repr__(self):
+        parametros = ', '.join(f'{k}={v}' for k, v in self.parametros.items())
+        return f"Indicador({self.nome}: {', '.join(self.entradas)}{'; ' + parametros if parametros else ''})"
+
+_registro = {}
+_memoria = OrderedDict()
+
+def registrar(nome, funcao, entradas=(), **parametros):
+    """Registra (ou substitui) um indicador"""
+    for entrada in entradas:
+        if entrada not in ENTRADAS and entrada not in _registro:
+            raise ValueError(f"Entrada desconhecida para {nome}: {entrada}")
+    _registro[nome] = Indicador(nome, funcao, entradas, parametros)
+
+def disponiveis():
+    """Nomes de todos os indicadores registrados"""
+    return list(_registro)
+
+def chave(nome):
+    """
+    Identidade de um nó: função, identidade das entradas e parâmetros.
+
+    Nós declarados com a mesma definição (ex.: a média de 20 barras usada pela
+    SMA rápida e pelas Bandas de Bollinger) têm a mesma chave e são calculados
+    uma única vez.
+    """
+    if nome in ENTRADAS:
+        return (nome,)
+    if nome not in _registro:
+        raise KeyError(f"Indicador desconhecido: {nome}")
+    indicador = _registro[nome]
+    funcao = indicador.funcao
+    return (
+        getattr(funcao, '__module__', None) or '',
+        getattr(funcao, '__qualname__', funcao.__name__),
+        tuple(chave(entrada) for entrada in indicador.entradas),
+        tuple(sorted(indicador.parametros.items())),
+    )
+
+def plano(colunas):
+    """Nós distintos necessários para calcular as colunas, em ordem topológica"""
+    ordem = []
+    vistos = set()
+    visitando = set()
+
+    def visitar(nome):
+        if nome in ENTRADAS:
+            return
+        k = chave(nome)
+        if k in vistos:
+            return
+        if nome in visitando:
+            raise ValueError(f"Dependência circular envolvendo {nome}")
+        visitando.add(nome)
+        for entrada in _registro[nome].entradas:
+            visitar(entrada)
+        visitando.discard(nome)
+        vistos.add(k)
+        ordem.append(_registro[nome])
+
+    for coluna in colunas:
+        visitar(coluna)
+    return ordem
+
+def assinatura(entradas):
+    """Resumo (hash) do conteúdo das matrizes de entrada, usado como chave da memorização"""
+    resumo = hashlib.blake2b(digest_size=16)
+    for nome in sorted(entradas):
+        matriz = np.ascontiguousarray(entradas[nome], dtype='float64')
+        resumo.update(f'{nome}{matriz.shape}'.encode())
+        resumo.update(matriz)
+    return resumo.digest()
+
+def calcular_matrizes(entradas, colunas, memorizar=False):
+    """
+    Calcula as colunas pedidas a partir das matrizes OHLCV
+
+    Args:
+        entradas: Dicionário {coluna OHLCV: matriz (ações × barras)}
+        colunas: Nomes dos indicadores desejados
+        memorizar: Memoriza os resultados pelo conteúdo das entradas (ver
+            assinatura): dados iguais não recalculam nada, e qualquer barra
+            revisada gera outra chave
+
+    Returns:
+        Dicionário {coluna: matriz}. As matrizes são somente leitura, pois
+        podem ser compartilhadas com outras chamadas.
+    """
+    valores = {(nome,): matriz for nome, matriz in entradas.items()}
+    identificador = assinatura(entradas) if memorizar else None
+
+    def avaliar(nome):
+        k = chave(nome)
+        if k in valores:
+            return valores[k]
+
+        chave_memoria = (identificador, k)
+        if identificador is not None and chave_memoria in _memoria:
+            _memoria.move_to_end(chave_memoria)
+            valores[k] = _memoria[chave_memoria]
+            return valores[k]
+
+        indicador = _registro[nome]
+        argumentos = [avaliar(entrada) for entrada in indicador.entradas]
+        resultado = np.asarray(indicador.funcao(*argumentos, **indicador.parametros))
+        resultado.setflags(write=False)
+        valores[k] = resultado
+
+        if identificador is not None:
+            _memoria[chave_memoria] = resultado
+            while len(_memoria) > TAMANHO_MEMORIA:
+                _memoria.popitem(last=False)
+        return resultado
+
+    plano(colunas)  # valida nomes e dependências antes de calcular
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return {coluna: avaliar(coluna) for coluna in colunas}
+
+def calcular(dados, colunas, memorizar=False):
+    """
+    Calcula os indicadores pedidos para o DataFrame OHLCV de uma ação
+
+    Args:
+        dados: DataFrame com colunas OHLCV e barras contínuas
+        colunas: Nomes dos indicadores desejados
+        memorizar: Memoriza os resultados pelo conteúdo das barras (ver calcular_matrizes)
+
+    Returns:
+        DataFrame com as colunas pedidas e o mesmo índice de dados
+    """
+    entradas = {col: dados[col].to_numpy(dtype='float64')[None, :] for col in ENTRADAS}
+    matrizes = calcular_matrizes(entradas, colunas, memorizar)
+    return pd.DataFrame({coluna: matrizes[coluna][0] for coluna in colunas}, index=dados.index)
+
+def limpar_memoria():
+    """Descarta todos os resultados memorizados"""
+    _memoria.clear()
+
+# Funções auxiliares dos nós
+
+def _validos(fechamento):
+    return ~np.isnan(fechamento)
+
+def _diferenca(a, b):
+    return a - b
+
+def _banda(media, desvio, multiplicador):
+    return media + desvio * multiplicador
+
+def _ganho(delta, validos):
+    return np.where(validos, np.where(delta > 0, delta, 0.0), np.nan)
+
+def _perda(delta, validos):
+    return np.where(validos, np.where(delta < 0, -delta, 0.0), np.nan)
+
+def _rsi(ganho_medio, perda_media):
+    perda_media = np.where(perda_media == 0, np.inf, perda_media)
+    return 100 - (100 / (1 + ganho_medio / perda_media))
+
+def _ema(serie, validos, periodo):
+    return kernel.media_exponencial(serie, 2 / (periodo + 1), adjust=False, validos=validos)
+
+def _volume_relativo(volume, volume_ma):
+    return volume / np.where(volume_ma == 0, 1.0, volume_ma)
+
+def _pos_dm(alta, baixa, validos):
+    return kernel.movimentos_direcionais(alta, baixa, validos)[0]
+
+def _neg_dm(alta, baixa, validos):
+    return kernel.movimentos_direcionais(alta, baixa, validos)[1]
+
+# Indicadores de processar_dados, com os parâmetros de config.py
+
+registrar('validos', _validos, ['Close'])
+registrar('close_anterior', kernel.deslocar, ['Close'])
+registrar('delta', _diferenca, ['Close', 'close_anterior'])
+
+# Médias móveis e Bandas de Bollinger
+registrar('trend_sma_fast', kernel.media_movel, ['Close'], janela=SMA_RAPIDA)
+registrar('trend_sma_slow', kernel.media_movel, ['Close'], janela=SMA_LENTA)
+registrar('bb_media', kernel.media_movel, ['Close'], janela=BB_PERIODO)
+registrar('bb_desvio', kernel.desvio_movel, ['Close'], janela=BB_PERIODO)
+registrar('trend_bb_upper', _banda, ['bb_media', 'bb_desvio'], multiplicador=BB_DESVIO)
+registrar('trend_bb_lower', _banda, ['bb_media', 'bb_desvio'], multiplicador=-BB_DESVIO)
+
+# RSI
+registrar('ganho', _ganho, ['delta', 'validos'])
+registrar('perda', _perda, ['delta', 'validos'])
+registrar('ganho_medio', kernel.media_movel, ['ganho'], janela=RSI_PERIODO)
+registrar('perda_media', kernel.media_movel, ['perda'], janela=RSI_PERIODO)
+registrar('momentum_rsi', _rsi, ['ganho_medio', 'perda_media'])
+
+# MACD
+registrar('ema_rapida', _ema, ['Close', 'validos'], periodo=MACD_RAPIDA)
+registrar('ema_lenta', _ema, ['Close', 'validos'], periodo=MACD_LENTA)
+registrar('trend_macd', _diferenca, ['ema_rapida', 'ema_lenta'])
+registrar('trend_macd_signal', _ema, ['trend_macd', 'validos'], periodo=MACD_SINAL)
+registrar('trend_macd_hist', _diferenca, ['trend_macd', 'trend_macd_signal'])
+
+# Volume
+registrar('volume_ma20', kernel.media_movel, ['Volume'], janela=VOLUME_PERIODO)
+registrar('volume_rel', _volume_relativo, ['Volume', 'volume_ma20'])
+
+# ADX (as três suavizações de Wilder compartilham os pesos)
+registrar('true_range', kernel.true_range, ['High', 'Low', 'close_anterior'])
+registrar('pos_dm', _pos_dm, ['High', 'Low', 'validos'])
+registrar('neg_dm', _neg_dm, ['High', 'Low', 'validos'])
+registrar('wilder_pesos', kernel.pesos_wilder, ['validos'], periodo=ADX_PERIODO)
+registrar('tr_suave', kernel.suavizar_wilder, ['true_range', 'validos', 'wilder_pesos'], periodo=ADX_PERIODO)
+registrar('pos_dm_suave', kernel.suavizar_wilder, ['pos_dm', 'validos', 'wilder_pesos'], periodo=ADX_PERIODO)
+registrar('neg_dm_suave', kernel.suavizar_wilder, ['neg_dm', 'validos', 'wilder_pesos'], periodo=ADX_PERIODO)
+registrar('trend_adx_pos', kernel.indice_direcional, ['pos_dm_suave', 'tr_suave'])
+registrar('trend_adx_neg', kernel.indice_direcional, ['neg_dm_suave', 'tr_suave'])
+registrar('trend_adx', kernel.adx_de_di, ['trend_adx_pos', 'trend_adx_neg'], periodo=ADX_PERIODO)
@@ -0,0 +1,296 @@
+import math
+import threading
+from collections import deque
+import pandas as pd
+from trade_bot.config import (SMA_RAPIDA, SMA_LENTA, RSI_PERIODO, BB_PERIODO, BB_DESVIO, ADX_PERIODO,
+                              MACD_RAPIDA, MACD_LENTA, MACD_SINAL, VOLUME_PERIODO)
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+
+class _JanelaMovel:
+    """Janela deslizante com soma e soma dos quadrados (equivale a rolling(n, min_periods=1))"""
+
+    # A cada tantas atualizações as somas são recalculadas para evitar acúmulo de erro
+    RESSINCRONIZAR = 1000
+
+    def __init__(self, tamanho):
+        self.valores = deque(maxlen=tamanho)
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+        self.atualizacoes = 0
+
+    def adicionar(self, valor):
+        if len(self.valores) == self.valores.maxlen:
+            antigo = self.valores[0]
+            self.soma -= antigo
+            self.soma_quadrados -= antigo * antigo
+        self.valores.append(valor)
+        self.soma += valor
+        self.soma_quadrados += valor * valor
+
+        self.atualizacoes += 1
+        if self.atualizacoes % self.RESSINCRONIZAR == 0:
+            self.soma = math.fsum(self.valores)
+            self.soma_quadrados = math.fsum(v * v for v in self.valores)
+
+    def media(self):
+        return self.soma / len(self.valores)
+
+    def desvio(self):
+        """Desvio padrão amostral (ddof=1), NaN com menos de duas observações"""
+        n = len(self.valores)
+        if n < 2:
+            return math.nan
+        variancia = (self.soma_quadrados - self.soma * self.soma / n) / (n - 1)
+        return math.sqrt(max(variancia, 0.0))
+
+    def estado(self):
+        return (self.valores.copy(), self.soma, self.soma_quadrados, self.atualizacoes)
+
+    def restaurar(self, estado):
+        valores, self.soma, self.soma_quadrados, self.atualizacoes = estado
+        self.valores = valores.copy()
+
+class _MediaExponencial:
+    """
+    Média exponencial com a mesma recorrência de pandas.Series.ewm
+    (ignore_na=False), inclusive adjust e min_periods.
+    """
+
+    def __init__(self, alpha, adjust=True, min_periods=1):
+        self.fator = 1.0 - alpha
+        self.peso_novo = 1.0 if adjust else alpha
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.media = math.nan
+        self.peso_antigo = 1.0
+        self.observacoes = 0
+
+    def adicionar(self, valor):
+        observado = not math.isnan(valor)
+        self.observacoes += observado
+
+        if not math.isnan(self.media):
+            self.peso_antigo *= self.fator
+            if observado:
+                if self.media != valor:
+                    self.media = ((self.peso_antigo * self.media) + (self.peso_novo * valor)) / (self.peso_antigo + self.peso_novo)
+                if self.adjust:
+                    self.peso_antigo += self.peso_novo
+                else:
+                    self.peso_antigo = 1.0
+        elif observado:
+            self.media = valor
+
+        return self.media if self.observacoes >= self.min_periods else math.nan
+
+    def estado(self):
+        return (self.media, self.peso_antigo, self.observacoes)
+
+    def restaurar(self, estado):
+        self.media, self.peso_antigo, self.observacoes = estado
+
+class MotorIndicadores:
+    """
+    Calcula os indicadores de processar_dados de forma incremental, barra a barra.
+
+    Cada chamada a update custa O(1): o estado guarda as somas das janelas das
+    médias e das Bandas de Bollinger, as médias exponenciais do MACD, a
+    suavização de Wilder do ADX e as janelas de ganhos/perdas do RSI.
+    Reenviar a barra da última data (pregão em andamento) substitui a anterior.
+    """
+
+    def __init__(self, sma_rapida=SMA_RAPIDA, sma_lenta=SMA_LENTA, rsi_periodo=RSI_PERIODO,
+                 bb_periodo=BB_PERIODO, bb_desvio=BB_DESVIO, adx_periodo=ADX_PERIODO,
+                 volume_periodo=VOLUME_PERIODO, macd_rapida=MACD_RAPIDA, macd_lenta=MACD_LENTA,
+                 macd_sinal=MACD_SINAL):
+        self.bb_desvio = bb_desvio
+
+        self.sma_rapida = _JanelaMovel(sma_rapida)
+        self.sma_lenta = _JanelaMovel(sma_lenta)
+        self.bb = _JanelaMovel(bb_periodo)
+        self.ganhos = _JanelaMovel(rsi_periodo)
+        self.perdas = _JanelaMovel(rsi_periodo)
+        self.volume = _JanelaMovel(volume_periodo)
+
+        self.ema_rapida = _MediaExponencial(2 / (macd_rapida + 1), adjust=False)
+        self.ema_lenta = _MediaExponencial(2 / (macd_lenta + 1), adjust=False)
+        self.ema_sinal = _MediaExponencial(2 / (macd_sinal + 1), adjust=False)
+
+        alpha = 1 / adx_periodo
+        self.tr = _MediaExponencial(alpha, min_periods=adx_periodo)
+        self.pos_dm = _MediaExponencial(alpha, min_periods=adx_periodo)
+        self.neg_dm = _MediaExponencial(alpha, min_periods=adx_periodo)
+        self.adx = _MediaExponencial(alpha, min_periods=adx_periodo)
+
+        self.barra_anterior = None
+        self.ultima_data = None
+        self.ultima_linha = None
+        self.completas = 0  # Barras com todos os indicadores definidos
+        self._estado_anterior = None
+
+    def _componentes(self):
+        return (self.sma_rapida, self.sma_lenta, self.bb, self.ganhos, self.perdas, self.volume,
+                self.ema_rapida, self.ema_lenta, self.ema_sinal,
+                self.tr, self.pos_dm, self.neg_dm, self.adx)
+
+    def _salvar_estado(self):
+        return ([c.estado() for c in self._componentes()], self.barra_anterior, self.ultima_data, self.ultima_linha,
+                self.completas)
+
+    def _restaurar_estado(self, estado):
+        componentes, self.barra_anterior, self.ultima_data, self.ultima_linha, self.completas = estado
+        for componente, valor in zip(self._componentes(), componentes):
+            componente.restaurar(valor)
+
+    def update(self, bar, data=None):
+        """
+        Processa uma nova barra e retorna a linha de indicadores correspondente
+
+        Args:
+            bar: Mapeamento com Open, High, Low, Close e Volume (dict ou linha de DataFrame)
+            data: Data da barra (padrão: bar.name, quando disponível)
+
+        Returns:
+            Dicionário com as colunas de COLUNAS_INDICADORES (NaN enquanto não houver histórico suficiente)
+        """
+        if data is None:
+            data = getattr(bar, 'name', None)
+
+        if data is not None and data == self.ultima_data and self._estado_anterior is not None:
+            # Revisão da última barra: volta ao estado anterior a ela
+            self._restaurar_estado(self._estado_anterior)
+        else:
+            self._estado_anterior = self._salvar_estado()
+
+        alta = float(bar['High'])
+        baixa = float(bar['Low'])
+        fechamento = float(bar['Close'])
+        volume = float(bar['Volume'])
+        anterior = self.barra_anterior
+
+        # Médias móveis e Bandas de Bollinger
+        self.sma_rapida.adicionar(fechamento)
+        self.sma_lenta.adicionar(fechamento)
+        self.bb.adicionar(fechamento)
+        media_bb = self.bb.media()
+        desvio_bb = self.bb.desvio()
+
+        # RSI
+        delta = math.nan if anterior is None else fechamento - anterior[2]
+        self.ganhos.adicionar(delta if delta > 0 else 0.0)
+        self.perdas.adicionar(-delta if delta < 0 else 0.0)
+        perda_media = self.perdas.media()
+        rs = self.ganhos.media() / (perda_media if perda_media != 0 else math.inf)
+        rsi = 100 - (100 / (1 + rs))
+
+        # MACD
+        macd = self.ema_rapida.adicionar(fechamento) - self.ema_lenta.adicionar(fechamento)
+        sinal = self.ema_sinal.adicionar(macd)
+
+        # Volume
+        self.volume.adicionar(volume)
+        volume_ma = self.volume.media()
+
+        # ADX
+        if anterior is None:
+            tr = alta - baixa
+            pos_dm = neg_dm = 0.0
+        else:
+            alta_ant, baixa_ant, fech_ant = anterior
+            tr = max(alta - baixa, abs(alta - fech_ant), abs(baixa - fech_ant))
+            up_move = alta - alta_ant
+            down_move = baixa_ant - baixa
+            pos_dm = up_move if (up_move > down_move and up_move > 0) else 0.0
+            neg_dm = down_move if (down_move > up_move and down_move > 0) else 0.0
+
+        tr14 = self.tr.adicionar(tr)
+        pos_dm14 = self.pos_dm.adicionar(pos_dm)
+        neg_dm14 = self.neg_dm.adicionar(neg_dm)
+        pos_di = 100 * pos_dm14 / tr14 if tr14 else math.nan
+        neg_di = 100 * neg_dm14 / tr14 if tr14 else math.nan
+        soma_di = pos_di + neg_di
+        dx = 100 * abs(pos_di - neg_di) / soma_di if soma_di else math.nan
+        adx = self.adx.adicionar(dx)
+
+        self.barra_anterior = (alta, baixa, fechamento)
+        self.ultima_data = data
+        self.ultima_linha = {
+            'trend_sma_fast': self.sma_rapida.media(),
+            'trend_sma_slow': self.sma_lenta.media(),
+            'momentum_rsi': rsi,
+            'trend_macd': macd,
+            'trend_macd_signal': sinal,
+            'trend_macd_hist': macd - sinal,
+            'trend_bb_upper': media_bb + desvio_bb * self.bb_desvio,
+            'trend_bb_lower': media_bb - desvio_bb * self.bb_desvio,
+            'volume_ma20': volume_ma,
+            'volume_rel': volume / (volume_ma if volume_ma != 0 else 1),
+            'trend_adx': adx,
+        }
+        if self.pronto():
+            self.completas += 1
+        return self.ultima_linha
+
+    def pronto(self):
+        """Indica se a última linha tem todos os indicadores definidos (como após o dropna de processar_dados)"""
+        return self.ultima_linha is not None and not any(math.isnan(v) for v in self.ultima_linha.values())
+
+    def continua(self, dados):
+        """
+        Indica se dados prolonga o histórico já processado
+
+        A última barra processada pode ser revisada (pregão em andamento), mas
+        a anterior a ela tem de estar em dados com os mesmos preços; senão a
+        fonte reajustou o histórico (desdobramento, dividendos) e o estado
+        não vale mais.
+        """
+        if self.ultima_data is None:
+            return True
+        if self.ultima_data not in dados.index:
+            return False
+        _, anterior, data_anterior, _, _ = self._estado_anterior
+        if anterior is None:
+            return True
+        if data_anterior not in dados.index:
+            return False
+        barra = dados.loc[data_anterior]
+        return all(math.isclose(float(barra[coluna]), valor, rel_tol=1e-12)
+                   for coluna, valor in zip(('High', 'Low', 'Close'), anterior))
+
+    def aquecer(self, dados):
+        """Inicializa o estado a partir de um histórico e retorna os indicadores de todas as barras"""
+        linhas = [self.update(linha, data) for data, linha in zip(dados.index, dados.to_dict('records'))]
+        return pd.DataFrame(linhas, index=dados.index, columns=COLUNAS_INDICADORES)
+
+# Estado dos indicadores por ação
+_motores = {}
+_lock = threading.Lock()
+
+def obter_motor(acao):
+    """Retorna o motor incremental da ação, criando-o se necessário"""
+    if acao not in _motores:
+        _motores[acao] = MotorIndicadores()
+    return _motores[acao]
+
+def atualizar(acao, dados):
+    """
+    Alimenta o motor da ação com as barras ainda não processadas
+
+    Se o histórico foi reajustado pela fonte (ver MotorIndicadores.continua),
+    o motor é recriado a partir de todas as barras.
+
+    Returns:
+        Dicionário com os indicadores da última barra, ou None se não houver barras
+    """
+    with _lock:
+        motor = obter_motor(acao)
+        if not motor.continua(dados):
+            motor = _motores[acao] = MotorIndicadores()
+        if motor.ultima_data is not None:
+            # Reprocessa a partir da última barra conhecida (pode ter sido revisada)
+            dados = dados[dados.index >= motor.ultima_data]
+
+        linha = None
+        for data, barra in zip(dados.index, dados.to_dict('records')):
+            linha = motor.update(barra, data)
+        return linha
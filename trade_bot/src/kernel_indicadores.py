@@ -0,0 +1,278 @@
+from functools import lru_cache
+import numpy as np
+from trade_bot.config import (SMA_RAPIDA, SMA_LENTA, RSI_PERIODO, BB_PERIODO, BB_DESVIO, ADX_PERIODO,
+                              MACD_RAPIDA, MACD_LENTA, MACD_SINAL, VOLUME_PERIODO)
+
+COLUNAS_INDICADORES = [
+    'trend_sma_fast', 'trend_sma_slow', 'momentum_rsi',
+    'trend_macd', 'trend_macd_signal', 'trend_macd_hist',
+    'trend_bb_upper', 'trend_bb_lower', 'volume_ma20', 'volume_rel', 'trend_adx'
+]
+INDICE = {coluna: i for i, coluna in enumerate(COLUNAS_INDICADORES)}
+
+# Tamanho do bloco usado para resolver as recorrências das médias exponenciais
+TAMANHO_BLOCO = 128
+
+def alocar_saida(n_acoes, n_barras):
+    """Aloca a matriz de saída (indicadores × ações × barras)"""
+    return np.empty((len(COLUNAS_INDICADORES), n_acoes, n_barras))
+
+def calcular_indicadores(alta, baixa, fechamento, volume, saida=None,
+                         sma_rapida=SMA_RAPIDA, sma_lenta=SMA_LENTA, rsi_periodo=RSI_PERIODO,
+                         bb_periodo=BB_PERIODO, bb_desvio=BB_DESVIO, adx_periodo=ADX_PERIODO,
+                         volume_periodo=VOLUME_PERIODO, macd_rapida=MACD_RAPIDA, macd_lenta=MACD_LENTA,
+                         macd_sinal=MACD_SINAL):
+    """
+    Calcula todas as colunas de processar_dados em uma única passagem.
+
+    Os períodos padrão vêm de config.py.
+
+    As entradas são matrizes float64 (ações × barras); cada linha é uma ação.
+    Barras sem dados (Close NaN) são ignoradas: os indicadores de cada ação são
+    calculados apenas sobre as suas próprias barras e ficam NaN nas lacunas.
+    Resultados intermediários comuns (média de 20 barras, diferença dos
+    fechamentos, true range, pesos da suavização de Wilder) são calculados uma
+    única vez.
+
+    Args:
+        saida: Matriz (indicadores × ações × barras) já alocada (opcional, ver alocar_saida)
+
+    Returns:
+        A matriz de saída, na ordem de COLUNAS_INDICADORES
+    """
+    alta, baixa, fechamento, volume = (np.atleast_2d(np.asarray(x, dtype='float64')) for x in (alta, baixa, fechamento, volume))
+    if saida is None:
+        saida = alocar_saida(*fechamento.shape)
+
+    validos = ~np.isnan(fechamento)
+    lacunas = ~validos
+    ordem = _ordem_compactacao(validos)
+    if ordem is not None:
+        alta, baixa, fechamento, volume, validos = (
+            np.take_along_axis(x, ordem, axis=1) for x in (alta, baixa, fechamento, volume, validos)
+        )
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Médias móveis e Bandas de Bollinger (a média de 20 barras é compartilhada)
+        media_movel(fechamento, sma_rapida, out=saida[INDICE['trend_sma_fast']])
+        media_movel(fechamento, sma_lenta, out=saida[INDICE['trend_sma_slow']])
+        if bb_periodo == sma_rapida:
+            media_bb = saida[INDICE['trend_sma_fast']]
+        else:
+            media_bb = media_movel(fechamento, bb_periodo)
+        desvio = desvio_movel(fechamento, bb_periodo)
+        desvio *= bb_desvio
+        np.add(media_bb, desvio, out=saida[INDICE['trend_bb_upper']])
+        np.subtract(media_bb, desvio, out=saida[INDICE['trend_bb_lower']])
+
+        # RSI
+        anterior = deslocar(fechamento)
+        delta = np.subtract(fechamento, anterior)
+        ganho, perda = medias_ganhos_perdas(delta, validos, rsi_periodo)
+        perda[perda == 0] = np.inf
+        rsi = saida[INDICE['momentum_rsi']]
+        np.divide(ganho, perda, out=rsi)
+        rsi += 1
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+
+        # MACD
+        macd = saida[INDICE['trend_macd']]
+        sinal = saida[INDICE['trend_macd_signal']]
+        np.subtract(
+            media_exponencial(fechamento, 2 / (macd_rapida + 1), adjust=False, validos=validos),
+            media_exponencial(fechamento, 2 / (macd_lenta + 1), adjust=False, validos=validos),
+            out=macd
+        )
+        media_exponencial(macd, 2 / (macd_sinal + 1), adjust=False, validos=validos, out=sinal)
+        np.subtract(macd, sinal, out=saida[INDICE['trend_macd_hist']])
+
+        # Volume
+        volume_ma = saida[INDICE['volume_ma20']]
+        media_movel(volume, volume_periodo, out=volume_ma)
+        np.divide(volume, np.where(volume_ma == 0, 1.0, volume_ma), out=saida[INDICE['volume_rel']])
+
+        # ADX
+        adx_wilder(alta, baixa, fechamento, validos, adx_periodo, anterior=anterior, out=saida[INDICE['trend_adx']])
+
+    if ordem is not None:
+        # Devolve cada valor à posição original da barra
+        compactado = saida.copy()
+        np.put_along_axis(saida, np.broadcast_to(ordem, saida.shape), compactado, axis=2)
+        saida[:, lacunas] = np.nan
+
+    return saida
+
+def _ordem_compactacao(validos):
+    """
+    Ordem que alinha as barras válidas de cada linha à direita, ou None se já estiverem.
+
+    Com as lacunas no início, toda linha é uma sequência contínua de barras da ação.
+    """
+    primeiros = np.argmax(validos, axis=1)
+    posicoes = np.arange(validos.shape[1])
+    if np.array_equal(validos, posicoes >= primeiros[:, None]) and validos.any(axis=1).all():
+        return None
+    return np.argsort(validos, axis=1, kind='stable')
+
+def deslocar(x):
+    """Equivalente a shift(1) ao longo das barras"""
+    y = np.empty_like(x)
+    y[:, 0] = np.nan
+    y[:, 1:] = x[:, :-1]
+    return y
+
+def somas_moveis(x, janela):
+    """Soma e contagem de valores válidos na janela móvel, via somas acumuladas"""
+    validos = ~np.isnan(x)
+    soma = np.cumsum(np.where(validos, x, 0.0), axis=1)
+    n = np.cumsum(validos, axis=1)
+    soma[:, janela:] -= soma[:, :-janela].copy()
+    n[:, janela:] -= n[:, :-janela].copy()
+    return soma, n
+
+def media_movel(x, janela, out=None):
+    """rolling(janela, min_periods=1).mean() ao longo das barras"""
+    soma, n = somas_moveis(x, janela)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.divide(soma, np.where(n > 0, n, np.nan), out=out)
+
+def desvio_movel(x, janela, out=None):
+    """rolling(janela, min_periods=1).std() (ddof=1) ao longo das barras"""
+    # Centraliza cada linha no primeiro valor válido para reduzir o cancelamento numérico
+    referencia = x[np.arange(len(x)), np.argmax(~np.isnan(x), axis=1)]
+    y = x - np.nan_to_num(referencia)[:, None]
+    soma, n = somas_moveis(y, janela)
+    y *= y
+    soma_quadrados, _ = somas_moveis(y, janela)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        soma *= soma
+        soma /= n
+        np.subtract(soma_quadrados, soma, out=soma)
+        soma /= np.where(n > 1, n - 1, np.nan)
+        np.maximum(soma, 0.0, out=soma)
+        return np.sqrt(soma, out=out)
+
+def medias_ganhos_perdas(delta, validos, periodo):
+    """Médias móveis simples dos ganhos e das perdas (RSI), a partir da diferença dos fechamentos"""
+    ganho = np.where(validos, np.where(delta > 0, delta, 0.0), np.nan)
+    perda = np.where(validos, np.where(delta < 0, -delta, 0.0), np.nan)
+    return media_movel(ganho, periodo), media_movel(perda, periodo)
+
+@lru_cache(maxsize=32)
+def _matriz_bloco(fator, tamanho):
+    """Matriz triangular (transposta) L[i, j] = fator**(i-j) e potências fator**(k+1) de um bloco"""
+    expoentes = np.subtract.outer(np.arange(tamanho), np.arange(tamanho))
+    matriz = np.where(expoentes >= 0, fator ** np.maximum(expoentes, 0), 0.0).T.copy()
+    potencias = fator ** np.arange(1, tamanho + 1)
+    matriz.setflags(write=False)
+    potencias.setflags(write=False)
+    return matriz, potencias
+
+def recorrencia(b, fator, out=None):
+    """
+    Resolve y[t] = fator * y[t-1] + b[t] ao longo das barras, com y[-1] = 0.
+
+    Em vez de um laço por barra, cada bloco de TAMANHO_BLOCO barras é resolvido
+    com um produto de matrizes, levando adiante o último valor do bloco anterior.
+    """
+    n_barras = b.shape[1]
+    y = np.empty_like(b) if out is None else out
+    matriz, potencias = _matriz_bloco(fator, TAMANHO_BLOCO)
+    anterior = np.zeros(b.shape[0])
+
+    for inicio in range(0, n_barras, TAMANHO_BLOCO):
+        fim = min(inicio + TAMANHO_BLOCO, n_barras)
+        n = fim - inicio
+        bloco = b[:, inicio:fim] @ matriz[:n, :n]
+        bloco += anterior[:, None] * potencias[:n]
+        y[:, inicio:fim] = bloco
+        anterior = bloco[:, -1]
+    return y
+
+def media_exponencial(x, alpha, adjust=True, min_periods=1, validos=None, out=None):
+    """
+    Equivalente a ewm(alpha=alpha, adjust=adjust, min_periods=min_periods).mean()
+    aplicado a cada linha (ignore_na=False).
+
+    Com adjust=True a média é S/P, onde S e P são recorrências lineares dos
+    valores e dos pesos; com adjust=False a recorrência é aplicada diretamente
+    (a primeira observação entra com peso 1). No caso adjust=False supõe-se
+    que só há NaN antes da primeira observação, como nas linhas compactadas.
+    """
+    fator = 1.0 - alpha
+    observados = ~np.isnan(x)
+    if validos is not None:
+        observados &= validos
+    contagem = np.cumsum(observados, axis=1)
+
+    if adjust:
+        somas = recorrencia(np.where(observados, x, 0.0), fator)
+        pesos = recorrencia(observados.astype('float64'), fator)
+        resultado = np.divide(somas, pesos, out=out)
+    else:
+        b = np.where(observados, x * alpha, 0.0)
+        primeiros = observados & (contagem == 1)
+        b[primeiros] = x[primeiros]
+        resultado = recorrencia(b, fator, out=out)
+
+    resultado[contagem < max(min_periods, 1)] = np.nan
+    return resultado
+
+def true_range(alta, baixa, fechamento_anterior):
+    """True range: maior entre High-Low, |High-Close anterior| e |Low-Close anterior|"""
+    tr = np.fmax(alta - baixa, np.abs(alta - fechamento_anterior))
+    return np.fmax(tr, np.abs(baixa - fechamento_anterior), out=tr)
+
+def movimentos_direcionais(alta, baixa, validos):
+    """+DM e -DM (zero onde o movimento não é dominante, NaN fora das barras válidas)"""
+    up_move = alta - deslocar(alta)
+    down_move = deslocar(baixa) - baixa
+    pos_dm = np.where(validos, np.where((up_move > down_move) & (up_move > 0), up_move, 0.0), np.nan)
+    neg_dm = np.where(validos, np.where((down_move > up_move) & (down_move > 0), down_move, 0.0), np.nan)
+    return pos_dm, neg_dm
+
+def pesos_wilder(validos, periodo):
+    """Pesos acumulados da suavização de Wilder, comuns a todas as séries das mesmas barras"""
+    return recorrencia(validos.astype('float64'), 1.0 - 1.0 / periodo)
+
+def suavizar_wilder(serie, validos, pesos, periodo):
+    """ewm(alpha=1/periodo, adjust=True, min_periods=periodo).mean() com pesos já calculados"""
+    soma = recorrencia(np.where(validos, np.nan_to_num(serie), 0.0), 1.0 - 1.0 / periodo)
+    soma /= pesos
+    soma[np.cumsum(validos, axis=1) < periodo] = np.nan
+    return soma
+
+def indice_direcional(dm_suavizado, tr_suavizado, out=None):
+    """+DI ou -DI a partir do movimento direcional e do true range suavizados"""
+    di = np.multiply(dm_suavizado, 100, out=out)
+    di /= tr_suavizado
+    return di
+
+def adx_de_di(pos_di, neg_di, periodo, out=None):
+    """ADX: média de Wilder do DX calculado a partir de +DI e -DI"""
+    dx = np.abs(pos_di - neg_di)
+    dx *= 100
+    dx /= pos_di + neg_di
+    return media_exponencial(dx, 1.0 / periodo, min_periods=periodo, out=out)
+
+def adx_wilder(alta, baixa, fechamento, validos, periodo=ADX_PERIODO, anterior=None, out=None):
+    """
+    ADX com suavização de Wilder (ewm alpha=1/periodo, adjust=True, min_periods=periodo)
+
+    As três suavizações (TR, +DM, -DM) compartilham os mesmos pesos, calculados uma vez.
+    """
+    if anterior is None:
+        anterior = deslocar(fechamento)
+
+    tr = true_range(alta, baixa, anterior)
+    pos_dm, neg_dm = movimentos_direcionais(alta, baixa, validos)
+
+    observados = validos & ~np.isnan(tr)
+    pesos = pesos_wilder(observados, periodo)
+    tr14, pos_dm14, neg_dm14 = (suavizar_wilder(serie, observados, pesos, periodo) for serie in (tr, pos_dm, neg_dm))
+
+    # +DI e -DI calculados no lugar, reaproveitando as matrizes suavizadas
+    pos_di = indice_direcional(pos_dm14, tr14, out=pos_dm14)
+    neg_di = indice_direcional(neg_dm14, tr14, out=neg_dm14)
+    return adx_de_di(pos_di, neg_di, periodo, out=out)
@@ -1,29 +1,43 @@
-import time
-from trade_bot.src.data_pipeline import baixar_dados, processar_dados
-from trade_bot.src.strategy import gerar_sinais
-from trade_bot.config import ACOES, ADX_LIMITE, RSI_SOBRECOMPRADO, RSI_SOBREVENDIDO, VOLUME_MIN
-from trade_bot.src.visualizacao import plotar_analiseime
-import schedule
-import pandas as pd
+import logging
 from datetime import datetime
 from .data_pipeline import baixar_dados, processar_dados
+from .painel import processar_painel
 from .strategy import gerar_sinais
-from ..config import ACOES, ADX_LIMITE, RSI_SOBRECOMPRADO, RSI_SOBREVENDIDO, VOLUME_MIN
-from .visualizacao import plotar_analise
+from ..config import (LOG_NIVEL, ACOES, ADX_LIMITE, RSI_SOBRECOMPRADO, RSI_SOBREVENDIDO, VOLUME_MIN,
+                      INTERVALO_MONITORAMENTO, TIMEFRAMES, TRIAGEM_ATIVA, ALERTAS_ATIVOS, HISTORICO_ATIVO)
+from .agendador import Agendador, CONSOLIDACAO
+from .alert_system import obter_despachante
+from .historico_sinais import obter_historico
+from .memoria import verificar_orcamento
+from .metricas import etapa
+from .timeframes import timeframes_conforme_chegam
+from .triagem import triar, imprimir as imprimir_triagem
+from .visualizacao import plotar_varias
 
-def gerar_recomendacao(acao):
-    """Gera recomendação com tratamento completo de erros"""
+def gerar_recomendacao(acao, dados=None, processados=None):
+    """
+    Gera recomendação com tratamento completo de erros
+
+    Args:
+        acao: Código da ação
+        dados: Dados já baixados (opcional); se ausentes, são obtidos da fonte
+        processados: Dados já com indicadores (opcional, ex.: vindos de processar_painel)
+    """
     try:
-        # Aumentar o período de dados para garantir quantidade suficiente
-        periodo_ajustado = "2y"  # Usar 2 anos de dados históricos
-        dados = baixar_dados(acao, periodo=periodo_ajustado)
+        if processados is not None:
+            dados = processados
+        elif dados is None:
+            # Aumentar o período de dados para garantir quantidade suficiente
+            periodo_ajustado = "2y"  # Usar 2 anos de dados históricos
+            dados = baixar_dados(acao, periodo=periodo_ajustado)
         
         if dados is None or dados.empty:
             print(f"Erro: Dados não disponíveis para {acao}")
             return f"Erro: Dados não disponíveis para {acao}", None
         
         # Processar dados com quantidade mínima de períodos
-        processados = processar_dados(dados, min_periodos=50)
+        if processados is None:
+            processados = processar_dados(dados, min_periodos=50)
         if processados is None:
             print(f"Erro: Dados insuficientes para análise de {acao}")
             return f"Erro: Dados insuficientes para análise de {acao}", None
@@ -71,6 +85,15 @@ def gerar_recomendacao(acao):
         print(f"Erro ao processar {acao}: {str(e)}")
         return f"Erro ao processar {acao}: {str(e)}", None
 
+def gravar_historico(dados_por_acao, timeframe):
+    """Grava as barras avaliadas no histórico de sinais; uma falha não interrompe o monitoramento"""
+    if not HISTORICO_ATIVO:
+        return
+    try:
+        obter_historico().gravar(dados_por_acao, timeframe)
+    except Exception as e:
+        print(f"Erro ao gravar o histórico de sinais ({timeframe}): {str(e)}")
+
 def validar_sinal(dados, sinal):
     """Validação adicional do sinal"""
     if sinal == 0:
@@ -95,33 +118,87 @@ def validar_sinal(dados, sinal):
             adx > ADX_LIMITE
         )
 
-def monitorar_acoes():
-    print(f"\n{datetime.now()}: Analisando ações...")
+@etapa('monitoramento')
+def monitorar_acoes(tipo=None):
+    if tipo == CONSOLIDACAO:
+        print(f"\n{datetime.now()}: Consolidação do fim do pregão...")
+    else:
+        print(f"\n{datetime.now()}: Analisando ações...")
+    # Uma única requisição agrupada para todas as ações; os timeframes
+    # (diário e os de TIMEFRAMES) são reamostrados localmente, e cada ação é
+    # analisada assim que o download dela termina, enquanto as demais ainda
+    # estão sendo baixadas
+    timeframes = [timeframe for timeframe in dict.fromkeys(TIMEFRAMES) if timeframe != '1d']
+    com_sinais = {}
+    sinais_timeframes = {timeframe: {} for timeframe in timeframes}
+    recebidas = set()
+    for acao, por_timeframe in timeframes_conforme_chegam(ACOES, timeframes=['1d', *timeframes], periodo="2y"):
+        if '1d' in por_timeframe:
+            recebidas.add(acao)
+            processados = processar_painel({acao: por_timeframe['1d']}, min_periodos=50)
+            if acao not in processados:
+                print(f"Erro: Dados insuficientes para análise de {acao}")
+            else:
+                recomendacao, dados = gerar_recomendacao(acao, processados=processados[acao])
+                print(recomendacao)
+                if dados is not None and not dados.empty:
+                    com_sinais[acao] = dados
+
+        # Recomendações nos demais timeframes (só a última barra de cada um é usada)
+        for timeframe in timeframes:
+            if timeframe not in por_timeframe:
+                continue
+            for _, dados in processar_painel({acao: por_timeframe[timeframe]}, min_periodos=50, ultimas=1).items():
+                recomendacao, sinais = gerar_recomendacao(acao, processados=dados)
+                print(f"[{timeframe}] {recomendacao}")
+                if sinais is not None:
+                    sinais_timeframes[timeframe][acao] = sinais
     for acao in ACOES:
-        recomendacao, dados = gerar_recomendacao(acao)
-        print(recomendacao)
-        
-        # Salvar gráfico de análise
-        if dados is not None and not dados.empty:
-            plotar_analise(dados, acao)
+        if acao not in recebidas:
+            print(f"Erro: Dados não disponíveis para {acao}")
+
+    gravar_historico(com_sinais, '1d')
+    for timeframe, sinais in sinais_timeframes.items():
+        gravar_historico(sinais, timeframe)
+
+    verificar_orcamento(com_sinais, 'monitoramento')
+
+    # Alertas das mudanças de sinal (enfileirados; enviados em segundo plano)
+    if ALERTAS_ATIVOS:
+        despachante = obter_despachante()
+        for acao, dados in com_sinais.items():
+            despachante.notificar(acao, dados['Sinal'].iloc[-1], dados['Close'].iloc[-1], f"{dados.index[-1]:%d/%m/%Y}")
+
+    # Salvar gráficos de análise (em paralelo, apenas os que mudaram)
+    plotar_varias(com_sinais)
+
+    # Ranking do universo (config.ARQUIVO_UNIVERSO)
+    if TRIAGEM_ATIVA:
+        imprimir_triagem(triar())
 
 def main():
+    # Avisos do pipeline no console, no nível configurado
+    logging.basicConfig(level=LOG_NIVEL, format='%(levelname)s %(name)s: %(message)s')
+
     # Teste inicial
     monitorar_acoes()
     
-    # Agendamento (opcional)
-    schedule.every().hour.do(monitorar_acoes)
-    
+    # Agendamento pelo calendário da B3: após cada barra do pregão e uma
+    # consolidação após o fechamento; nada roda fora do pregão
+    agendador = Agendador(INTERVALO_MONITORAMENTO)
+    proximo, _ = agendador.proximo()
+    print(f"Próxima análise: {proximo:%d/%m/%Y %H:%M}")
+
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)
+        agendador.executar(monitorar_acoes)
     except KeyboardInterrupt:
         print("\nMonitoramento interrompido pelo usuário")
     except Exception as e:
         print(f"\nErro durante o monitoramento: {str(e)}")
     finally:
         print("Encerrando bot de trading...")
+        if ALERTAS_ATIVOS:
+            obter_despachante().parar()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Representação compacta dos dados processados e orçamento de memória por ação.
+
+No modo compacto (config.MODO_COMPACTO) os indicadores são guardados em
+float32 e o Sinal em int8; os preços e o volume continuam em float64. As
+colunas usadas apenas no cálculo dos indicadores (Open, High, Low) podem
+ser descartadas depois dele (config.DESCARTAR_INTERMEDIARIAS).
+
+O pipeline mede a memória dos DataFrames que mantém de cada ação e avisa
+quando uma delas passa do orçamento (config.ORCAMENTO_MEMORIA_ACAO); os valores também
+ficam nas métricas (/metrics).
+"""
+import logging
+
+import numpy as np
+
+from trade_bot.config import MODO_COMPACTO, DESCARTAR_INTERMEDIARIAS, ORCAMENTO_MEMORIA_ACAO
+from trade_bot.src.metricas import registro
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_INTERMEDIARIAS = ['Open', 'High', 'Low']
+
+MEMORIA_ACOES = registro.medidor(
+    'trade_bot_ticker_memory_bytes', 'Memória dos dados mantidos de cada ação', ('symbol', 'pipeline'))
+ACIMA_ORCAMENTO = registro.contador(
+    'trade_bot_ticker_memory_over_budget_total', 'Ações acima do orçamento de memória, por verificação', ('pipeline',))
+
+def dtype_indicadores(compacto=None):
+    """Tipo das colunas de indicadores: float32 no modo compacto, float64 no normal"""
+    return np.float32 if (MODO_COMPACTO if compacto is None else compacto) else np.float64
+
+def dtype_sinal(compacto=None):
+    """Tipo da coluna Sinal: int8 no modo compacto, int64 no normal"""
+    return np.int8 if (MODO_COMPACTO if compacto is None else compacto) else np.int64
+
+def descartar_intermediarias(colunas, descartar=None):
+    """Colunas que ficam nos dados processados (sem as intermediárias, se configurado)"""
+    descartar = DESCARTAR_INTERMEDIARIAS if descartar is None else descartar
+    return [coluna for coluna in colunas if not (descartar and coluna in COLUNAS_INTERMEDIARIAS)]
+
+def memoria(df):
+    """Bytes ocupados pelos dados e pelo índice de um DataFrame"""
+    return int(df.memory_usage(index=True, deep=False).sum())
+
+def verificar_orcamento(dados_por_acao, pipeline, orcamento=ORCAMENTO_MEMORIA_ACAO):
+    """
+    Mede a memória dos dados de cada ação e avisa as que passam do orçamento
+
+    Args:
+        dados_por_acao: {ação: DataFrame}
+        pipeline: Nome de quem chama (monitoramento, snapshot, triagem), usado nas métricas
+        orcamento: Bytes por ação (None = sem limite)
+
+    Returns:
+        Dicionário com 'por_acao' ({ação: bytes}), 'total' e 'acima' (ações acima do orçamento)
+    """
+    por_acao = {acao: memoria(dados) for acao, dados in dados_por_acao.items() if dados is not None}
+    acima = sorted(acao for acao, tamanho in por_acao.items() if orcamento is not None and tamanho > orcamento)
+
+    valores = {chave: valor for chave, valor in MEMORIA_ACOES.valores().items() if chave[1] != pipeline}
+    valores.update({(acao, pipeline): tamanho for acao, tamanho in por_acao.items()})
+    MEMORIA_ACOES.substituir(valores)
+    if acima:
+        ACIMA_ORCAMENTO.inc(len(acima), pipeline=pipeline)
+        exemplos = ', '.join(f'{acao} ({por_acao[acao] // 1024} KiB)' for acao in acima[:10])
+        logger.warning("%d ações acima do orçamento de memória (%d KiB) em %s: %s%s", len(acima), orcamento // 1024,
+                       pipeline, exemplos, '...' if len(acima) > 10 else '')
+    logger.debug("Memória dos dados em %s: %d KiB em %d ações", pipeline, sum(por_acao.values()) // 1024,
+                 len(por_acao))
+    return {'por_acao': por_acao, 'total': sum(por_acao.values()), 'acima': acima}
@@ -0,0 +1,259 @@
+"""
+Métricas do processo (contadores, medidores e histogramas) no formato de
+exposição do Prometheus.
+
+As métricas ficam em memória, em um registro global; o servidor web as
+expõe em /metrics. Cada atualização é uma soma sob um lock, sem E/S, para
+poder ficar nos caminhos quentes do pipeline. Medidores que dependem de
+estado (idade do snapshot, taxa de acerto do cache) são calculados só na
+coleta, por funções registradas com ao_coletar.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+# Limites (segundos) dos histogramas de latência: de requisições HTTP a ciclos inteiros do pipeline
+LIMITES_PADRAO = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _formatar_rotulos(nomes, valores, extra=()):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in (*zip(nomes, valores), *extra)]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+def _formatar_valor(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+class Metrica:
+    """Base das métricas: nome, ajuda, nomes dos rótulos e valores por combinação de rótulos"""
+
+    tipo = 'untyped'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def _chave(self, rotulos):
+        if len(rotulos) != len(self.rotulos):
+            raise ValueError(f"{self.nome}: rótulos esperados {self.rotulos}, recebidos {tuple(rotulos)}")
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+    def limpar(self):
+        with self._lock:
+            self._valores.clear()
+
+    def valores(self):
+        """Cópia de {tupla de rótulos: valor} de todas as combinações"""
+        with self._lock:
+            return dict(self._valores)
+
+    def amostras(self):
+        """Linhas (sufixo, rótulos formatados, valor) da exposição"""
+        with self._lock:
+            itens = sorted(self._valores.items())
+        return [('', _formatar_rotulos(self.rotulos, chave), valor) for chave, valor in itens]
+
+    def exportar(self):
+        linhas = [f'# HELP {self.nome} {self.ajuda}', f'# TYPE {self.nome} {self.tipo}']
+        linhas += [f'{self.nome}{sufixo}{rotulos} {_formatar_valor(valor)}' for sufixo, rotulos, valor in self.amostras()]
+        return '\n'.join(linhas)
+
+class Contador(Metrica):
+    """Valor que só cresce (eventos, falhas, bytes)"""
+
+    tipo = 'counter'
+
+    def inc(self, valor=1, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + valor
+
+    def valor(self, **rotulos):
+        return self._valores.get(self._chave(rotulos), 0)
+
+class Medidor(Metrica):
+    """Valor instantâneo (idade, tamanho de fila)"""
+
+    tipo = 'gauge'
+
+    def definir(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        with self._lock:
+            self._valores[chave] = valor
+
+    def substituir(self, valores):
+        """Troca todos os valores de uma vez: {tupla de rótulos: valor}"""
+        novos = {tuple(str(v) for v in chave): valor for chave, valor in valores.items()}
+        with self._lock:
+            self._valores = novos
+
+class Histograma(Metrica):
+    """Distribuição de valores em faixas cumulativas, com soma e contagem"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites))
+
+    def observar(self, valor, **rotulos):
+        chave = self._chave(rotulos)
+        faixa = bisect_left(self.limites, valor)
+        with self._lock:
+            item = self._valores.get(chave)
+            if item is None:
+                # [contagem por faixa (a última é +Inf), soma]
+                item = self._valores[chave] = [[0] * (len(self.limites) + 1), 0.0]
+            item[0][faixa] += 1
+            item[1] += valor
+
+    @contextmanager
+    def medir(self, **rotulos):
+        """Observa a duração (segundos) do bloco, mesmo que ele lance exceção"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def contagem(self, **rotulos):
+        item = self._valores.get(self._chave(rotulos))
+        return sum(item[0]) if item else 0
+
+    def amostras(self):
+        with self._lock:
+            itens = sorted((chave, (list(contagens), soma)) for chave, (contagens, soma) in self._valores.items())
+        linhas = []
+        for chave, (contagens, soma) in itens:
+            acumulado = 0
+            for limite, contagem in zip((*self.limites, float('inf')), contagens):
+                acumulado += contagem
+                linhas.append(('_bucket', _formatar_rotulos(self.rotulos, chave, [('le', _formatar_valor(limite))]),
+                               acumulado))
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(('_sum', rotulos, soma))
+            linhas.append(('_count', rotulos, acumulado))
+        return linhas
+
+class Registro:
+    """Conjunto de métricas do processo"""
+
+    def __init__(self):
+        self._metricas = {}
+        self._coletores = []
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = self._metricas[nome] = classe(nome, *args, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica {nome} já registrada como {metrica.tipo}")
+            return metrica
+
+    def contador(self, nome, ajuda, rotulos=()):
+        return self._registrar(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome, ajuda, rotulos=()):
+        return self._registrar(Medidor, nome, ajuda, rotulos)
+
+    def histograma(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        return self._registrar(Histograma, nome, ajuda, rotulos, limites)
+
+    def ao_coletar(self, funcao):
+        """Registra funcao() para atualizar medidores imediatamente antes de cada exportação"""
+        with self._lock:
+            self._coletores.append(funcao)
+        return funcao
+
+    def exportar(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)"""
+        for funcao in list(self._coletores):
+            try:
+                funcao()
+            except Exception:
+                pass  # uma métrica derivada com erro não pode derrubar as demais
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda metrica: metrica.nome)
+        return '\n'.join(metrica.exportar() for metrica in metricas) + '\n'
+
+registro = Registro()
+
+def _familias(texto):
+    """{nome: (linhas HELP/TYPE, amostras)} de uma exposição"""
+    familias, nome = {}, None
+    for linha in texto.splitlines():
+        if linha.startswith('# HELP '):
+            nome = linha.split(' ', 3)[2]
+            familias[nome] = ([], [])
+        if nome is not None and linha:
+            familias[nome][0 if linha.startswith('#') else 1].append(linha)
+    return familias
+
+def _rotular(amostra, rotulo):
+    """Acrescenta o rótulo (ex.: process="worker") a uma linha de amostra"""
+    fim = min(posicao for posicao in (amostra.find('{'), amostra.find(' ')) if posicao >= 0)
+    nome, resto = amostra[:fim], amostra[fim:]
+    if resto.startswith('{'):
+        return f'{nome}{{{rotulo},{resto[1:]}'
+    return f'{nome}{{{rotulo}}}{resto}'
+
+def combinar(texto, complementar, processos=('worker', 'producer')):
+    """
+    Junta duas exposições (ex.: a de um worker do servidor com a do produtor do snapshot)
+
+    As amostras das duas são mantidas, distinguidas pelo rótulo process
+    (processos: valores para texto e para complementar). Métricas dos dois
+    processos não são somadas.
+    """
+    combinadas = {}
+    for exposicao, processo in ((texto, processos[0]), (complementar, processos[1])):
+        rotulo = f'process="{processo}"'
+        for nome, (cabecalho, amostras) in _familias(exposicao).items():
+            familia = combinadas.setdefault(nome, (cabecalho, []))
+            familia[1].extend(_rotular(amostra, rotulo) for amostra in amostras)
+    return '\n'.join('\n'.join(combinadas[nome][0] + combinadas[nome][1]) for nome in sorted(combinadas)) + '\n'
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+DURACAO_ETAPAS = registro.histograma(
+    'trade_bot_stage_duration_seconds', 'Duração de cada etapa do pipeline', ('stage',))
+
+def etapa(nome):
+    """
+    Mede a duração de uma etapa do pipeline
+
+    Pode ser usado como gerenciador de contexto (with etapa('download'):) ou
+    como decorador (@etapa('sinais')).
+    """
+    return _Etapa(nome)
+
+class _Etapa:
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excecao):
+        DURACAO_ETAPAS.observar(time.perf_counter() - self._inicio, stage=self.nome)
+
+    def __call__(self, funcao):
+        @wraps(funcao)
+        def medida(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                DURACAO_ETAPAS.observar(time.perf_counter() - inicio, stage=self.nome)
+        return medida
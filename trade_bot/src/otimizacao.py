@@ -0,0 +1,320 @@
+"""
+Otimização dos parâmetros da estratégia (config.PARAMS) por varredura.
+
+Os indicadores do universo são calculados uma única vez e publicados em
+memória compartilhada; os processos do pool apenas anexam o bloco e avaliam
+regras + backtest para lotes de configurações. Os resultados são gravados em
+JSONL conforme chegam, e uma varredura interrompida retoma do ponto em que
+parou ao reabrir o mesmo arquivo. Configurações que falharam vão para um
+arquivo à parte e são avaliadas de novo na retomada.
+
+Uso:
+    python -m trade_bot.src.otimizacao [--aleatorio 1000] [--processos 4] [--saida otimizacao.jsonl]
+"""
+import argparse
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import random
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from trade_bot.config import ACOES, LOG_NIVEL, PARAMS, PERIODO_DADOS, ESPACO_PARAMS
+from trade_bot.src.backtest import executar_carteira
+from trade_bot.src.strategy import calcular_sinais, PROGRAMA
+
+logger = logging.getLogger(__name__)
+
+# Chaves do espaço de busca repassadas ao backtest em vez das regras
+OPCOES_BACKTEST = {'entrada', 'saida', 'vendido', 'tamanhos', 'alocacao', 'peso_maximo', 'atraso'}
+
+TAMANHO_LOTE = 32  # Configurações por tarefa enviada ao pool
+TAMANHO_RANKING = 50  # Melhores configurações mantidas no arquivo de ranking
+TENTATIVAS_POR_AMOSTRA = 20  # Sorteios por amostra pedida antes de desistir (espaços com poucos valores inteiros)
+
+def espaco_grade(espaco):
+    """Todas as combinações de {parâmetro: [valores]}"""
+    nomes = list(espaco)
+    for valores in itertools.product(*(espaco[nome] for nome in nomes)):
+        yield dict(zip(nomes, valores))
+
+def espaco_aleatorio(espaco, quantidade, semente=0):
+    """
+    Amostras aleatórias do espaço de busca (reprodutíveis pela semente)
+
+    Listas são sorteadas entre os valores; tuplas (mínimo, máximo) são
+    intervalos contínuos (ou inteiros, se os dois limites forem inteiros).
+    Amostras repetidas são descartadas: com um espaço só de listas, o total
+    fica limitado ao tamanho da grade.
+    """
+    rng = random.Random(semente)
+    if not any(isinstance(valores, tuple) for valores in espaco.values()):
+        quantidade = min(quantidade, math.prod(len(valores) for valores in espaco.values()))
+    vistas = set()
+    tentativas = 0
+    while len(vistas) < quantidade and tentativas < quantidade * TENTATIVAS_POR_AMOSTRA:
+        tentativas += 1
+        amostra = {}
+        for nome, valores in espaco.items():
+            if isinstance(valores, tuple):
+                minimo, maximo = valores
+                if isinstance(minimo, int) and isinstance(maximo, int):
+                    amostra[nome] = rng.randint(minimo, maximo)
+                else:
+                    amostra[nome] = round(rng.uniform(minimo, maximo), 4)
+            else:
+                amostra[nome] = rng.choice(list(valores))
+        chave = identificador(amostra)
+        if chave not in vistas:
+            vistas.add(chave)
+            yield amostra
+
+def identificador(configuracao):
+    """Chave estável de uma configuração, usada para retomar a varredura"""
+    return json.dumps(configuracao, sort_keys=True, default=str)
+
+# Memória compartilhada
+
+def publicar(acoes, datas, matrizes):
+    """
+    Copia as matrizes (ações × barras) para um bloco de memória compartilhada
+
+    Returns:
+        (bloco, descritor): o descritor é pequeno e serializável; os processos o
+        usam para anexar o bloco sem copiar os dados
+    """
+    colunas = list(matrizes)
+    forma = (len(colunas),) + np.shape(matrizes[colunas[0]])
+    bloco = shared_memory.SharedMemory(create=True, size=max(int(np.prod(forma)) * 8, 1))
+    cubo = np.ndarray(forma, dtype='float64', buffer=bloco.buf)
+    for i, coluna in enumerate(colunas):
+        cubo[i] = matrizes[coluna]
+
+    descritor = {
+        'nome': bloco.name,
+        'forma': forma,
+        'colunas': colunas,
+        'acoes': list(acoes),
+        'datas': np.asarray(datas.asi8),
+    }
+    return bloco, descritor
+
+def anexar(descritor):
+    """Anexa o bloco publicado e retorna (bloco, {coluna: matriz somente leitura})"""
+    # Os processos do pool compartilham o resource tracker do processo
+    # principal, que é quem remove o bloco ao final (ver otimizar)
+    bloco = shared_memory.SharedMemory(name=descritor['nome'])
+    cubo = np.ndarray(descritor['forma'], dtype='float64', buffer=bloco.buf)
+    cubo.setflags(write=False)
+    return bloco, {coluna: cubo[i] for i, coluna in enumerate(descritor['colunas'])}
+
+# Avaliação
+
+def avaliar(configuracao, acoes, datas, matrizes, opcoes=None):
+    """
+    Gera sinais e executa o backtest da carteira para uma configuração
+
+    Returns:
+        Dicionário de métricas do backtest
+    """
+    params = dict(PARAMS)
+    opcoes_backtest = dict(opcoes or {})
+    for nome, valor in configuracao.items():
+        if nome in OPCOES_BACKTEST:
+            opcoes_backtest[nome] = valor
+        else:
+            params[nome] = valor
+
+    # Mesmas colunas e regras de strategy.gerar_sinais
+    colunas = {col: matrizes[col] for col in PROGRAMA.colunas(params) if col in matrizes}
+
+    sinais = calcular_sinais(colunas, params).astype(np.int8)
+    return executar_carteira(acoes, datas, matrizes['Close'], sinais, **opcoes_backtest).metricas
+
+_trabalhador = {}
+
+def _iniciar_trabalhador(descritor, opcoes):
+    bloco, matrizes = anexar(descritor)
+    _trabalhador.update(bloco=bloco, matrizes=matrizes, opcoes=opcoes,
+                        acoes=descritor['acoes'], datas=pd.DatetimeIndex(descritor['datas']))
+
+def _avaliar_lote(lote):
+    resultados = []
+    for configuracao in lote:
+        try:
+            metricas = avaliar(configuracao, _trabalhador['acoes'], _trabalhador['datas'],
+                               _trabalhador['matrizes'], _trabalhador['opcoes'])
+            resultados.append({'configuracao': configuracao, 'metricas': metricas})
+        except Exception as e:
+            resultados.append({'configuracao': configuracao, 'erro': str(e)})
+    return resultados
+
+# Resultados em disco
+
+def carregar_resultados(arquivo):
+    """Lê os resultados já gravados (linhas incompletas de uma interrupção são ignoradas)"""
+    resultados = []
+    if not os.path.exists(arquivo):
+        return resultados
+    with open(arquivo, encoding='utf-8') as f:
+        for linha in f:
+            try:
+                resultados.append(json.loads(linha))
+            except json.JSONDecodeError:
+                continue
+    return resultados
+
+def _valor(resultado, metrica):
+    valor = resultado.get('metricas', {}).get(metrica)
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return -math.inf
+    return valor
+
+def ranking(resultados, metrica='sharpe', quantidade=TAMANHO_RANKING):
+    """Melhores resultados pela métrica (maior é melhor)"""
+    validos = [r for r in resultados if 'metricas' in r]
+    return heapq.nlargest(quantidade, validos, key=lambda r: _valor(r, metrica))
+
+def _gravar_ranking(caminho, melhores, metrica):
+    linhas = [{'posicao': i + 1, metrica: _valor(r, metrica), **r['configuracao'],
+               **{k: v for k, v in r['metricas'].items() if k != metrica}}
+              for i, r in enumerate(melhores)]
+    temporario = caminho + '.tmp'
+    pd.DataFrame(linhas).to_csv(temporario, index=False)
+    os.replace(temporario, caminho)
+
+def _lotes(configuracoes, tamanho):
+    lote = []
+    for configuracao in configuracoes:
+        lote.append(configuracao)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def otimizar(acoes, datas, matrizes, configuracoes, arquivo='otimizacao.jsonl', metrica='sharpe',
+             processos=None, opcoes=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Avalia as configurações em paralelo, gravando os resultados conforme chegam
+
+    Args:
+        acoes, datas: Eixos das matrizes
+        matrizes: {coluna: matriz (ações × barras)} com Close e as colunas das regras
+        configuracoes: Iterável de dicionários (ver espaco_grade e espaco_aleatorio)
+        arquivo: JSONL de resultados; configurações já presentes não são reavaliadas.
+            O ranking é mantido em <arquivo sem extensão>_ranking.csv e as
+            falhas em <arquivo sem extensão>_erros.jsonl (reavaliadas na retomada)
+        metrica: Métrica de backtest usada no ranking
+        processos: Tamanho do pool (padrão: número de núcleos)
+        opcoes: Opções fixas de executar_carteira (custos, alocação...)
+
+    Returns:
+        Ranking final (lista de resultados)
+    """
+    # Só resultados com métricas contam como concluídos (linhas com erro de versões anteriores são refeitas)
+    anteriores = [r for r in carregar_resultados(arquivo) if 'metricas' in r]
+    concluidas = {identificador(r['configuracao']) for r in anteriores}
+    pendentes = [c for c in configuracoes if identificador(c) not in concluidas]
+    base = os.path.splitext(arquivo)[0]
+    caminho_ranking = base + '_ranking.csv'
+    caminho_erros = base + '_erros.jsonl'
+    com_erro = {identificador(r['configuracao']) for r in carregar_resultados(caminho_erros)}
+    refeitas = sum(identificador(c) in com_erro for c in pendentes)
+
+    logger.info("Otimização: %d configurações já avaliadas, %d pendentes (%d com erro na execução anterior)",
+                len(concluidas), len(pendentes), refeitas)
+    melhores = ranking(anteriores, metrica)
+    if not pendentes:
+        if melhores:
+            _gravar_ranking(caminho_ranking, melhores, metrica)
+        return melhores
+
+    bloco, descritor = publicar(acoes, datas, matrizes)
+    try:
+        contexto = get_context()
+        with contexto.Pool(processos, initializer=_iniciar_trabalhador, initargs=(descritor, opcoes)) as pool, \
+                open(arquivo, 'a', encoding='utf-8') as saida, open(caminho_erros, 'a', encoding='utf-8') as erros:
+            avaliadas = falhas = 0
+            for resultados in pool.imap_unordered(_avaliar_lote, _lotes(pendentes, tamanho_lote)):
+                for resultado in resultados:
+                    destino = saida if 'metricas' in resultado else erros
+                    destino.write(json.dumps(resultado, default=str) + '\n')
+                    if 'erro' in resultado:
+                        falhas += 1
+                        logger.warning("Configuração %s falhou: %s", resultado['configuracao'], resultado['erro'])
+                for destino in (saida, erros):
+                    destino.flush()
+                    os.fsync(destino.fileno())
+
+                avaliadas += len(resultados)
+                melhores = ranking(melhores + resultados, metrica)
+                _gravar_ranking(caminho_ranking, melhores, metrica)
+                if melhores:
+                    logger.info("%d/%d avaliadas (%d com erro); melhor %s: %.4f", avaliadas, len(pendentes), falhas,
+                                metrica, _valor(melhores[0], metrica))
+                else:
+                    logger.info("%d/%d avaliadas (%d com erro)", avaliadas, len(pendentes), falhas)
+    finally:
+        bloco.close()
+        bloco.unlink()
+    return melhores
+
+def preparar_matrizes(dados_por_acao):
+    """
+    Calcula os indicadores do universo uma única vez (painel)
+
+    Só as colunas usadas pelas regras são calculadas, pelo registro de
+    indicadores (cada dependência compartilhada uma vez).
+
+    Returns:
+        (acoes, datas, {coluna: matriz}) com Close e as colunas usadas pelas regras
+    """
+    from trade_bot.src.indicadores import calcular_matrizes
+    from trade_bot.src.painel import montar_painel
+
+    painel = montar_painel(dados_por_acao)
+    if painel is None:
+        return [], pd.DatetimeIndex([]), {}
+    colunas = PROGRAMA.colunas(PARAMS)
+    indicadores = calcular_matrizes(painel.valores, [coluna for coluna in colunas if coluna not in painel.valores])
+    matrizes = {'Close': painel['Close']}
+    for coluna in colunas:
+        matrizes[coluna] = indicadores[coluna] if coluna in indicadores else painel[coluna]
+    return painel.acoes, painel.datas, matrizes
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--aleatorio', type=int, default=0, help='Amostras aleatórias (0 = grade completa)')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--processos', type=int, default=None)
+    parser.add_argument('--saida', default='otimizacao.jsonl')
+    parser.add_argument('--metrica', default='sharpe')
+    parser.add_argument('--periodo', default=PERIODO_DADOS)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=LOG_NIVEL, format='%(levelname)s %(name)s: %(message)s')
+
+    from trade_bot.src.data_pipeline import baixar_varios
+
+    acoes, datas, matrizes = preparar_matrizes(baixar_varios(ACOES, periodo=args.periodo))
+    if not acoes:
+        print("Erro: Nenhum dado disponível para a otimização")
+        return
+
+    if args.aleatorio:
+        configuracoes = espaco_aleatorio(ESPACO_PARAMS, args.aleatorio, args.semente)
+    else:
+        configuracoes = espaco_grade(ESPACO_PARAMS)
+
+    melhores = otimizar(acoes, datas, matrizes, configuracoes, arquivo=args.saida,
+                        metrica=args.metrica, processos=args.processos)
+    for posicao, resultado in enumerate(melhores[:10], start=1):
+        print(f"{posicao:>3}. {args.metrica}={_valor(resultado, args.metrica):.4f} {resultado['configuracao']}")
+
+if __name__ == '__main__':
+    main()
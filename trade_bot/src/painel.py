@@ -0,0 +1,128 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from trade_bot.src import kernel_indicadores as kernel
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+from trade_bot.src.memoria import descartar_intermediarias, dtype_indicadores
+from trade_bot.src.metricas import etapa
+
+logger = logging.getLogger(__name__)
+
+COLUNAS_OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+class Painel:
+    """
+    Dados OHLCV de várias ações alinhados em um eixo de datas comum.
+
+    Cada coluna OHLCV é uma matriz float64 (ações × barras), com NaN nas datas
+    em que a ação não tem barra (antes da listagem, suspensões, lacunas).
+    """
+
+    def __init__(self, acoes, datas, valores):
+        self.acoes = list(acoes)
+        self.datas = datas
+        self.valores = valores  # {coluna: matriz (ações × barras)}
+        self.validos = ~np.isnan(valores['Close'])
+
+    def __getitem__(self, coluna):
+        return self.valores[coluna]
+
+def montar_painel(dados_por_acao):
+    """Alinha os DataFrames OHLCV de várias ações em um Painel"""
+    acoes = [acao for acao, dados in dados_por_acao.items() if dados is not None and not dados.empty]
+    if not acoes:
+        return None
+
+    indices = [pd.DatetimeIndex(dados_por_acao[acao].index) for acao in acoes]
+    datas = indices[0]
+    for indice in indices[1:]:
+        datas = datas.union(indice)
+
+    valores = {col: np.full((len(acoes), len(datas)), np.nan) for col in COLUNAS_OHLCV}
+    for i, (acao, indice) in enumerate(zip(acoes, indices)):
+        dados = dados_por_acao[acao]
+        if isinstance(dados.columns, pd.MultiIndex):
+            dados = dados.copy()
+            dados.columns = dados.columns.get_level_values(0)
+        posicoes = datas.get_indexer(indice)
+        for col in COLUNAS_OHLCV:
+            valores[col][i, posicoes] = dados[col].to_numpy(dtype='float64')
+
+    return Painel(acoes, datas, valores)
+
+def calcular_indicadores_painel(painel, saida=None):
+    """
+    Calcula todos os indicadores de processar_dados para o universo inteiro
+
+    Returns:
+        Dicionário {coluna: matriz (ações × barras)} no eixo de datas do painel
+    """
+    saida = kernel.calcular_indicadores(painel['High'], painel['Low'], painel['Close'], painel['Volume'], saida=saida)
+    return {coluna: saida[i] for i, coluna in enumerate(COLUNAS_INDICADORES)}
+
+def _bloco(matrizes, i, linhas, dtype):
+    """Linhas selecionadas da ação i de cada matriz, lado a lado (barras × colunas), em uma única cópia"""
+    bloco = np.empty((len(linhas), len(matrizes)), dtype=dtype)
+    for j, matriz in enumerate(matrizes):
+        bloco[:, j] = matriz[i, linhas]
+    return bloco
+
+def visoes_por_acao(painel, indicadores, min_periodos=30, compacto=None, descartar=None, ultimas=None):
+    """
+    Separa o resultado do painel em um DataFrame por ação, no mesmo formato
+    de processar_dados (pronto para strategy.gerar_sinais)
+
+    Args:
+        compacto: Indicadores em float32 (default: config.MODO_COMPACTO)
+        descartar: Sem Open/High/Low (default: config.DESCARTAR_INTERMEDIARIAS)
+        ultimas: Mantém apenas as últimas barras de cada ação (para quem só usa
+            a última linha); min_periodos continua valendo para o histórico inteiro
+    """
+    precos = descartar_intermediarias(COLUNAS_OHLCV, descartar)
+    completos = np.ones(painel.validos.shape, dtype=bool)
+    for matriz in [painel[col] for col in COLUNAS_OHLCV] + list(indicadores.values()):
+        completos &= ~np.isnan(matriz)
+    matrizes_precos = [painel[col] for col in precos]
+    matrizes_indicadores = [indicadores[col] for col in COLUNAS_INDICADORES]
+    tipo = dtype_indicadores(compacto)
+
+    visoes = {}
+    for i, acao in enumerate(painel.acoes):
+        linhas = np.flatnonzero(completos[i])
+        if len(linhas) < min_periodos:
+            logger.warning("Dados insuficientes após processamento de %s (%d períodos)", acao, len(linhas))
+            continue
+        if ultimas is not None:
+            linhas = linhas[-ultimas:]
+        indice = painel.datas[linhas]
+        if tipo == np.float64:
+            visoes[acao] = pd.DataFrame(_bloco(matrizes_precos + matrizes_indicadores, i, linhas, tipo), index=indice,
+                                        columns=precos + COLUNAS_INDICADORES)
+            continue
+        # Preços em float64 e indicadores no tipo compacto: dois blocos, sem consolidação
+        visoes[acao] = pd.concat([
+            pd.DataFrame(_bloco(matrizes_precos, i, linhas, np.float64), index=indice, columns=precos),
+            pd.DataFrame(_bloco(matrizes_indicadores, i, linhas, tipo), index=indice, columns=COLUNAS_INDICADORES),
+        ], axis=1, copy=False)
+    return visoes
+
+@etapa('indicadores_painel')
+def processar_painel(dados_por_acao, min_periodos=30, compacto=None, descartar=None, ultimas=None):
+    """
+    Versão de processar_dados para o universo inteiro de uma vez
+
+    Os argumentos compacto, descartar e ultimas são os de visoes_por_acao.
+
+    Returns:
+        Dicionário {acao: DataFrame com indicadores} apenas com as ações com dados suficientes
+    """
+    try:
+        painel = montar_painel(dados_por_acao)
+        if painel is None:
+            return {}
+        indicadores = calcular_indicadores_painel(painel)
+        return visoes_por_acao(painel, indicadores, min_periodos, compacto, descartar, ultimas)
+    except Exception as e:
+        logger.error("Erro no processamento do painel: %s", e, exc_info=True)
+        return {}
@@ -0,0 +1,129 @@
+import operator
+import numpy as np
+
+OPERADORES = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+class Condicao:
+    """
+    Comparação entre uma coluna e outra coluna, um parâmetro ou uma constante.
+
+    Operandos em texto são parâmetros quando existem no dicionário de
+    parâmetros passado na avaliação e colunas caso contrário. Se a coluna não
+    existir nos dados, a condição assume o valor se_ausente.
+    """
+
+    def __init__(self, esquerda, operador, direita, se_ausente=False):
+        if operador not in OPERADORES:
+            raise ValueError(f"Operador inválido: {operador}")
+        self.esquerda = esquerda
+        self.operador = operador
+        self.direita = direita
+        self.se_ausente = se_ausente
+
+    @property
+    def chave(self):
+        return (self.esquerda, self.operador, self.direita, self.se_ausente)
+
+    def colunas(self):
+        return [op for op in (self.esquerda, self.direita) if isinstance(op, str)]
+
+class Programa:
+    """
+    Conjunto de regras compilado em operações matriciais.
+
+    As condições distintas são avaliadas uma vez cada, formando uma matriz
+    booleana (condições × barras). Cada grupo de regras é uma linha de uma
+    matriz de pesos inteiros, e o número de condições atendidas por grupo sai
+    de um único produto matricial.
+    """
+
+    def __init__(self, condicoes, grupos, niveis):
+        self.condicoes = condicoes
+        self.grupos = grupos
+        self.niveis = niveis
+
+        indice = {c.chave: i for i, c in enumerate(condicoes)}
+        self.pesos = np.zeros((len(grupos), len(condicoes)), dtype=np.int32)
+        for g, (_, membros) in enumerate(grupos):
+            for condicao in membros:
+                self.pesos[g, indice[condicao.chave]] += 1
+        self.tamanhos = self.pesos.sum(axis=1)
+        self.grupo = {nome: g for g, (nome, _) in enumerate(grupos)}
+
+    def colunas(self, parametros=()):
+        """Colunas usadas pelas regras (operandos em texto que não são parâmetros)"""
+        return sorted({col for c in self.condicoes for col in c.colunas() if col not in parametros})
+
+    def _operando(self, operando, colunas, parametros):
+        if not isinstance(operando, str):
+            return operando
+        if operando in parametros:
+            return parametros[operando]
+        return colunas.get(operando)
+
+    def avaliar_condicoes(self, colunas, parametros):
+        """Matriz booleana (condições × ...) com o resultado de cada condição"""
+        forma = np.shape(next(iter(colunas.values())))
+        matriz = np.empty((len(self.condicoes),) + forma, dtype=bool)
+
+        with np.errstate(invalid='ignore'):
+            for i, condicao in enumerate(self.condicoes):
+                esquerda = self._operando(condicao.esquerda, colunas, parametros)
+                direita = self._operando(condicao.direita, colunas, parametros)
+                if esquerda is None or direita is None:
+                    matriz[i] = condicao.se_ausente
+                else:
+                    # Comparações com NaN resultam em False
+                    matriz[i] = OPERADORES[condicao.operador](esquerda, direita)
+        return matriz
+
+    def contagens(self, matriz):
+        """Número de condições atendidas por grupo (grupos × ...)"""
+        planas = matriz.reshape(len(self.condicoes), -1).view(np.uint8)
+        return (self.pesos @ planas).reshape((len(self.grupos),) + matriz.shape[1:])
+
+    def avaliar(self, colunas, parametros, dtype=np.int64):
+        """
+        Calcula o sinal de cada barra
+
+        Args:
+            colunas: Dicionário {coluna: array}; todos os arrays com a mesma forma
+                (histórico inteiro, só a última barra ou ações × barras)
+            parametros: Dicionário de parâmetros (ex.: config.PARAMS)
+
+        Returns:
+            Array de sinais com a forma das colunas; o primeiro nível satisfeito vence
+        """
+        contagens = self.contagens(self.avaliar_condicoes(colunas, parametros))
+
+        condicoes = []
+        valores = []
+        for valor, exigencias in self.niveis:
+            atendido = np.ones(contagens.shape[1:], dtype=bool)
+            for nome, minimo in exigencias:
+                g = self.grupo[nome]
+                atendido &= contagens[g] >= (self.tamanhos[g] if minimo is None else minimo)
+            condicoes.append(atendido)
+            valores.append(valor)
+        return np.select(condicoes, valores, default=0).astype(dtype, copy=False)
+
+def compilar(grupos, niveis):
+    """
+    Compila regras declarativas em um Programa
+
+    Args:
+        grupos: Lista de (nome, [Condicao, ...]) com os conjuntos de critérios
+        niveis: Lista de (sinal, [(grupo, mínimo), ...]) em ordem de prioridade;
+            o sinal vale quando todos os grupos têm pelo menos o mínimo de
+            condições atendidas (None = todas)
+    """
+    distintas = {}
+    for _, membros in grupos:
+        for condicao in membros:
+            distintas.setdefault(condicao.chave, condicao)
+    return Programa(list(distintas.values()), grupos, niveis)
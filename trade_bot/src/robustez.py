@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+from trade_bot.config import BARRAS_ANO, MEMORIA_ROBUSTEZ_MB
+
+METRICAS = ['retorno_final', 'drawdown_maximo', 'sharpe']
+
+def _lote(n_caminhos, comprimento, arrays=4):
+    """Caminhos por lote para manter cerca de MEMORIA_ROBUSTEZ_MB em matrizes temporárias"""
+    por_caminho = max(comprimento, 1) * 8 * arrays
+    return int(max(1, min(n_caminhos, MEMORIA_ROBUSTEZ_MB * 1024 * 1024 // por_caminho)))
+
+def bootstrap_blocos(retornos, n_caminhos, tamanho_bloco=20, rng=None):
+    """
+    Caminhos por bootstrap de blocos circulares
+
+    Blocos contíguos de tamanho_bloco barras, com início sorteado, preservam a
+    autocorrelação de curto prazo (regimes de volatilidade, posições mantidas).
+
+    Returns:
+        Matriz (caminhos × barras)
+    """
+    rng = np.random.default_rng(rng)
+    retornos = np.asarray(retornos, dtype='float64')
+    comprimento = len(retornos)
+    tamanho_bloco = max(1, min(tamanho_bloco, comprimento))
+    n_blocos = -(-comprimento // tamanho_bloco)
+
+    inicios = rng.integers(0, comprimento, size=(n_caminhos, n_blocos, 1))
+    indices = (inicios + np.arange(tamanho_bloco)) % comprimento
+    return retornos[indices.reshape(n_caminhos, -1)[:, :comprimento]]
+
+def embaralhar_trades(retornos_trades, n_caminhos, reposicao=True, rng=None):
+    """
+    Caminhos com a ordem dos trades sorteada
+
+    Sem reposição, cada caminho é uma permutação dos trades: o retorno final
+    não muda, apenas o drawdown e a sequência. Com reposição, os trades são
+    reamostrados e o retorno final também varia.
+
+    Returns:
+        Matriz (caminhos × trades)
+    """
+    rng = np.random.default_rng(rng)
+    retornos_trades = np.asarray(retornos_trades, dtype='float64')
+    if reposicao:
+        return retornos_trades[rng.integers(0, len(retornos_trades), size=(n_caminhos, len(retornos_trades)))]
+    return rng.permuted(np.broadcast_to(retornos_trades, (n_caminhos, len(retornos_trades))), axis=1)
+
+def metricas_caminhos(caminhos, periodos_ano=BARRAS_ANO):
+    """
+    Retorno final, drawdown máximo e Sharpe de cada caminho
+
+    Args:
+        caminhos: Matriz (caminhos × períodos) de retornos simples
+        periodos_ano: Períodos por ano para anualizar o Sharpe (None = sem anualizar)
+
+    Returns:
+        Dicionário {métrica: vetor com um valor por caminho}
+    """
+    patrimonio = np.cumprod(1 + caminhos, axis=1)
+    final = patrimonio[:, -1] - 1
+
+    # O pico inicial é o capital (1), para contar quedas já no primeiro período
+    picos = np.maximum.accumulate(np.maximum(patrimonio, 1.0), axis=1)
+    np.divide(patrimonio, picos, out=patrimonio)
+    drawdown = patrimonio.min(axis=1) - 1
+
+    media = caminhos.mean(axis=1)
+    desvio = caminhos.std(axis=1, ddof=1) if caminhos.shape[1] > 1 else np.zeros(len(caminhos))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(desvio > 0, media / desvio, 0.0)
+    if periodos_ano:
+        sharpe *= np.sqrt(periodos_ano)
+
+    return {'retorno_final': final, 'drawdown_maximo': drawdown, 'sharpe': sharpe}
+
+def simular(retornos, metodo='blocos', n_caminhos=10000, tamanho_bloco=20, reposicao=True,
+            fracao=1.0, periodos_ano=BARRAS_ANO, semente=None):
+    """
+    Distribuições das métricas sobre n_caminhos simulados
+
+    Os caminhos são gerados e avaliados em lotes (ver MEMORIA_ROBUSTEZ_MB); só
+    as métricas por caminho ficam em memória. Para uma mesma semente, o
+    resultado depende do tamanho do lote.
+
+    Args:
+        retornos: Retornos por barra (metodo='blocos') ou por trade (metodo='trades')
+        metodo: 'blocos' (bootstrap de blocos) ou 'trades' (sorteio da ordem dos trades)
+        fracao: Fração do capital aplicada em cada trade (metodo='trades')
+
+    Returns:
+        DataFrame (caminhos × métricas)
+    """
+    if metodo not in ('blocos', 'trades'):
+        raise ValueError(f"Método desconhecido: {metodo} (use blocos ou trades)")
+
+    retornos = np.asarray(retornos, dtype='float64')
+    retornos = retornos[~np.isnan(retornos)]
+    if len(retornos) < 2:
+        raise ValueError("São necessários ao menos 2 retornos para a simulação")
+
+    rng = np.random.default_rng(semente)
+    lote = _lote(n_caminhos, len(retornos))
+    partes = {metrica: [] for metrica in METRICAS}
+
+    for inicio in range(0, n_caminhos, lote):
+        quantidade = min(lote, n_caminhos - inicio)
+        if metodo == 'blocos':
+            caminhos = bootstrap_blocos(retornos, quantidade, tamanho_bloco, rng)
+        else:
+            caminhos = embaralhar_trades(retornos, quantidade, reposicao, rng) * fracao
+        for metrica, valores in metricas_caminhos(caminhos, periodos_ano).items():
+            partes[metrica].append(valores)
+
+    return pd.DataFrame({metrica: np.concatenate(partes[metrica]) for metrica in METRICAS})
+
+def intervalos(distribuicoes, observado=None, nivel=0.95):
+    """
+    Resumo das distribuições com intervalos de confiança por percentis
+
+    Returns:
+        DataFrame (métricas × média, mediana, IC inferior, IC superior e, se
+        informado, o valor observado e seu percentil na distribuição)
+    """
+    cauda = (1 - nivel) / 2 * 100
+    linhas = {}
+    for metrica in distribuicoes.columns:
+        valores = distribuicoes[metrica].to_numpy()
+        inferior, mediana, superior = np.percentile(valores, [cauda, 50, 100 - cauda])
+        linha = {'media': valores.mean(), 'mediana': mediana, 'ic_inferior': inferior, 'ic_superior': superior}
+        if observado is not None and metrica in observado:
+            linha['observado'] = observado[metrica]
+            linha['percentil'] = (valores < observado[metrica]).mean()
+        linhas[metrica] = linha
+    return pd.DataFrame.from_dict(linhas, orient='index')
+
+def analisar(resultado, n_caminhos=10000, tamanho_bloco=20, nivel=0.95, semente=None):
+    """
+    Análise de robustez de um ResultadoBacktest
+
+    Combina o bootstrap de blocos dos retornos diários da carteira com a
+    reamostragem dos trades fechados. A probabilidade de Sharpe não positivo
+    indica se os sinais se distinguem de ruído.
+
+    Returns:
+        Dicionário com 'blocos' e 'trades' (tabelas de intervalos) e
+        'prob_sharpe_nao_positivo' e 'prob_perda' do bootstrap de blocos
+    """
+    diarios = resultado.retornos.to_numpy()[1:]
+    observado = metricas_caminhos(diarios[None, :])
+    observado = {metrica: float(valores[0]) for metrica, valores in observado.items()}
+
+    blocos = simular(diarios, 'blocos', n_caminhos, tamanho_bloco, semente=semente)
+    analise = {
+        'blocos': intervalos(blocos, observado, nivel),
+        'prob_sharpe_nao_positivo': float((blocos['sharpe'] <= 0).mean()),
+        'prob_perda': float((blocos['retorno_final'] <= 0).mean()),
+    }
+
+    trades = resultado.trades
+    fechados = trades.loc[~trades['aberto'], 'retorno'].to_numpy(dtype='float64') if len(trades) else np.empty(0)
+    if len(fechados) >= 2:
+        # Trades de várias ações se sobrepõem no tempo; cada trade usa a fatia
+        # de uma ação (1/N do capital), em sequência. É uma medida da
+        # dependência da ordem dos trades, não o patrimônio exato da carteira
+        por_trade = simular(fechados, 'trades', n_caminhos, fracao=1 / len(resultado.acoes),
+                            periodos_ano=None, semente=semente)
+        analise['trades'] = intervalos(por_trade, nivel=nivel)
+    return analise
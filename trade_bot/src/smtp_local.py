@@ -0,0 +1,174 @@
+"""
+Servidor SMTP local mínimo, para testar os alertas sem um provedor de e-mail.
+
+Aceita qualquer remetente, destinatário e login (AUTH PLAIN/LOGIN), guarda
+as mensagens recebidas em memória e pode derrubar as conexões abertas para
+exercitar a reconexão do cliente. Não usa TLS: configure o cliente com
+EMAIL_SEGURANCA=nenhuma.
+
+Uso:
+    python -m trade_bot.src.smtp_local [--porta 1025]
+"""
+import argparse
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+class _Sessao(socketserver.StreamRequestHandler):
+    """Uma conexão SMTP: comandos linha a linha, corpo até a linha com '.'"""
+
+    def _responder(self, linha):
+        self.wfile.write(linha.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        servidor = self.server.local
+        servidor._registrar(self.connection)
+        try:
+            self._responder('220 trade_bot SMTP local')
+            remetente, destinatarios = None, []
+            while True:
+                linha = self.rfile.readline()
+                if not linha:
+                    return
+                comando, _, argumento = linha.decode('utf-8', 'replace').strip().partition(' ')
+                comando = comando.upper()
+                if comando == 'EHLO':
+                    self.wfile.write(b'250-trade_bot\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+                elif comando == 'HELO':
+                    self._responder('250 trade_bot')
+                elif comando == 'AUTH':
+                    if argumento.upper().startswith('LOGIN'):
+                        # Usuário e senha em duas etapas (base64), aceitos sem verificação
+                        for pergunta in ('334 VXNlcm5hbWU6', '334 UGFzc3dvcmQ6'):
+                            self._responder(pergunta)
+                            self.rfile.readline()
+                    servidor.logins += 1
+                    self._responder('235 Autenticado')
+                elif comando == 'MAIL':
+                    remetente, destinatarios = argumento.partition(':')[2].strip().strip('<>'), []
+                    self._responder('250 OK')
+                elif comando == 'RCPT':
+                    destinatarios.append(argumento.partition(':')[2].strip().strip('<>'))
+                    self._responder('250 OK')
+                elif comando == 'DATA':
+                    self._responder('354 Fim com <CRLF>.<CRLF>')
+                    linhas = []
+                    while True:
+                        linha = self.rfile.readline()
+                        if not linha or linha in (b'.\r\n', b'.\n'):
+                            break
+                        linhas.append(linha[1:] if linha.startswith(b'..') else linha)
+                    servidor._receber(remetente, destinatarios, b''.join(linhas))
+                    self._responder('250 Recebida')
+                elif comando == 'RSET':
+                    remetente, destinatarios = None, []
+                    self._responder('250 OK')
+                elif comando == 'NOOP':
+                    self._responder('250 OK')
+                elif comando == 'QUIT':
+                    self._responder('221 Ate logo')
+                    return
+                else:
+                    self._responder('502 Comando nao implementado')
+        except OSError:
+            pass  # conexão derrubada (derrubar_conexoes) ou encerrada pelo cliente
+        finally:
+            servidor._remover(self.connection)
+
+class _Servidor(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class ServidorSMTPLocal:
+    """
+    Servidor SMTP em uma thread, para testes e desenvolvimento
+
+    Args:
+        porta: Porta TCP (0 = uma porta livre, ver self.porta)
+
+    Atributos:
+        mensagens: Lista de (remetente, destinatários, email.message.EmailMessage)
+        conexoes: Conexões aceitas desde o início
+        logins: Autenticações recebidas
+    """
+
+    def __init__(self, host='127.0.0.1', porta=0):
+        self._servidor = _Servidor((host, porta), _Sessao)
+        self._servidor.local = self
+        self.host, self.porta = self._servidor.server_address[:2]
+        self.mensagens = []
+        self.conexoes = 0
+        self.logins = 0
+        self._abertas = set()
+        self._lock = threading.Lock()
+        self._nova_mensagem = threading.Condition(self._lock)
+        self._thread = None
+
+    def _registrar(self, conexao):
+        with self._lock:
+            self.conexoes += 1
+            self._abertas.add(conexao)
+
+    def _remover(self, conexao):
+        with self._lock:
+            self._abertas.discard(conexao)
+
+    def _receber(self, remetente, destinatarios, dados):
+        mensagem = message_from_bytes(dados, policy=policy.default)
+        with self._nova_mensagem:
+            self.mensagens.append((remetente, list(destinatarios), mensagem))
+            self._nova_mensagem.notify_all()
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name='smtp-local', daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        self.derrubar_conexoes()
+
+    def derrubar_conexoes(self):
+        """Fecha as conexões abertas sem aviso, como um provedor que encerra conexões ociosas"""
+        with self._lock:
+            abertas = list(self._abertas)
+        for conexao in abertas:
+            try:
+                conexao.shutdown(2)
+            except OSError:
+                pass
+
+    def aguardar(self, quantidade, timeout=5.0):
+        """Espera até haver quantidade mensagens recebidas (retorna False se o tempo esgotar)"""
+        with self._nova_mensagem:
+            return self._nova_mensagem.wait_for(lambda: len(self.mensagens) >= quantidade, timeout)
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *excecao):
+        self.parar()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=1025)
+    args = parser.parse_args()
+
+    with ServidorSMTPLocal(args.host, args.porta) as servidor:
+        print(f"SMTP local em {servidor.host}:{servidor.porta} (EMAIL_SERVIDOR={servidor.host} "
+              f"EMAIL_PORTA={servidor.porta} EMAIL_SEGURANCA=nenhuma)")
+        exibidas = 0
+        try:
+            while True:
+                servidor.aguardar(exibidas + 1, timeout=1.0)
+                for remetente, destinatarios, mensagem in servidor.mensagens[exibidas:]:
+                    print(f"\nDe: {remetente}  Para: {', '.join(destinatarios)}  Assunto: {mensagem['Subject']}")
+                    print(mensagem.get_content())
+                exibidas = len(servidor.mensagens)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
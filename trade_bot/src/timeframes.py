@@ -0,0 +1,218 @@
+"""
+Múltiplos timeframes a partir de uma única série de barras.
+
+As barras do intervalo base (o menor disponível, ex.: '5m') são baixadas
+uma vez; os timeframes maiores ('15m', '60m', '1d', '1wk'...) são obtidos
+localmente por reamostragem vetorizada, e indicadores e sinais rodam por
+timeframe. Cada barra reamostrada é rotulada pelo seu início, como as da
+fonte.
+
+A fonte só fornece algumas semanas de barras intradiárias (ver
+HISTORICO_MAXIMO_INTERVALO): com um intervalo base intradiário, o histórico
+diário anterior a elas vem de um download diário à parte, e os timeframes
+diário, semanal e mensal são obtidos da série completa.
+"""
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from trade_bot.config import INTERVALO_BASE, MIN_PERIODOS, PERIODO_DADOS, TIMEFRAMES
+from trade_bot.src.data_pipeline import baixar_conforme_chegam, historico_limitado
+from trade_bot.src.metricas import etapa
+from trade_bot.src.painel import processar_painel
+from trade_bot.src.strategy import gerar_sinais
+
+logger = logging.getLogger(__name__)
+
+_NS_MINUTO = 60 * 10**9
+_NS_DIA = 24 * 60 * _NS_MINUTO
+_FORMATO = re.compile(r'^(\d+)(m|h|d|wk|mo)$')
+
+def _minutos(timeframe):
+    """Duração nominal do timeframe em minutos (semana e mês pelo tamanho máximo)"""
+    encontrado = _FORMATO.match(timeframe)
+    if not encontrado:
+        raise ValueError(f"Timeframe inválido: {timeframe}")
+    quantidade, unidade = int(encontrado.group(1)), encontrado.group(2)
+    if quantidade <= 0:
+        raise ValueError(f"Timeframe inválido: {timeframe}")
+    if unidade in ('wk', 'mo') and quantidade != 1:
+        raise ValueError(f"Timeframe não suportado: {timeframe} (use '1wk' ou '1mo')")
+    if unidade == 'd' and quantidade != 1:
+        raise ValueError(f"Timeframe não suportado: {timeframe} (use '1d')")
+    return quantidade * {'m': 1, 'h': 60, 'd': 24 * 60, 'wk': 7 * 24 * 60, 'mo': 31 * 24 * 60}[unidade]
+
+def intradiario(timeframe):
+    return _minutos(timeframe) < 24 * 60
+
+def compativel(fino, grosso):
+    """Indica se cada barra de fino cabe inteira em uma barra de grosso"""
+    mf, mg = _minutos(fino), _minutos(grosso)
+    if intradiario(grosso):
+        return intradiario(fino) and mg % mf == 0
+    if grosso == '1mo':
+        return fino != '1wk'  # semanas atravessam meses
+    return mf <= mg
+
+def _rotulos(indice, timeframe):
+    """Início da barra de timeframe à qual pertence cada instante (em ns)"""
+    ns = indice.as_unit('ns').asi8
+    dia = ns - ns % _NS_DIA
+    if intradiario(timeframe):
+        passo = _minutos(timeframe) * _NS_MINUTO
+        # Barras contadas a partir da meia-noite (o pregão da B3 abre em hora cheia)
+        return dia + (ns - dia) // passo * passo
+    if timeframe == '1d':
+        return dia
+    if timeframe == '1wk':
+        return dia - indice.dayofweek.to_numpy().astype('int64') * _NS_DIA
+    return indice.to_period('M').to_timestamp().as_unit('ns').asi8
+
+def reamostrar(dados, timeframe):
+    """
+    Agrega barras OHLCV em barras de timeframe
+
+    Abertura da primeira barra, máxima e mínima do grupo, fechamento da
+    última e soma do volume. Os dados precisam estar em ordem cronológica.
+    """
+    if dados is None or dados.empty:
+        return dados
+    rotulos = _rotulos(pd.DatetimeIndex(dados.index), timeframe)
+    inicios = np.flatnonzero(np.r_[True, rotulos[1:] != rotulos[:-1]])
+    fins = np.r_[inicios[1:], len(rotulos)] - 1
+
+    abertura = dados['Open'].to_numpy(dtype='float64')
+    maxima = dados['High'].to_numpy(dtype='float64')
+    minima = dados['Low'].to_numpy(dtype='float64')
+    volume = dados['Volume'].to_numpy(dtype='float64')
+    return pd.DataFrame({
+        'Open': abertura[inicios],
+        'High': np.fmax.reduceat(maxima, inicios),
+        'Low': np.fmin.reduceat(minima, inicios),
+        'Close': dados['Close'].to_numpy(dtype='float64')[fins],
+        'Volume': np.add.reduceat(np.nan_to_num(volume), inicios),
+    }, index=pd.DatetimeIndex(rotulos[inicios], name=dados.index.name or 'Date'))
+
+def reamostrar_varios(dados, timeframes, intervalo=INTERVALO_BASE):
+    """
+    Todos os timeframes a partir das barras de intervalo
+
+    Cada timeframe é derivado do maior já calculado que caiba nele (ex.: '1d'
+    a partir de '60m', e não dos '5m'), o que reduz o trabalho.
+
+    Returns:
+        Dicionário {timeframe: DataFrame}
+    """
+    resultado = {}
+    calculados = [(intervalo, dados)]
+    for timeframe in sorted(dict.fromkeys(timeframes), key=_minutos):
+        if not compativel(intervalo, timeframe):
+            raise ValueError(f"Timeframe {timeframe} não pode ser obtido de barras de {intervalo}")
+        origem, base = max((item for item in calculados if compativel(item[0], timeframe)),
+                           key=lambda item: _minutos(item[0]))
+        resultado[timeframe] = base if origem == timeframe else reamostrar(base, timeframe)
+        calculados.append((timeframe, resultado[timeframe]))
+    return resultado
+
+_avisados = {}  # {timeframe: ações com barras insuficientes já registradas no log}
+
+def completar_diarios(anteriores, recentes):
+    """Barras diárias do download diário até o início das reamostradas do intervalo base, seguidas destas"""
+    if recentes is None or recentes.empty:
+        return anteriores
+    if anteriores is None or anteriores.empty:
+        return recentes
+    return pd.concat([anteriores[anteriores.index < recentes.index[0]], recentes])
+
+def timeframes_conforme_chegam(acoes, timeframes=TIMEFRAMES, periodo=PERIODO_DADOS, intervalo=INTERVALO_BASE,
+                               min_periodos=MIN_PERIODOS):
+    """
+    Versão de baixar_timeframes que entrega os timeframes de cada ação assim
+    que o download dela termina, permitindo processar umas enquanto outras
+    ainda estão sendo baixadas
+
+    Com o histórico diário à parte (ver baixar_timeframes), ele é obtido
+    antes, e as ações são entregues conforme chegam as barras de intervalo.
+    O aviso de barras insuficientes é registrado ao fim da iteração.
+
+    Yields:
+        (acao, {timeframe: DataFrame})
+    """
+    longos = [timeframe for timeframe in timeframes if not intradiario(timeframe)]
+    completar = bool(longos) and intradiario(intervalo) and historico_limitado(periodo, intervalo)
+    # O diário reamostrado do intervalo base é a parte recente da série completada
+    do_intervalo = ([timeframe for timeframe in timeframes if intradiario(timeframe)] + ['1d']) if completar else timeframes
+
+    anteriores = dict(baixar_conforme_chegam(acoes, periodo=periodo, intervalo='1d')) if completar else {}
+    contagem = dict.fromkeys(timeframes, 0)
+    curtas = {timeframe: [] for timeframe in timeframes}
+
+    def derivar(acao, base):
+        derivados = reamostrar_varios(base, do_intervalo, intervalo) if base is not None else {}
+        if completar:
+            diarios = completar_diarios(anteriores.get(acao), derivados.pop('1d', None))
+            derivados.update(reamostrar_varios(diarios, longos, '1d'))
+        resultado = {timeframe: derivados[timeframe] for timeframe in timeframes if timeframe in derivados}
+        for timeframe, dados in resultado.items():
+            contagem[timeframe] += 1
+            if len(dados) < min_periodos:
+                curtas[timeframe].append(acao)
+        return resultado
+
+    entregues = set()
+    for acao, base in baixar_conforme_chegam(acoes, periodo=periodo, intervalo=intervalo):
+        entregues.add(acao)
+        yield acao, derivar(acao, base)
+    for acao in anteriores:
+        if acao not in entregues:
+            yield acao, derivar(acao, None)
+
+    for timeframe in timeframes:
+        curtas_timeframe = tuple(sorted(curtas[timeframe]))
+        # Registrado quando muda, não a cada atualização
+        if curtas_timeframe and curtas_timeframe != _avisados.get(timeframe):
+            logger.warning("Timeframe %s: %d de %d ações com menos de %d barras (período %s, intervalo base %s): %s",
+                           timeframe, len(curtas_timeframe), contagem[timeframe], min_periodos, periodo, intervalo,
+                           ', '.join(curtas_timeframe))
+        _avisados[timeframe] = curtas_timeframe
+
+def baixar_timeframes(acoes, timeframes=TIMEFRAMES, periodo=PERIODO_DADOS, intervalo=INTERVALO_BASE,
+                      min_periodos=MIN_PERIODOS):
+    """
+    Baixa as barras de intervalo uma única vez e deriva os timeframes
+
+    Se intervalo for intradiário e a fonte não tiver o período inteiro
+    nele, os timeframes a partir do diário usam também barras diárias
+    baixadas à parte (ver completar_diarios). Timeframes em que alguma ação
+    fica com menos de min_periodos barras são registrados no log: essas
+    ações ficam sem sinais nele.
+
+    Returns:
+        Dicionário {timeframe: {acao: DataFrame}}
+    """
+    por_timeframe = {timeframe: {} for timeframe in timeframes}
+    with etapa('download'):
+        for acao, derivados in timeframes_conforme_chegam(acoes, timeframes, periodo, intervalo, min_periodos):
+            for timeframe, dados in derivados.items():
+                por_timeframe[timeframe][acao] = dados
+    return por_timeframe
+
+def sinais_timeframes(por_timeframe, min_periodos=MIN_PERIODOS):
+    """
+    Indicadores e sinais de cada timeframe
+
+    Returns:
+        Dicionário {timeframe: {acao: DataFrame com sinais}}; ações sem
+        barras suficientes no timeframe ficam de fora
+    """
+    resultado = {}
+    for timeframe, dados_acoes in por_timeframe.items():
+        sinais = {}
+        for acao, dados in processar_painel(dados_acoes, min_periodos=min_periodos).items():
+            com_sinais = gerar_sinais(dados)
+            if com_sinais is not None and not com_sinais.empty:
+                sinais[acao] = com_sinais
+        resultado[timeframe] = sinais
+    return resultado
@@ -0,0 +1,219 @@
+"""
+Triagem do universo de ações em duas etapas.
+
+1. Pré-filtro barato e vetorizado sobre as últimas barras de todas as ações
+   (apenas um período curto é baixado): liquidez, volume relativo, RSI em
+   extremos e rompimento das Bandas de Bollinger.
+2. Só as sobreviventes passam pelo pipeline completo de indicadores e
+   sinais (processar_painel → gerar_sinais) com o histórico inteiro.
+
+O resultado é ordenado pela força do sinal e, depois, pela intensidade das
+condições do pré-filtro.
+
+Uso:
+    python -m trade_bot.src.triagem [--universo arquivo.txt] [--resultados 20]
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from trade_bot.config import (ACOES, ARQUIVO_UNIVERSO, PERIODO_DADOS, MIN_PERIODOS, RSI_PERIODO, RSI_SOBRECOMPRADO,
+                              RSI_SOBREVENDIDO, BB_PERIODO, BB_DESVIO, VOLUME_PERIODO, PERIODO_TRIAGEM,
+                              TRIAGEM_LIQUIDEZ_MIN, TRIAGEM_VOLUME_REL, TRIAGEM_MARGEM_RSI, TRIAGEM_RESULTADOS)
+from trade_bot.src import kernel_indicadores as kernel
+from trade_bot.src.data_pipeline import baixar_varios
+from trade_bot.src.memoria import verificar_orcamento
+from trade_bot.src.metricas import etapa
+from trade_bot.src.painel import processar_painel
+from trade_bot.src.strategy import gerar_sinais
+
+# Barras usadas no pré-filtro: o suficiente para RSI, Bandas e volume médio exatos na última barra
+JANELA = max(RSI_PERIODO + 1, BB_PERIODO, VOLUME_PERIODO)
+
+def carregar_universo(arquivo=None):
+    """
+    Lê o universo de ações: um código por linha (ou primeira coluna de um CSV)
+
+    Linhas vazias e comentários (#) são ignorados; códigos sem sufixo recebem
+    '.SA'. Sem arquivo, usa config.ACOES.
+    """
+    arquivo = arquivo or ARQUIVO_UNIVERSO
+    if not os.path.exists(arquivo):
+        return list(ACOES)
+
+    acoes = []
+    with open(arquivo, encoding='utf-8') as f:
+        for linha in f:
+            codigo = linha.split('#', 1)[0].split(',', 1)[0].strip().upper()
+            if not codigo or codigo in ('TICKER', 'CODIGO', 'SYMBOL'):
+                continue
+            if '.' not in codigo and not codigo.startswith('^'):
+                codigo += '.SA'
+            acoes.append(codigo)
+    return list(dict.fromkeys(acoes))
+
+def ultimas_barras(dados_por_acao, janela=JANELA):
+    """
+    Matrizes (ações × janela) com as últimas barras de cada ação, alinhadas à
+    direita (ações com menos barras ficam com NaN no início)
+    """
+    acoes = [acao for acao, dados in dados_por_acao.items() if dados is not None and not dados.empty]
+    fechamento = np.full((len(acoes), janela), np.nan)
+    volume = np.full((len(acoes), janela), np.nan)
+    for i, acao in enumerate(acoes):
+        cauda = dados_por_acao[acao].iloc[-janela:]
+        fechamento[i, janela - len(cauda):] = cauda['Close'].to_numpy(dtype='float64')
+        volume[i, janela - len(cauda):] = cauda['Volume'].to_numpy(dtype='float64')
+    return acoes, fechamento, volume
+
+def pre_filtrar(fechamento, volume, liquidez_min=TRIAGEM_LIQUIDEZ_MIN, volume_rel_min=TRIAGEM_VOLUME_REL,
+                margem_rsi=TRIAGEM_MARGEM_RSI):
+    """
+    Indicadores da última barra e condições do pré-filtro, para todas as ações de uma vez
+
+    Sobrevive a ação líquida (volume financeiro médio ≥ liquidez_min) com ao
+    menos uma condição: volume relativo ≥ volume_rel_min, RSI a até
+    margem_rsi pontos dos limites (ou além deles), ou fechamento fora das
+    Bandas de Bollinger.
+
+    Returns:
+        Dicionário de vetores (um valor por ação), incluindo 'sobrevive' e
+        'pontuacao' (soma da intensidade das condições)
+    """
+    validos = ~np.isnan(fechamento)
+    ganho, perda = kernel.medias_ganhos_perdas(np.diff(fechamento, axis=1, prepend=np.nan), validos, RSI_PERIODO)
+    media = kernel.media_movel(fechamento, BB_PERIODO)[:, -1]
+    desvio = kernel.desvio_movel(fechamento, BB_PERIODO)[:, -1]
+    volume_medio = kernel.media_movel(volume, VOLUME_PERIODO)[:, -1]
+    financeiro = kernel.media_movel(fechamento * volume, VOLUME_PERIODO)[:, -1]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        perda = perda[:, -1]
+        rsi = 100 - 100 / (1 + ganho[:, -1] / np.where(perda == 0, np.inf, perda))
+        volume_rel = volume[:, -1] / np.where(volume_medio > 0, volume_medio, 1.0)
+        superior = media + BB_DESVIO * desvio
+        inferior = media - BB_DESVIO * desvio
+        largura = np.where(superior > inferior, superior - inferior, np.nan)
+        ultimo = fechamento[:, -1]
+        rompimento = np.fmax(ultimo - superior, inferior - ultimo) / largura
+
+    liquida = financeiro >= liquidez_min
+    volume_alto = volume_rel >= volume_rel_min
+    rsi_extremo = (rsi <= RSI_SOBREVENDIDO + margem_rsi) | (rsi >= RSI_SOBRECOMPRADO - margem_rsi)
+    fora_bandas = rompimento > 0
+
+    excesso_rsi = np.fmax(np.fmax(RSI_SOBREVENDIDO + margem_rsi - rsi, rsi - RSI_SOBRECOMPRADO + margem_rsi), 0) / 10
+    pontuacao = (np.where(volume_alto, volume_rel - 1, 0.0) + np.nan_to_num(excesso_rsi)
+                 + np.where(fora_bandas, rompimento, 0.0))
+    return {
+        'rsi': rsi,
+        'volume_rel': volume_rel,
+        'financeiro': financeiro,
+        'volume_alto': volume_alto,
+        'rsi_extremo': rsi_extremo,
+        'fora_bandas': fora_bandas,
+        'sobrevive': liquida & (volume_alto | rsi_extremo | fora_bandas),
+        'pontuacao': pontuacao,
+    }
+
+def _motivos(filtro, i):
+    motivos = []
+    if filtro['volume_alto'][i]:
+        motivos.append('volume')
+    if filtro['rsi_extremo'][i]:
+        motivos.append('rsi_sobrevendido' if filtro['rsi'][i] < 50 else 'rsi_sobrecomprado')
+    if filtro['fora_bandas'][i]:
+        motivos.append('bb_rompimento')
+    return motivos
+
+@etapa('triagem')
+def triar(acoes=None, periodo=PERIODO_DADOS, periodo_triagem=PERIODO_TRIAGEM, resultados=TRIAGEM_RESULTADOS,
+          **opcoes_filtro):
+    """
+    Executa a triagem do universo
+
+    Args:
+        acoes: Universo (padrão: carregar_universo())
+        periodo: Histórico usado no pipeline completo das sobreviventes
+        periodo_triagem: Histórico baixado para o pré-filtro de todo o universo
+        resultados: Quantidade de ações no ranking (None = todas as sobreviventes)
+        **opcoes_filtro: Limites repassados a pre_filtrar
+
+    Returns:
+        Dicionário com 'ranking' (lista de resumos, melhores primeiro),
+        contagens de cada etapa e tempos em segundos
+    """
+    acoes = carregar_universo() if acoes is None else list(acoes)
+    tempos = {}
+
+    inicio = time.perf_counter()
+    recentes = baixar_varios(acoes, periodo=periodo_triagem)
+    tempos['download_triagem'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    com_dados, fechamento, volume = ultimas_barras(recentes)
+    filtro = pre_filtrar(fechamento, volume, **opcoes_filtro)
+    sobreviventes = [acao for acao, sobrevive in zip(com_dados, filtro['sobrevive']) if sobrevive]
+    posicao = {acao: i for i, acao in enumerate(com_dados)}
+    tempos['pre_filtro'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    # As sobreviventes acabaram de ser atualizadas: só baixa quem não tem o histórico completo
+    historicos = baixar_varios(sobreviventes, periodo=periodo, atualizar=False) if sobreviventes else {}
+    tempos['download_completo'] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    ranking = []
+    verificar_orcamento(historicos, 'triagem')
+    # O ranking usa só a última barra de cada sobrevivente
+    for acao, dados in processar_painel(historicos, min_periodos=MIN_PERIODOS, ultimas=1).items():
+        com_sinais = gerar_sinais(dados)
+        if com_sinais is None or com_sinais.empty:
+            continue
+        ultima = com_sinais.iloc[-1]
+        i = posicao[acao]
+        ranking.append({
+            'symbol': acao,
+            'price': float(ultima['Close']),
+            'signal': int(ultima['Sinal']),
+            'rsi': round(float(ultima['momentum_rsi']), 2),
+            'volume_rel': round(float(ultima['volume_rel']), 2),
+            'financial_volume': round(float(filtro['financeiro'][i]), 2),
+            'reasons': _motivos(filtro, i),
+            'score': round(float(filtro['pontuacao'][i]), 4),
+            'date': com_sinais.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    ranking.sort(key=lambda item: (-abs(item['signal']), -item['score']))
+    tempos['pipeline_completo'] = time.perf_counter() - inicio
+
+    return {
+        'universo': len(acoes),
+        'com_dados': len(com_dados),
+        'pre_selecionadas': len(sobreviventes),
+        'ranking': ranking if resultados is None else ranking[:resultados],
+        'tempos': {etapa: round(segundos, 3) for etapa, segundos in tempos.items()},
+    }
+
+def imprimir(resultado):
+    """Exibe o ranking da triagem no console"""
+    print(f"Triagem: {resultado['universo']} ações, {resultado['com_dados']} com dados, "
+          f"{resultado['pre_selecionadas']} pré-selecionadas")
+    for posicao, item in enumerate(resultado['ranking'], start=1):
+        print(f"{posicao:>3}. {item['symbol']:<10} sinal={item['signal']:+d} R${item['price']:.2f} "
+              f"RSI={item['rsi']:.1f} Vol={item['volume_rel']:.1f}x ({', '.join(item['reasons'])})")
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--universo', default=None, help='Arquivo com os códigos das ações')
+    parser.add_argument('--resultados', type=int, default=TRIAGEM_RESULTADOS)
+    parser.add_argument('--periodo', default=PERIODO_DADOS)
+    args = parser.parse_args(argv)
+
+    resultado = triar(carregar_universo(args.universo), periodo=args.periodo, resultados=args.resultados)
+    imprimir(resultado)
+    print(f"Tempos: {resultado['tempos']}")
+
+if __name__ == '__main__':
+    main()
@@ -1,63 +1,264 @@
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
 import numpy as np
+import pandas as pd
+
+from trade_bot.config import DIRETORIO_GRAFICOS, GRAFICOS_DPI, GRAFICOS_RAPIDO, GRAFICOS_MAX_BARRAS, GRAFICOS_PROCESSOS
+from trade_bot.src.metricas import etapa, registro
+
+logger = logging.getLogger(__name__)
+
+GRAFICOS = registro.contador(
+    'trade_bot_charts_total', 'Gráficos de análise redesenhados ou mantidos por não terem mudado', ('result',))
+
+# Alterar quando o desenho mudar, para invalidar os gráficos já gerados
+VERSAO_GRAFICO = 2
+
+# Figura reutilizada entre gráficos no modo rápido (uma por processo)
+_figura = None
+
+def caminho_grafico(acao, diretorio=None):
+    """Caminho do arquivo de análise de uma ação"""
+    return os.path.join(diretorio or DIRETORIO_GRAFICOS, f'analise_{acao.replace(".SA", "")}.png')
+
+def hash_dados(dados, dpi, rapido):
+    """Identifica o conteúdo do gráfico: dados (com índice) e opções de desenho"""
+    h = hashlib.sha1()
+    h.update(f'{VERSAO_GRAFICO}|{dpi}|{rapido}|{",".join(map(str, dados.columns))}'.encode())
+    h.update(pd.util.hash_pandas_object(dados, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+def _hash_salvo(caminho):
+    try:
+        with open(caminho + '.sha1', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def precisa_desenhar(caminho, assinatura):
+    """O gráfico só é refeito se não existir ou se os dados mudaram desde o último"""
+    return not os.path.exists(caminho) or _hash_salvo(caminho) != assinatura
+
+def decimar_barras(indice, valores, max_barras):
+    """
+    Reduz uma série de barras a no máximo max_barras grupos (média de cada grupo)
+
+    Returns:
+        (posições no eixo x, alturas, largura das barras em dias)
+    """
+    import matplotlib.dates as mdates
+
+    datas = mdates.date2num(pd.DatetimeIndex(indice).to_pydatetime())
+    valores = np.asarray(valores, dtype='float64')
+    n = len(valores)
+    if n <= max_barras:
+        largura = np.median(np.diff(datas)) * 0.8 if n > 1 else 0.8
+        return datas, valores, largura
+
+    tamanho = -(-n // max_barras)
+    grupos = -(-n // tamanho)
+    preenchido = np.full(grupos * tamanho, np.nan)
+    preenchido[:n] = valores
+    alturas = np.nanmean(preenchido.reshape(grupos, tamanho), axis=1)
+    inicio = datas[::tamanho]
+    fim = np.append(datas[tamanho::tamanho], datas[-1])
+    return (inicio + fim) / 2, alturas, (fim - inicio) * 0.9
+
+def _eixos(rapido):
+    """Figura e eixos do gráfico; no modo rápido são reutilizados e apenas limpos"""
+    global _figura
+    if rapido and _figura is not None:
+        fig, axs = _figura
+        for ax in axs:
+            ax.clear()
+        return fig, axs
+
+    import matplotlib.pyplot as plt
 
-def plotar_analise(dados, acao):
-    """Cria um gráfico completo com todos os indicadores"""
-    if dados is None or dados.empty:
-        return
-        
     fig, axs = plt.subplots(4, 1, figsize=(14, 12), sharex=True, gridspec_kw={'height_ratios': [3, 1, 1, 1]})
-    
+    if rapido:
+        _figura = (fig, axs)
+    return fig, axs
+
+def plotar_analise(dados, acao, diretorio=None, dpi=None, rapido=None, forcar=False, assinatura=None):
+    """
+    Cria um gráfico completo com todos os indicadores
+
+    Args:
+        diretorio: Pasta de saída (padrão: DIRETORIO_GRAFICOS)
+        dpi: Resolução (padrão: GRAFICOS_DPI)
+        rapido: Modo rápido: figura reutilizada e barras de volume e MACD
+            agrupadas em até GRAFICOS_MAX_BARRAS (padrão: GRAFICOS_RAPIDO)
+        forcar: Desenha mesmo que os dados não tenham mudado
+        assinatura: hash_dados(dados, dpi, rapido), quando já calculado
+
+    Returns:
+        Caminho do arquivo, ou None se não havia dados ou nada mudou
+    """
+    if dados is None or dados.empty:
+        return None
+
+    dpi = GRAFICOS_DPI if dpi is None else dpi
+    rapido = GRAFICOS_RAPIDO if rapido is None else rapido
+    caminho = caminho_grafico(acao, diretorio)
+    assinatura = assinatura or hash_dados(dados, dpi, rapido)
+    if not forcar and not precisa_desenhar(caminho, assinatura):
+        return None
+
+    # matplotlib só é carregado quando há gráfico a desenhar (a importação custa quase um segundo)
+    import matplotlib.dates as mdates
+    import matplotlib.pyplot as plt
+
+    fig, axs = _eixos(rapido)
+
     # Gráfico 1: Preço e Indicadores
     axs[0].plot(dados['Close'], label='Preço', color='black')
     axs[0].plot(dados['trend_sma_fast'], label='MM 20', color='blue', alpha=0.7)
     axs[0].plot(dados['trend_sma_slow'], label='MM 50', color='red', alpha=0.7)
     axs[0].plot(dados['trend_bb_upper'], label='BB Superior', color='gray', linestyle='--')
     axs[0].plot(dados['trend_bb_lower'], label='BB Inferior', color='gray', linestyle='--')
-    
+
     # Marcadores de compra/venda
     compras = dados[dados['Sinal'] > 0]
     vendas = dados[dados['Sinal'] < 0]
     axs[0].scatter(compras.index, compras['Close'], color='green', marker='^', s=100, label='Compra')
     axs[0].scatter(vendas.index, vendas['Close'], color='red', marker='v', s=100, label='Venda')
-    
+
     axs[0].set_title(f'Análise Técnica - {acao}')
     axs[0].legend()
     axs[0].grid(True)
-    
+
     # Gráfico 2: Volume
-    axs[1].bar(dados.index, dados['Volume'], color='blue', alpha=0.3)
+    if rapido:
+        x, alturas, largura = decimar_barras(dados.index, dados['Volume'], GRAFICOS_MAX_BARRAS)
+        axs[1].bar(x, alturas, width=largura, color='blue', alpha=0.3)
+    else:
+        axs[1].bar(dados.index, dados['Volume'], color='blue', alpha=0.3)
     axs[1].plot(dados['volume_ma20'], color='red', label='Média Volume (20)')
     axs[1].set_ylabel('Volume')
     axs[1].grid(True)
-    
+
     # Gráfico 3: RSI e ADX
     axs[2].plot(dados['momentum_rsi'], label='RSI', color='purple')
     axs[2].axhline(y=70, color='red', linestyle='--')
     axs[2].axhline(y=30, color='green', linestyle='--')
-    
+
     if 'trend_adx' in dados.columns:
         axs[2].plot(dados['trend_adx'], label='ADX', color='orange')
         axs[2].axhline(y=25, color='gray', linestyle='--')
-    
+
     axs[2].set_ylabel('Indicadores')
     axs[2].legend()
     axs[2].grid(True)
-    
+
     # Gráfico 4: MACD
     axs[3].plot(dados['trend_macd'], label='MACD', color='blue')
     axs[3].plot(dados['trend_macd_signal'], label='Sinal', color='red')
-    axs[3].bar(dados.index, dados['trend_macd_hist'], color=np.where(dados['trend_macd_hist'] > 0, 'green', 'red'))
+    if rapido:
+        x, alturas, largura = decimar_barras(dados.index, dados['trend_macd_hist'], GRAFICOS_MAX_BARRAS)
+        axs[3].bar(x, alturas, width=largura, color=np.where(alturas > 0, 'green', 'red'))
+    else:
+        axs[3].bar(dados.index, dados['trend_macd_hist'], color=np.where(dados['trend_macd_hist'] > 0, 'green', 'red'))
     axs[3].axhline(y=0, color='black', linestyle='-')
     axs[3].set_ylabel('MACD')
     axs[3].legend()
     axs[3].grid(True)
-    
+
     # Formatar eixos de data
     axs[3].xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-    plt.xticks(rotation=45)
-    
-    plt.tight_layout()
-    plt.savefig(f'analise_{acao.replace(".SA", "")}.png', dpi=300)
-    plt.close()
\ No newline at end of file
+    plt.setp(axs[3].get_xticklabels(), rotation=45)
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    fig.tight_layout()
+    fig.savefig(caminho, dpi=dpi)
+    if not rapido:
+        plt.close(fig)
+
+    with open(caminho + '.sha1', 'w', encoding='utf-8') as f:
+        f.write(assinatura)
+    return caminho
+
+def _iniciar_processo():
+    # Só nos processos de desenho: o backend do processo principal não é alterado
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+def _plotar_tarefa(dados, acao, diretorio, dpi, rapido, assinatura):
+    return acao, plotar_analise(dados, acao, diretorio=diretorio, dpi=dpi, rapido=rapido, forcar=True,
+                                assinatura=assinatura)
+
+_processos = None  # (número de processos, ProcessPoolExecutor)
+_lock_processos = threading.Lock()
+
+def obter_processos(processos=GRAFICOS_PROCESSOS):
+    """Processos de desenho compartilhados entre ciclos (matplotlib é importado uma vez por processo)"""
+    global _processos
+    with _lock_processos:
+        if _processos is None or _processos[0] != processos:
+            if _processos is not None:
+                _processos[1].shutdown(wait=False)
+            _processos = (processos, ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo))
+        return _processos[1]
+
+def _descartar_processos(pool):
+    """Descarta o pool se ele quebrou (um processo morreu); o próximo ciclo cria outro"""
+    global _processos
+    with _lock_processos:
+        if _processos is not None and _processos[1] is pool:
+            _processos = None
+    pool.shutdown(wait=False)
+
+@etapa('graficos')
+def plotar_varias(dados_por_acao, diretorio=None, dpi=None, rapido=None, processos=GRAFICOS_PROCESSOS):
+    """
+    Gera os gráficos de várias ações em paralelo
+
+    Ações cujos dados não mudaram desde o último gráfico nem são enviadas
+    aos processos.
+
+    Returns:
+        Dicionário {ação: caminho} apenas com os gráficos (re)desenhados
+    """
+    dpi = GRAFICOS_DPI if dpi is None else dpi
+    rapido = GRAFICOS_RAPIDO if rapido is None else rapido
+
+    pendentes = {}
+    inalterados = 0
+    for acao, dados in dados_por_acao.items():
+        if dados is None or dados.empty:
+            continue
+        assinatura = hash_dados(dados, dpi, rapido)
+        if precisa_desenhar(caminho_grafico(acao, diretorio), assinatura):
+            pendentes[acao] = (dados, assinatura)
+        else:
+            inalterados += 1
+    GRAFICOS.inc(inalterados, result='inalterado')
+    GRAFICOS.inc(len(pendentes), result='desenhado')
+    if not pendentes:
+        return {}
+
+    gerados = {}
+    if processos == 1 or len(pendentes) == 1:
+        for acao, (dados, assinatura) in pendentes.items():
+            gerados[acao] = plotar_analise(dados, acao, diretorio=diretorio, dpi=dpi, rapido=rapido, forcar=True,
+                                           assinatura=assinatura)
+        return gerados
+
+    pool = obter_processos(processos)
+    futuros = [pool.submit(_plotar_tarefa, dados, acao, diretorio, dpi, rapido, assinatura)
+               for acao, (dados, assinatura) in pendentes.items()]
+    for futuro in as_completed(futuros):
+        try:
+            acao, caminho = futuro.result()
+            gerados[acao] = caminho
+        except BrokenProcessPool as e:
+            _descartar_processos(pool)
+            logger.error("Erro ao gerar gráfico: %s", e)
+        except Exception as e:
+            logger.error("Erro ao gerar gráfico: %s", e)
+    return gerados
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import json
+import threading
+import time
+
+from flask import Response, request
+
+from trade_bot.config import CACHE_MAX_AGE_ABERTO, CACHE_MAX_AGE_FECHADO, NIVEL_GZIP
+from trade_bot.src.metricas import registro
+
+CONSULTAS = registro.contador(
+    'trade_bot_response_cache_total', 'Consultas ao cache de respostas prontas, por endpoint', ('endpoint', 'result'))
+TAXA_ACERTO = registro.medidor(
+    'trade_bot_response_cache_hit_ratio', 'Fração das consultas atendidas pelo cache de respostas', ('endpoint',))
+NAO_MODIFICADAS = registro.contador(
+    'trade_bot_http_not_modified_total', 'Respostas 304 (ETag do cliente ainda válido)')
+
+# Respostas menores que isso não compensam a compressão
+TAMANHO_MINIMO_GZIP = 512
+
+class RespostaPronta:
+    """
+    Payload JSON serializado e comprimido uma única vez, com ETag forte
+
+    As representações comprimida e sem compressão têm ETags distintos, como
+    exige a comparação forte.
+    """
+
+    def __init__(self, dados):
+        self.corpo = json.dumps(dados, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha1(self.corpo).hexdigest()
+        self.etag_gzip = self.etag + '-gz'
+        self.comprimido = (gzip.compress(self.corpo, NIVEL_GZIP, mtime=0)
+                           if len(self.corpo) >= TAMANHO_MINIMO_GZIP else None)
+
+class CacheRespostas:
+    """
+    Respostas prontas por chave (endpoint + ação), válidas para uma versão dos dados.
+
+    A versão é qualquer valor comparável que mude quando o conteúdo muda
+    (versão do snapshot, data de modificação do arquivo...). Enquanto a
+    versão for a mesma, o payload não é reconstruído nem reserializado.
+    """
+
+    def __init__(self):
+        self._respostas = {}  # {chave: (versão, RespostaPronta)}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, versao, construir):
+        """
+        Resposta pronta para a versão; construir() gera os dados quando necessário
+
+        Returns:
+            RespostaPronta, ou None se construir() não retornar dados
+        """
+        item = self._respostas.get(chave)
+        if versao is not None and item is not None and item[0] == versao:
+            CONSULTAS.inc(endpoint=chave[0], result='hit')
+            return item[1]
+        CONSULTAS.inc(endpoint=chave[0], result='miss')
+
+        dados = construir()
+        if dados is None:
+            return None
+        pronta = RespostaPronta(dados)
+        if versao is not None:
+            with self._lock:
+                self._respostas[chave] = (versao, pronta)
+        return pronta
+
+    def limpar(self):
+        with self._lock:
+            self._respostas.clear()
+
+def cache_control(mercado_aberto, vence_em=None):
+    """
+    Com o mercado fechado os dados não mudam, e o cache pode durar mais
+
+    Args:
+        vence_em: Momento (timestamp) em que os dados podem mudar (próxima
+            atualização agendada); o max-age não passa dele
+    """
+    max_age = CACHE_MAX_AGE_ABERTO if mercado_aberto else CACHE_MAX_AGE_FECHADO
+    if vence_em is not None:
+        max_age = max(0, min(max_age, int(vence_em - time.time())))
+    return f'public, max-age={max_age}'
+
+def _aceita_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+def responder(pronta, mercado_aberto, status=200, vence_em=None):
+    """
+    Resposta HTTP para um payload pronto
+
+    Responde 304 quando o If-None-Match do cliente coincide com o ETag e
+    envia o corpo comprimido quando o cliente aceita gzip. vence_em limita o
+    max-age (ver cache_control).
+    """
+    comprimir = pronta.comprimido is not None and _aceita_gzip()
+    etag = pronta.etag_gzip if comprimir else pronta.etag
+    cabecalhos = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': cache_control(mercado_aberto, vence_em),
+        'Vary': 'Accept-Encoding',
+    }
+    if request.if_none_match.contains_weak(etag):
+        NAO_MODIFICADAS.inc()
+        return Response(status=304, headers=cabecalhos)
+
+    if comprimir:
+        cabecalhos['Content-Encoding'] = 'gzip'
+        return Response(pronta.comprimido, status=status, mimetype='application/json', headers=cabecalhos)
+    return Response(pronta.corpo, status=status, mimetype='application/json', headers=cabecalhos)
+
+cache = CacheRespostas()
+
+@registro.ao_coletar
+def _taxa_acerto():
+    totais = {}
+    for (endpoint, resultado), valor in CONSULTAS.valores().items():
+        acertos, consultas = totais.get(endpoint, (0, 0))
+        totais[endpoint] = (acertos + (valor if resultado == 'hit' else 0), consultas + valor)
+    TAXA_ACERTO.substituir({(endpoint,): acertos / consultas for endpoint, (acertos, consultas) in totais.items()})
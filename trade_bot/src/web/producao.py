@@ -0,0 +1,118 @@
+"""
+Servidor de produção: workers WSGI pré-criados (prefork) e um único produtor do snapshot.
+
+O processo principal abre o socket, inicia o produtor (que calcula o
+snapshot pelo agendador e o publica em ARQUIVO_SNAPSHOT) e cria os workers
+com fork depois de importar a aplicação, de modo que o código carregado
+fica compartilhado entre eles. Os workers aceitam conexões no mesmo socket,
+atendem cada uma em uma thread e leem o snapshot do arquivo publicado:
+nenhum deles baixa dados ou calcula indicadores das ações monitoradas, e a
+carga na fonte de dados não depende do número de workers. O processo
+principal repõe workers e produtor que terminarem e encerra todos com
+SIGTERM ou Ctrl+C.
+
+Só em sistemas com fork (Linux, macOS). Com o gunicorn, o equivalente é
+rodar o produtor à parte (trade-bot produce) e os workers com
+TRADE_BOT_SNAPSHOT_COMPARTILHADO=1 (ver README).
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+from trade_bot.config import ARQUIVO_SNAPSHOT, LOG_NIVEL, SERVIDOR_WORKERS
+from trade_bot.src.web import snapshot
+
+logger = logging.getLogger(__name__)
+
+# Espera antes de repor um processo que terminou (evita um laço de reinícios se ele falha na partida)
+ESPERA_REINICIO = 1.0
+
+def _bifurcar(funcao, *args):
+    """Executa funcao(*args) em um processo filho e retorna o pid"""
+    pid = os.fork()
+    if pid:
+        return pid
+    codigo = 0
+    try:
+        # Ctrl+C chega a todo o grupo de processos: quem encerra os filhos é o principal, com SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        funcao(*args)
+    except BaseException:
+        logger.exception("Processo %d terminou com erro", os.getpid())
+        codigo = 1
+    finally:
+        logging.shutdown()
+        os._exit(codigo)
+
+def _produtor(soquete, caminho):
+    from trade_bot.src.web.snapshot_compartilhado import produzir
+    soquete.close()  # o produtor não atende requisições
+    produzir(caminho)
+
+def _worker(soquete, app):
+    servidor = make_server(*soquete.getsockname()[:2], app, threaded=True, fd=soquete.fileno())
+    servidor.serve_forever()
+
+def _encerrar(numero, quadro):
+    sys.exit(0)
+
+def servir(workers=SERVIDOR_WORKERS, host='0.0.0.0', porta=5000, caminho=ARQUIVO_SNAPSHOT):
+    """
+    Atende em host:porta com workers processos (None = um por núcleo) até SIGTERM ou Ctrl+C
+
+    Raises:
+        RuntimeError: Sistema sem fork (Windows)
+    """
+    if not hasattr(os, 'fork'):
+        raise RuntimeError("O servidor de produção precisa de fork (Linux ou macOS); use trade-bot serve sem --workers")
+    workers = workers or os.cpu_count() or 1
+    soquete = socket.create_server((host, porta), backlog=2048)
+    filhos = {}  # pid: papel
+
+    def iniciar(papel):
+        if papel == 'produtor':
+            pid = _bifurcar(_produtor, soquete, caminho)
+        else:
+            pid = _bifurcar(_worker, soquete, app)
+        filhos[pid] = papel
+
+    # O produtor nasce antes da troca do armazém: ele calcula o snapshot, os workers só leem
+    iniciar('produtor')
+    snapshot.configurar(caminho)
+    from trade_bot.src.web.server import app
+    # Log de acesso do werkzeug (INFO por requisição) segue TRADE_BOT_LOG
+    logging.getLogger('werkzeug').setLevel(LOG_NIVEL)
+    for _ in range(workers):
+        iniciar('worker')
+    logger.info("Servidor em http://%s:%s: %d workers e um produtor (snapshot em %s)", host, porta, workers, caminho)
+
+    signal.signal(signal.SIGTERM, _encerrar)
+    try:
+        while True:
+            pid, status = os.wait()
+            papel = filhos.pop(pid, None)
+            if papel is None:
+                continue
+            logger.warning("%s %d terminou (status %s); iniciando outro", papel.capitalize(), pid, status)
+            time.sleep(ESPERA_REINICIO)
+            iniciar(papel)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in filhos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in filhos:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        soquete.close()
@@ -1,33 +1,37 @@
-from flask import Flask, render_template, jsonify
-import yfinance as yf
+from flask import Flask, Response, g, render_template, jsonify, request
+import json
 import pandas as pd
-import numpy as np
 import os
 import logging
-from datetime import datetime, time
+import threading
+import time
+from datetime import date
+
+from trade_bot.config import LOG_NIVEL
 
 # Configurar logging
-logging.basicConfig(level=logging.DEBUG)
+logging.basicConfig(level=LOG_NIVEL)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__, 
            static_folder=os.path.join(os.path.dirname(__file__), 'static'),
            template_folder=os.path.join(os.path.dirname(__file__), 'templates'))
 
-# Configurações do horário do pregão
-HORA_ABERTURA = time(10, 0)  # 10:00
-HORA_FECHAMENTO = time(17, 55)  # 17:55
+from trade_bot.src.calendario import mercado_aberto
 
 def is_mercado_aberto():
-    """Verifica se o mercado está aberto"""
-    agora = datetime.now()
-    hora_atual = agora.time()
-    
-    # Verifica se é dia útil (0 = Segunda, 6 = Domingo)
-    if agora.weekday() >= 5:  # Sábado ou Domingo
-        return False
-        
-    return HORA_ABERTURA <= hora_atual <= HORA_FECHAMENTO
+    """Verifica se o mercado está aberto (calendário da B3: feriados, horários especiais e fuso)"""
+    return mercado_aberto()
+
+from trade_bot.src.metricas import TIPO_CONTEUDO, combinar, registro
+
+DURACAO_REQUISICOES = registro.histograma(
+    'trade_bot_http_request_duration_seconds', 'Duração das requisições HTTP (streaming: até o início da resposta)',
+    ('route', 'method', 'status'))
+
+@app.before_request
+def iniciar_cronometro():
+    g.inicio_requisicao = time.perf_counter()
 
 # Configurar CORS e outras configurações importantes
 @app.after_request
@@ -35,54 +39,139 @@ def add_headers(response):
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+
+    # Rota como padrão (/api/stock/<symbol>), não a URL, para não criar uma série por ação
+    inicio = g.get('inicio_requisicao')
+    if inicio is not None:
+        rota = request.url_rule.rule if request.url_rule is not None else 'desconhecida'
+        DURACAO_REQUISICOES.observar(time.perf_counter() - inicio, route=rota, method=request.method,
+                                     status=response.status_code)
     return response
 
-from trade_bot.config import ACOES
+from trade_bot.config import (ACOES, ARQUIVO_SNAPSHOT, ARQUIVO_UNIVERSO, INTERVALO_BASE, SNAPSHOT_COMPARTILHADO,
+                              SNAPSHOT_ESPERA_INICIAL, SNAPSHOT_INTERVALO, SSE_HEARTBEAT, SSE_RETRY_MS,
+                              TRIAGEM_RESULTADOS, TRIAGEM_SERVIDOR, HISTORICO_LIMITE_CONSULTA)
+from trade_bot.src.agendador import Agendador
+from trade_bot.src.data_source import obter_fonte
+from trade_bot.src.data_store import caminho_arquivo, carregar
+from trade_bot.src.historico_sinais import obter_historico
+from trade_bot.src.timeframes import reamostrar
+from trade_bot.src.triagem import carregar_universo
+from trade_bot.src.web.cache_http import RespostaPronta, cache, responder
+from trade_bot.src.web import snapshot as snapshots
+from trade_bot.src.web.snapshot import iniciar_atualizador
 
 # Lista de ações monitoradas
 ACOES_TESTE = ACOES
 
+# Armazém do snapshot: calculado neste processo ou lido do arquivo do produtor
+# (producao.servir já o define antes de criar os workers)
+if snapshots.armazem is None:
+    snapshots.configurar(ARQUIVO_SNAPSHOT if SNAPSHOT_COMPARTILHADO else None)
+
+def _snapshot():
+    """Garante o atualizador em segundo plano e espera o primeiro snapshot (só na partida)"""
+    armazem = snapshots.armazem
+    iniciar_atualizador(ACOES_TESTE, is_mercado_aberto)
+    armazem.aguardar(SNAPSHOT_ESPERA_INICIAL)
+    return armazem
+
+agendador = Agendador(SNAPSHOT_INTERVALO)
+_proxima = [0.0]  # próxima execução do agendador (timestamp), recalculada só depois de passar
+
+def _proxima_atualizacao():
+    """Momento (timestamp) em que os dados do snapshot podem mudar: próxima atualização ou vencimento, o que vier antes"""
+    if time.time() >= _proxima[0]:
+        _proxima[0] = agendador.proximo()[0].timestamp()
+    proxima = _proxima[0]
+    vence_em = snapshots.armazem.vence_em
+    return proxima if vence_em is None else min(proxima, vence_em)
+
+# Ações do universo da triagem que podem ser consultadas fora das monitoradas
+_universo = None  # (data de modificação do arquivo, ações)
+_lock_universo = threading.Lock()
+
+def acoes_sob_demanda():
+    """Ações que podem ser calculadas sob demanda: as do universo da triagem (relido quando o arquivo muda)"""
+    global _universo
+    try:
+        modificado = os.stat(ARQUIVO_UNIVERSO).st_mtime_ns
+    except OSError:
+        modificado = None
+    with _lock_universo:
+        if _universo is None or _universo[0] != modificado:
+            _universo = (modificado, frozenset(carregar_universo()))
+        return _universo[1]
+
+def acao_conhecida(symbol):
+    return symbol in ACOES_TESTE or symbol in acoes_sob_demanda()
+
 def get_stock_data(symbol):
-    """Função para obter dados de ações"""
+    """
+    Função para obter dados de ações
+
+    Ações monitoradas são lidas do snapshot em memória. Outras ações do
+    universo da triagem são pedidas ao atualizador em segundo plano (ou ao
+    produtor, no modo compartilhado), sem download na requisição: retornam
+    None até serem calculadas e, depois de vencidas, o resumo anterior
+    (stale) enquanto são refeitas. Ações desconhecidas retornam None.
+    """
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period='1d')
-        if not hist.empty:
-            # Calcula indicadores técnicos
-            rsi = np.random.randint(30, 70)  # Simula RSI por enquanto
-            adx = np.random.randint(20, 40)  # Simula ADX por enquanto
-            
-            mercado_aberto = is_mercado_aberto()
-            
-            # Determina recomendação baseada nos indicadores
-            if not mercado_aberto:
-                recommendation = 'MERCADO FECHADO'
-            elif rsi < 30 and adx > 25:
-                recommendation = 'COMPRAR'
-            elif rsi > 70 and adx > 25:
-                recommendation = 'VENDER'
-            else:
-                recommendation = 'MANTER'
-            
-            return {
-                'symbol': symbol,
-                'price': float(hist['Close'].iloc[-1]),
-                'rsi': rsi,
-                'adx': adx,
-                'recommendation': recommendation,
-                'date': hist.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
-                'market_status': 'ABERTO' if mercado_aberto else 'FECHADO'
-            }
+        if symbol in ACOES_TESTE:
+            return _snapshot().obter(symbol)
+        if symbol not in acoes_sob_demanda():
+            return None
+        armazem = snapshots.armazem
+        iniciar_atualizador(ACOES_TESTE, is_mercado_aberto)
+        data = armazem.obter_sob_demanda(symbol)
+        if data is None or data['stale']:
+            armazem.pedidos.pedir(symbol)
+        return data
     except Exception as e:
-        logger.error(f"Erro ao buscar dados para {symbol}: {e}", exc_info=True)
+        logger.error("Erro ao buscar dados para %s: %s", symbol, e, exc_info=True)
     return None
 
+def _resposta_acao(symbol):
+    """Resumo de uma ação monitorada pré-serializado, refeito só quando o snapshot da ação muda"""
+    snapshot = _snapshot()
+    versao = snapshot.versao_itens([symbol])
+    if not versao:
+        return None
+    return cache.obter(('acao', symbol), versao, lambda: snapshot.obter(symbol))
+
+def _responder_acao(symbol):
+    """
+    Resposta HTTP com o resumo da ação, ou None sem dados
+
+    Fora das monitoradas (e do cache de respostas), responde 202 enquanto
+    o atualizador não calcula a ação, e um resumo vencido, já pedido de
+    novo, não é guardado pelo cliente.
+    """
+    if symbol in ACOES_TESTE:
+        pronta = _resposta_acao(symbol)
+        if pronta is None:
+            return None
+        return responder(pronta, is_mercado_aberto(), vence_em=_proxima_atualizacao())
+    dados = get_stock_data(symbol)
+    if dados is None:
+        if symbol in acoes_sob_demanda():
+            return jsonify({'status': 'Calculando', 'symbol': symbol}), 202
+        return None
+    vence_em = time.time() if dados['stale'] else _proxima_atualizacao()
+    return responder(RespostaPronta(dados), is_mercado_aberto(), vence_em=vence_em)
+
 def get_historical_data(symbol):
     """Obtém dados históricos para o gráfico"""
     try:
-        stock = yf.Ticker(symbol)
-        hist = stock.history(period='1mo', interval='1d')  # Último mês com dados diários
-        if not hist.empty:
+        inicio = pd.Timestamp.now().normalize() - pd.DateOffset(months=1)
+        # Último mês com dados diários: do armazenamento local, mantido pelo
+        # atualizador, reamostrado do intervalo base
+        armazenados, _ = carregar(symbol, intervalo=INTERVALO_BASE)
+        if armazenados is not None and not armazenados.empty and armazenados.index[0] <= inicio:
+            hist = reamostrar(armazenados[armazenados.index >= inicio], '1d')
+        else:
+            hist = obter_fonte().fetch(symbol, start=inicio, interval='1d')
+        if hist is not None and not hist.empty:
             # Converte os preços para lista mantendo 2 casas decimais
             precos = [round(float(price), 2) for price in hist['Close'].tolist()]
             # Formata as datas para o padrão brasileiro
@@ -96,7 +185,7 @@ def get_historical_data(symbol):
                 'variacao': round((precos[-1] - precos[0]) / precos[0] * 100, 2)
             }
     except Exception as e:
-        logger.error(f"Erro ao buscar histórico para {symbol}: {e}", exc_info=True)
+        logger.error("Erro ao buscar histórico para %s: %s", symbol, e, exc_info=True)
         return None
 
 @app.route('/')
@@ -105,16 +194,25 @@ def index():
     try:
         return render_template('index.html')
     except Exception as e:
-        logger.error(f"Erro ao renderizar template: {e}", exc_info=True)
+        logger.error("Erro ao renderizar template: %s", e, exc_info=True)
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+def _versao_historico(acao):
+    """Versão do histórico: arquivo local da ação e o dia (a janela de um mês avança)"""
+    try:
+        return os.stat(caminho_arquivo(acao, intervalo=INTERVALO_BASE)).st_mtime_ns, date.today()
+    except OSError:
+        return None
+
 @app.route('/api/analise/<acao>')
 def analise_acao(acao):
     """API endpoint para análise de uma ação específica"""
-    data = get_stock_data(acao)
-    if data is None:
+    if not acao_conhecida(acao):
+        return jsonify({'erro': 'Ação não encontrada'}), 404
+    resposta = _responder_acao(acao)
+    if resposta is None:
         return jsonify({'erro': 'Falha ao buscar dados'}), 400
-    return jsonify(data)
+    return resposta
 
 @app.route('/api/acoes')
 def lista_acoes():
@@ -127,34 +225,150 @@ def historico_acao(acao):
     if acao not in ACOES_TESTE:
         return jsonify({'erro': 'Ação não encontrada'}), 404
     
-    dados = get_historical_data(acao)
-    if dados is None:
+    pronta = cache.obter(('historico', acao), _versao_historico(acao), lambda: get_historical_data(acao))
+    if pronta is None:
         return jsonify({'erro': 'Falha ao buscar dados históricos'}), 400
-    
-    return jsonify(dados)
+
+    return responder(pronta, is_mercado_aberto(), vence_em=_proxima_atualizacao())
 
 @app.route('/api/stocks')
 def get_stocks():
     try:
-        results = []
-        for symbol in ACOES_TESTE:
-            data = get_stock_data(symbol)
-            if data:
-                results.append(data)
-        return jsonify(results)
+        snapshot = _snapshot()
+        pronta = cache.obter(('stocks',), snapshot.versao_itens(ACOES_TESTE), lambda: snapshot.listar(ACOES_TESTE))
+        return responder(pronta, is_mercado_aberto(), vence_em=_proxima_atualizacao())
     except Exception as e:
-        logger.error(f"Erro ao obter dados das ações: {e}", exc_info=True)
+        logger.error("Erro ao obter dados das ações: %s", e, exc_info=True)
         return jsonify({'error': 'Erro ao obter dados das ações'}), 500
 
+@app.route('/api/snapshot')
+def snapshot_status():
+    """Versão, idade e último erro do snapshot em memória"""
+    return jsonify(_snapshot().metadados())
+
+def _evento_sse(tipo, dados, id_evento=None):
+    """Formata uma mensagem Server-Sent Events"""
+    linhas = [f"id: {id_evento}"] if id_evento is not None else []
+    linhas += [f"event: {tipo}", f"data: {json.dumps(dados)}"]
+    return '\n'.join(linhas) + '\n\n'
+
+def _ultimo_id(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+@app.route('/api/stream')
+def stream_stocks():
+    """
+    Streaming (Server-Sent Events) das mudanças nas ações monitoradas
+
+    Na conexão o cliente recebe o snapshot completo (evento 'snapshot'); depois,
+    apenas os campos alterados de cada ação (eventos 'delta'). Com o cabeçalho
+    Last-Event-ID (enviado pelo EventSource ao reconectar) só os deltas
+    perdidos são reenviados. Sem mudanças, um 'heartbeat' com os metadados do
+    snapshot é enviado a cada SSE_HEARTBEAT segundos.
+    """
+    snapshot = _snapshot()
+    ultimo_id = _ultimo_id(request.headers.get('Last-Event-ID') or request.args.get('lastEventId'))
+    monitoradas = set(ACOES_TESTE)
+
+    def gerar():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        eventos = snapshot.eventos_desde(ultimo_id) if ultimo_id is not None else None
+        atual = ultimo_id
+        while True:
+            if eventos is None:
+                atual, itens = snapshot.completo(ACOES_TESTE)
+                yield _evento_sse('snapshot', itens, atual)
+            elif not eventos:
+                yield _evento_sse('heartbeat', snapshot.metadados())
+            else:
+                for id_evento, delta in eventos:
+                    if delta['symbol'] in monitoradas:
+                        yield _evento_sse('delta', delta, id_evento)
+                atual = eventos[-1][0]
+            eventos = snapshot.aguardar_eventos(atual, SSE_HEARTBEAT)
+
+    return Response(gerar(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/triagem')
+def triagem_universo():
+    """
+    Ranking da triagem do universo (parâmetro limite: quantidade de ações)
+
+    A triagem roda em segundo plano, no atualizador do snapshot (ou no
+    produtor, no modo de produção); a rota só lê o último resultado e
+    responde 202 enquanto a primeira execução não termina.
+    """
+    if not TRIAGEM_SERVIDOR:
+        return jsonify({'erro': 'Triagem desativada (TRIAGEM_SERVIDOR)'}), 404
+    limite = request.args.get('limite', TRIAGEM_RESULTADOS, type=int)
+    try:
+        iniciar_atualizador(ACOES_TESTE, is_mercado_aberto)
+        triagem = snapshots.armazem.triagem()
+        if triagem is None:
+            return jsonify({'status': 'Triagem em andamento'}), 202
+        versao, vencimento, resultado = triagem
+        # Entre 1 e o tamanho do ranking (também limita as chaves do cache de respostas)
+        limite = max(1, min(limite, len(resultado['ranking'])))
+        pronta = cache.obter(('triagem', limite), (versao, vencimento),
+                             lambda: {**resultado, 'ranking': resultado['ranking'][:limite]})
+        return responder(pronta, is_mercado_aberto(), vence_em=vencimento)
+    except Exception as e:
+        logger.error("Erro na triagem: %s", e, exc_info=True)
+        return jsonify({'error': 'Erro na triagem das ações'}), 500
+
+def _consulta_historico(consultar):
+    """Resposta de uma consulta ao histórico de sinais; datas inválidas em inicio/fim dão 400"""
+    # Entre 1 e o máximo: no SQLite um LIMIT negativo não limita nada
+    limite = max(1, min(request.args.get('limite', HISTORICO_LIMITE_CONSULTA, type=int), HISTORICO_LIMITE_CONSULTA))
+    try:
+        dados = consultar(timeframe=request.args.get('timeframe', '1d'), limite=limite)
+    except ValueError:
+        return jsonify({'erro': 'Data inválida (use AAAA-MM-DD ou AAAA-MM-DD HH:MM)'}), 400
+    except Exception as e:
+        logger.error("Erro ao consultar o histórico de sinais: %s", e, exc_info=True)
+        return jsonify({'error': 'Erro ao consultar o histórico de sinais'}), 500
+    return responder(RespostaPronta(dados), is_mercado_aberto(), vence_em=_proxima_atualizacao())
+
+@app.route('/api/sinais/ultimos')
+def sinais_ultimos():
+    """Último sinal gravado de cada ação (parâmetro timeframe, padrão 1d)"""
+    return _consulta_historico(lambda timeframe, limite: obter_historico().ultimos(timeframe)[:limite])
+
+@app.route('/api/sinais/mudancas')
+def sinais_mudancas():
+    """Mudanças de sinal, da mais recente para a mais antiga (parâmetros acao, inicio, fim, timeframe, limite)"""
+    return _consulta_historico(lambda timeframe, limite: obter_historico().mudancas(
+        request.args.get('acao'), request.args.get('inicio'), request.args.get('fim'), timeframe, limite))
+
+@app.route('/api/sinais/<acao>')
+def sinais_acao(acao):
+    """Indicadores e sinal das barras gravadas de uma ação (parâmetros inicio, fim, timeframe, limite)"""
+    return _consulta_historico(lambda timeframe, limite: obter_historico().intervalo(
+        acao, request.args.get('inicio'), request.args.get('fim'), timeframe, limite))
+
+@app.route('/metrics')
+def metricas():
+    """Métricas do processo no formato de exposição do Prometheus"""
+    texto = registro.exportar()
+    armazem = snapshots.armazem
+    if armazem.compartilhado:
+        # O pipeline roda no produtor do snapshot: as métricas dele são publicadas junto com o snapshot
+        texto = combinar(texto, armazem.documento('metricas') or '')
+    return Response(texto, content_type=TIPO_CONTEUDO)
+
 @app.route('/api/stock/<symbol>')
 def get_stock(symbol):
     try:
-        data = get_stock_data(symbol)
-        if data:
-            return jsonify(data)
+        resposta = _responder_acao(symbol)
+        if resposta is not None:
+            return resposta
         return jsonify({'error': 'Ação não encontrada'}), 404
     except Exception as e:
-        logger.error(f"Erro ao obter dados da ação {symbol}: {e}", exc_info=True)
+        logger.error("Erro ao obter dados da ação %s: %s", symbol, e, exc_info=True)
         return jsonify({'error': 'Erro ao obter dados da ação'}), 500
 
 if __name__ == '__main__':
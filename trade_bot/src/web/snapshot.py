@@ -0,0 +1,551 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import pandas as pd
+
+from trade_bot.config import (HISTORICO_ATIVO, INTERVALO_TRIAGEM, MIN_PERIODOS, PERIODO_DADOS, SNAPSHOT_INTERVALO,
+                              SNAPSHOT_SINCRONIZACAO, SNAPSHOT_TTL, SOB_DEMANDA_MAXIMO, SSE_HISTORICO,
+                              TRIAGEM_SERVIDOR)
+from trade_bot.src.agendador import Agendador
+from trade_bot.src.calendario import FUSO
+from trade_bot.src import indicadores_incrementais
+from trade_bot.src.historico_sinais import obter_historico
+from trade_bot.src.kernel_indicadores import COLUNAS_INDICADORES
+from trade_bot.src.memoria import descartar_intermediarias, dtype_indicadores, verificar_orcamento
+from trade_bot.src.metricas import etapa, registro
+from trade_bot.src.painel import COLUNAS_OHLCV, processar_painel
+from trade_bot.src.strategy import gerar_sinais
+from trade_bot.src.timeframes import timeframes_conforme_chegam
+from trade_bot.src.triagem import triar
+
+logger = logging.getLogger(__name__)
+
+IDADE = registro.medidor(
+    'trade_bot_snapshot_age_seconds', 'Segundos desde a última atualização do resumo de cada ação', ('symbol',))
+DESATUALIZADO = registro.medidor(
+    'trade_bot_snapshot_stale', '1 quando o resumo da ação passou do vencimento (stale)', ('symbol',))
+ULTIMA_BARRA = registro.medidor(
+    'trade_bot_last_bar_timestamp_seconds', 'Data da última barra usada no resumo de cada ação (Unix)', ('symbol',))
+ERROS = registro.contador('trade_bot_snapshot_errors_total', 'Falhas na reconstrução do snapshot')
+
+def recomendacao(sinal, mercado_aberto):
+    """Texto exibido no dashboard para o sinal da última barra"""
+    if not mercado_aberto:
+        return 'MERCADO FECHADO'
+    if sinal > 0:
+        return 'COMPRAR'
+    if sinal < 0:
+        return 'VENDER'
+    return 'MANTER'
+
+def resumir(symbol, com_sinais, mercado_aberto):
+    """Resumo da última barra de gerar_sinais no formato das APIs de ações"""
+    ultima = com_sinais.iloc[-1]
+    sinal = int(ultima['Sinal'])
+    adx = ultima['trend_adx'] if 'trend_adx' in com_sinais.columns else None
+    return {
+        'symbol': symbol,
+        'price': float(ultima['Close']),
+        'rsi': round(float(ultima['momentum_rsi']), 2),
+        'adx': round(float(adx), 2) if adx is not None and pd.notna(adx) else None,
+        'signal': sinal,
+        'recommendation': recomendacao(sinal, mercado_aberto),
+        'date': com_sinais.index[-1].strftime('%Y-%m-%d %H:%M:%S'),
+        'market_status': 'ABERTO' if mercado_aberto else 'FECHADO',
+    }
+
+@etapa('indicadores_incrementais')
+def ultimas_barras(dados_por_acao, min_periodos=MIN_PERIODOS):
+    """
+    Última barra de cada ação com os indicadores, pelo motor incremental
+
+    O motor de cada ação é mantido entre as chamadas: só as barras novas (e a
+    última, que pode ter sido revisada) são processadas. O resultado é o de
+    processar_painel(..., ultimas=1).
+
+    Returns:
+        Dicionário {ação: DataFrame de uma linha} apenas com as ações com dados suficientes
+    """
+    precos = descartar_intermediarias(COLUNAS_OHLCV)
+    tipo = dtype_indicadores()
+    processados = {}
+    for acao, dados in dados_por_acao.items():
+        if dados is None or dados.empty:
+            continue
+        linha = indicadores_incrementais.atualizar(acao, dados)
+        completas = indicadores_incrementais.obter_motor(acao).completas
+        if linha is None or completas < min_periodos:
+            logger.warning("Dados insuficientes após processamento de %s (%d períodos)", acao, completas)
+            continue
+        ultima = dados.iloc[-1]
+        processados[acao] = pd.DataFrame(
+            [[float(ultima[coluna]) for coluna in precos] + [linha[coluna] for coluna in COLUNAS_INDICADORES]],
+            index=dados.index[-1:], columns=precos + COLUNAS_INDICADORES,
+        ).astype({coluna: tipo for coluna in COLUNAS_INDICADORES}, copy=False)
+    return processados
+
+@etapa('snapshot')
+def construir_snapshot(acoes, mercado_aberto=False, periodo=PERIODO_DADOS, sob_demanda=False):
+    """
+    Baixa (incrementalmente), processa e gera sinais diários para as ações
+
+    As barras diárias são reamostradas do intervalo base (INTERVALO_BASE) e
+    os indicadores vêm do motor incremental de cada ação (ultimas_barras).
+    Cada ação é processada assim que o download dela termina, enquanto as
+    demais ainda estão sendo baixadas.
+
+    Args:
+        sob_demanda: Consulta avulsa de uma ação fora das monitoradas: os
+            indicadores são calculados em lote, sem guardar o motor da ação,
+            e o histórico de sinais não é gravado
+
+    Returns:
+        Dicionário {ação: resumo}; ações sem dados suficientes ficam de fora
+    """
+    itens, sinais, diarios = {}, {}, {}
+    for acao, derivados in timeframes_conforme_chegam(acoes, timeframes=['1d'], periodo=periodo):
+        if '1d' not in derivados:
+            continue
+        diarios[acao] = derivados['1d']
+        if sob_demanda:
+            processados = processar_painel({acao: diarios[acao]}, min_periodos=MIN_PERIODOS, ultimas=1)
+        else:
+            # O resumo usa só a última barra: a cada atualização só as barras novas passam pelos indicadores
+            processados = ultimas_barras({acao: diarios[acao]})
+        if acao not in processados:
+            continue
+        com_sinais = gerar_sinais(processados[acao])
+        if com_sinais is None or com_sinais.empty:
+            logger.warning("Sem sinais para %s", acao)
+            continue
+        itens[acao] = resumir(acao, com_sinais, mercado_aberto)
+        sinais[acao] = com_sinais
+    verificar_orcamento(diarios, 'snapshot')
+    if HISTORICO_ATIVO and not sob_demanda:
+        try:
+            obter_historico().gravar(sinais, '1d')
+        except Exception as e:
+            logger.warning("Erro ao gravar o histórico de sinais: %s", e)
+    return itens
+
+def calcular_vencimento(momento, ttl=SNAPSHOT_TTL, agendador=None):
+    """Momento (timestamp) a partir do qual dados atualizados em momento ficam desatualizados"""
+    if agendador is None:
+        return momento + ttl
+    proximo, _ = agendador.proximo(datetime.fromtimestamp(momento, FUSO))
+    return proximo.timestamp() + ttl
+
+def com_metadados(resumo, momento, vencimento, agora):
+    """Resumo acrescido do momento da atualização e de se está desatualizado"""
+    return {
+        **resumo,
+        'updated_at': datetime.fromtimestamp(momento).strftime('%Y-%m-%d %H:%M:%S'),
+        'stale': agora > vencimento,
+    }
+
+class ArmazemSnapshot:
+    """
+    Último snapshot de cada ação, em memória.
+
+    As leituras não fazem E/S: devolvem o resumo da ação acrescido do momento
+    da atualização e se ele está desatualizado (stale): quando a próxima
+    atualização prevista pelo agendador já passou há mais que o TTL. Sem
+    agendador, quando a idade passa do TTL. A versão é incrementada a cada
+    atualização.
+
+    Cada atualização também gera um evento por ação com apenas os campos que
+    mudaram (delta), numerado em sequência. Os últimos eventos ficam em
+    memória para que clientes de streaming retomem a partir do último id
+    recebido.
+
+    O resultado da triagem do universo, feita pelo atualizador no agendador
+    da triagem, fica junto (atualizar_triagem/triagem), assim como os
+    resumos de ações fora das monitoradas (sob_demanda), calculados pelo
+    atualizador conforme são pedidos (pedidos).
+    """
+
+    compartilhado = False  # True quando lido do arquivo publicado pelo produtor (snapshot_compartilhado)
+
+    def __init__(self, ttl=SNAPSHOT_TTL, historico=SSE_HISTORICO, agendador=None):
+        self.ttl = ttl
+        self.agendador = agendador
+        self.versao = 0
+        self.atualizado_em = None
+        self.vence_em = None
+        self.ultimo_erro = None
+        self._itens = {}  # {ação: (resumo, momento da atualização, vencimento)}
+        self._eventos = deque(maxlen=historico)  # (id, delta)
+        self._ultimo_evento = 0
+        self._triagem = None  # (versão, vencimento, resultado de triar)
+        self.sob_demanda = ResumosSobDemanda(ttl=ttl, agendador=agendador)
+        self.pedidos = FilaSobDemanda()
+        self._lock = threading.Lock()
+        self._novos_eventos = threading.Condition(self._lock)
+        self._pronto = threading.Event()
+
+    def atualizar(self, itens, momento=None):
+        """Substitui os resumos das ações informadas e registra os deltas"""
+        momento = time.time() if momento is None else momento
+        vencimento = self.vencimento(momento)
+        atualizado_em = datetime.fromtimestamp(momento).strftime('%Y-%m-%d %H:%M:%S')
+        with self._lock:
+            for acao, resumo in itens.items():
+                anterior = self._itens.get(acao)
+                mudancas = {campo: valor for campo, valor in resumo.items()
+                            if anterior is None or anterior[0].get(campo) != valor}
+                self._itens[acao] = (resumo, momento, vencimento)
+                if mudancas:
+                    self._ultimo_evento += 1
+                    self._eventos.append((self._ultimo_evento,
+                                          {'symbol': acao, **mudancas, 'updated_at': atualizado_em}))
+            self.versao += 1
+            self.atualizado_em = momento
+            self.vence_em = vencimento
+            self.ultimo_erro = None
+            self._novos_eventos.notify_all()
+        self._pronto.set()
+
+    def atualizar_triagem(self, resultado, vencimento):
+        """Guarda o resultado da triagem, válido até vencimento (timestamp da próxima execução)"""
+        with self._lock:
+            versao = self._triagem[0] + 1 if self._triagem else 1
+            self._triagem = (versao, vencimento, resultado)
+
+    def triagem(self):
+        """(versão, vencimento, resultado) da última triagem, ou None antes da primeira"""
+        return self._triagem
+
+    def obter_sob_demanda(self, acao):
+        """Resumo com metadados de uma ação fora das monitoradas, ou None se ainda não foi calculado"""
+        return self.sob_demanda.obter(acao)
+
+    def registrar_erro(self, erro):
+        ERROS.inc()
+        with self._lock:
+            self.ultimo_erro = str(erro)
+        # Libera as requisições em espera; elas recebem o que houver no snapshot
+        self._pronto.set()
+
+    def aguardar(self, timeout=None):
+        """Espera a primeira atualização (retorna False se o tempo esgotar)"""
+        return self._pronto.wait(timeout)
+
+    def vencimento(self, momento):
+        """Momento (timestamp) a partir do qual dados atualizados em momento ficam desatualizados"""
+        return calcular_vencimento(momento, self.ttl, self.agendador)
+
+    _com_metadados = staticmethod(com_metadados)
+
+    def obter(self, acao):
+        """Resumo da ação com metadados, ou None se ainda não houver snapshot"""
+        item = self._itens.get(acao)
+        if item is None:
+            return None
+        return self._com_metadados(*item, time.time())
+
+    def listar(self, acoes):
+        """Resumos das ações informadas que já têm snapshot, na mesma ordem"""
+        agora = time.time()
+        itens = self._itens
+        return [self._com_metadados(*itens[acao], agora) for acao in acoes if acao in itens]
+
+    def versao_itens(self, acoes):
+        """
+        Identifica o conteúdo de listar(acoes) sem montá-lo
+
+        Muda quando alguma das ações é atualizada ou fica desatualizada; usada
+        como versão das respostas HTTP pré-serializadas.
+        """
+        agora = time.time()
+        itens = self._itens
+        return tuple((acao, itens[acao][1], agora > itens[acao][2]) for acao in acoes if acao in itens)
+
+    def completo(self, acoes=None):
+        """(id do último evento, resumos) lidos de forma consistente entre si"""
+        with self._lock:
+            agora = time.time()
+            acoes = self._itens if acoes is None else [acao for acao in acoes if acao in self._itens]
+            return self._ultimo_evento, [self._com_metadados(*self._itens[acao], agora) for acao in acoes]
+
+    def _eventos_desde(self, ultimo_id):
+        if ultimo_id > self._ultimo_evento:
+            return None  # id de outro processo ou de antes de um reinício
+        if ultimo_id == self._ultimo_evento:
+            return []
+        if not self._eventos or self._eventos[0][0] > ultimo_id + 1:
+            return None  # eventos já descartados do histórico
+        return [evento for evento in self._eventos if evento[0] > ultimo_id]
+
+    def eventos_desde(self, ultimo_id):
+        """
+        Deltas posteriores ao id informado
+
+        Returns:
+            Lista de (id, delta), ou None se não for possível retomar a partir
+            desse id (o cliente deve receber o snapshot completo)
+        """
+        with self._lock:
+            return self._eventos_desde(ultimo_id)
+
+    def aguardar_eventos(self, ultimo_id, timeout):
+        """Como eventos_desde, mas espera até timeout segundos por novos eventos"""
+        with self._novos_eventos:
+            self._novos_eventos.wait_for(lambda: self._ultimo_evento != ultimo_id, timeout)
+            return self._eventos_desde(ultimo_id)
+
+    def frescor(self, agora=None):
+        """{ação: (segundos desde a atualização, desatualizado, data da última barra)}"""
+        agora = time.time() if agora is None else agora
+        return {acao: (agora - momento, agora > vencimento, resumo['date'])
+                for acao, (resumo, momento, vencimento) in list(self._itens.items())}
+
+    def exportar(self):
+        """Cópia consistente do estado, para publicação aos workers (snapshot_compartilhado)"""
+        with self._lock:
+            return {
+                'versao': self.versao,
+                'atualizado_em': self.atualizado_em,
+                'vence_em': self.vence_em,
+                'ultimo_erro': self.ultimo_erro,
+                'ultimo_evento': self._ultimo_evento,
+                'itens': dict(self._itens),
+                'eventos': list(self._eventos),
+                'triagem': self._triagem,
+                'sob_demanda': self.sob_demanda.exportar(),
+            }
+
+    def metadados(self):
+        agora = time.time()
+        return {
+            'version': self.versao,
+            'updated_at': (datetime.fromtimestamp(self.atualizado_em).strftime('%Y-%m-%d %H:%M:%S')
+                           if self.atualizado_em else None),
+            'age_seconds': round(agora - self.atualizado_em, 1) if self.atualizado_em else None,
+            'stale': self.vence_em is None or agora > self.vence_em,
+            'error': self.ultimo_erro,
+        }
+
+class ResumosSobDemanda:
+    """
+    Resumos de ações fora das monitoradas, calculados sob demanda
+
+    Ficam fora do snapshot (sem eventos de streaming; aos workers vão como
+    documento) e em quantidade limitada: acima de maximo, sai a ação
+    consultada há mais tempo. O vencimento segue a mesma regra do snapshot.
+    """
+
+    def __init__(self, maximo=SOB_DEMANDA_MAXIMO, ttl=SNAPSHOT_TTL, agendador=None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.agendador = agendador
+        self._itens = OrderedDict()  # {ação: (resumo, momento, vencimento)}, da menos para a mais recente
+        self._lock = threading.Lock()
+
+    def atualizar(self, itens, momento=None):
+        momento = time.time() if momento is None else momento
+        vencimento = calcular_vencimento(momento, self.ttl, self.agendador)
+        with self._lock:
+            for acao, resumo in itens.items():
+                self._itens[acao] = (resumo, momento, vencimento)
+                self._itens.move_to_end(acao)
+            while len(self._itens) > self.maximo:
+                self._itens.popitem(last=False)
+
+    def obter(self, acao):
+        """Resumo da ação com metadados (como ArmazemSnapshot.obter), ou None"""
+        with self._lock:
+            item = self._itens.get(acao)
+            if item is None:
+                return None
+            self._itens.move_to_end(acao)
+        return com_metadados(*item, time.time())
+
+    def exportar(self):
+        with self._lock:
+            return dict(self._itens)
+
+    def __len__(self):
+        return len(self._itens)
+
+class FilaSobDemanda:
+    """
+    Ações fora das monitoradas pedidas pelo servidor, à espera do atualizador
+
+    Pedidos repetidos da mesma ação se juntam em um. Com diretorio, cada
+    pedido é um arquivo vazio com o nome da ação: os workers do modo de
+    produção pedem e o produtor atende (ver snapshot_compartilhado).
+    """
+
+    def __init__(self, diretorio=None, intervalo=SNAPSHOT_SINCRONIZACAO):
+        self.diretorio = diretorio
+        self.intervalo = intervalo
+        self._acoes = set()
+        self._novo_pedido = threading.Condition()
+
+    def pedir(self, acao):
+        if self.diretorio is None:
+            with self._novo_pedido:
+                self._acoes.add(acao)
+                self._novo_pedido.notify_all()
+            return
+        if os.sep in acao or acao.startswith('.'):
+            raise ValueError(f"Código de ação inválido: {acao}")
+        os.makedirs(self.diretorio, exist_ok=True)
+        open(os.path.join(self.diretorio, acao), 'a').close()
+
+    def _pendentes(self):
+        if self.diretorio is None:
+            acoes, self._acoes = self._acoes, set()
+            return sorted(acoes)
+        try:
+            nomes = sorted(nome for nome in os.listdir(self.diretorio) if not nome.startswith('.'))
+        except FileNotFoundError:
+            return []
+        for nome in nomes:
+            try:
+                os.remove(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                pass  # já retirado
+        return nomes
+
+    def retirar(self, timeout):
+        """Ações pedidas desde a última retirada, esperando até timeout segundos por algum pedido"""
+        if self.diretorio is None:
+            with self._novo_pedido:
+                self._novo_pedido.wait_for(lambda: self._acoes, timeout)
+                return self._pendentes()
+        limite = time.monotonic() + timeout
+        while True:
+            acoes = self._pendentes()
+            if acoes or time.monotonic() >= limite:
+                return acoes
+            time.sleep(min(self.intervalo, max(limite - time.monotonic(), 0)))
+
+class Atualizador(threading.Thread):
+    """
+    Thread que reconstrói o snapshot das ações
+
+    Constrói o snapshot na partida e depois segue o agendador: após cada
+    barra durante o pregão e uma consolidação após o fechamento. Com
+    triagem, uma segunda thread refaz a triagem do universo no agendador
+    dela (INTERVALO_TRIAGEM), e outra calcula as ações pedidas fora das
+    monitoradas (armazem.pedidos). Se informado, publicar(armazem) é
+    chamado depois de cada atualização, com ou sem erro.
+    """
+
+    def __init__(self, armazem, acoes, mercado_aberto, agendador=None, publicar=None, triagem=TRIAGEM_SERVIDOR):
+        super().__init__(name='atualizador-snapshot', daemon=True)
+        self.armazem = armazem
+        self.acoes = list(acoes)
+        self.mercado_aberto = mercado_aberto
+        self.agendador = agendador or armazem.agendador or Agendador(SNAPSHOT_INTERVALO)
+        self.agendador_triagem = Agendador(INTERVALO_TRIAGEM) if triagem else None
+        self.publicar = publicar
+        self._parar = threading.Event()
+        self._lock_publicar = threading.Lock()
+
+    def _publicar(self):
+        # As threads do atualizador publicam o mesmo arquivo: uma de cada vez
+        if self.publicar is not None:
+            with self._lock_publicar:
+                self.publicar(self.armazem)
+
+    def atualizar_agora(self):
+        try:
+            inicio = time.perf_counter()
+            itens = construir_snapshot(self.acoes, self.mercado_aberto())
+            self.armazem.atualizar(itens)
+            logger.info("Snapshot atualizado: %d ações em %.2fs", len(itens), time.perf_counter() - inicio)
+        except Exception as e:
+            logger.error("Erro ao atualizar snapshot: %s", e, exc_info=True)
+            self.armazem.registrar_erro(e)
+        self._publicar()
+
+    def atualizar_triagem(self):
+        try:
+            inicio = time.perf_counter()
+            resultado = triar(resultados=None)
+            self.armazem.atualizar_triagem(resultado, self.agendador_triagem.proximo()[0].timestamp())
+            logger.info("Triagem atualizada: %d ações no ranking em %.2fs", len(resultado['ranking']),
+                        time.perf_counter() - inicio)
+        except Exception as e:
+            logger.error("Erro na triagem: %s", e, exc_info=True)
+        self._publicar()
+
+    def atender_pedidos(self, timeout=1.0):
+        """Calcula as ações fora das monitoradas pedidas até timeout segundos"""
+        acoes = self.armazem.pedidos.retirar(timeout)
+        if not acoes:
+            return
+        try:
+            itens = construir_snapshot(acoes, self.mercado_aberto(), sob_demanda=True)
+            self.armazem.sob_demanda.atualizar(itens)
+            logger.info("Ações sob demanda calculadas: %d de %d pedidas", len(itens), len(acoes))
+        except Exception as e:
+            logger.error("Erro ao calcular ações sob demanda (%s): %s", ', '.join(acoes), e, exc_info=True)
+        self._publicar()
+
+    def _executar_pedidos(self):
+        while not self._parar.is_set():
+            self.atender_pedidos()
+
+    def _executar_triagem(self):
+        self.atualizar_triagem()
+        self.agendador_triagem.executar(lambda tipo: self.atualizar_triagem(), self._parar)
+
+    def run(self):
+        threading.Thread(target=self._executar_pedidos, name='atualizador-sob-demanda', daemon=True).start()
+        if self.agendador_triagem is not None:
+            threading.Thread(target=self._executar_triagem, name='atualizador-triagem', daemon=True).start()
+        self.atualizar_agora()
+        self.agendador.executar(lambda tipo: self.atualizar_agora(), self._parar)
+
+    def parar(self):
+        self._parar.set()
+
+armazem = None  # definido por configurar, na partida do servidor ou do produtor
+
+def configurar(caminho=None):
+    """
+    Define o armazém do processo
+
+    Sem caminho, o snapshot é calculado no próprio processo (atualizador em
+    segundo plano). Com caminho, é lido do arquivo publicado pelo produtor
+    (modo de produção, ver snapshot_compartilhado). Chamado na partida do
+    servidor (ou antes, por quem cria os workers) e do produtor.
+    """
+    global armazem
+    if caminho is None:
+        armazem = ArmazemSnapshot(agendador=Agendador(SNAPSHOT_INTERVALO))
+    else:
+        from trade_bot.src.web.snapshot_compartilhado import ArmazemCompartilhado
+        armazem = ArmazemCompartilhado(caminho, agendador=Agendador(SNAPSHOT_INTERVALO))
+    return armazem
+
+@registro.ao_coletar
+def _metricas_frescor():
+    if armazem is None:
+        return
+    frescor = armazem.frescor()
+    IDADE.substituir({(acao,): round(idade, 3) for acao, (idade, _, _) in frescor.items()})
+    DESATUALIZADO.substituir({(acao,): int(stale) for acao, (_, stale, _) in frescor.items()})
+    ULTIMA_BARRA.substituir({(acao,): datetime.strptime(data, '%Y-%m-%d %H:%M:%S').timestamp()
+                             for acao, (_, _, data) in frescor.items()})
+
+_atualizador = None
+_lock_atualizador = threading.Lock()
+
+def iniciar_atualizador(acoes, mercado_aberto, agendador=None):
+    """Inicia a thread de atualização uma única vez por processo (no modo compartilhado, quem atualiza é o produtor)"""
+    global _atualizador
+    if armazem.compartilhado:
+        return None
+    with _lock_atualizador:
+        if _atualizador is None or not _atualizador.is_alive():
+            _atualizador = Atualizador(armazem, acoes, mercado_aberto, agendador)
+            _atualizador.start()
+    return _atualizador
@@ -0,0 +1,310 @@
+"""
+Snapshot compartilhado entre processos (modo de produção do servidor).
+
+Um único produtor calcula o snapshot pelo agendador, como o atualizador do
+servidor de processo único, e a cada atualização o publica em um arquivo:
+escreve um arquivo temporário e o troca pelo anterior com os.replace, de
+modo que um leitor nunca vê uma publicação pela metade. Os workers do
+servidor mapeiam o arquivo em memória (mmap) e só leem: a carga na fonte de
+dados e o cálculo dos indicadores não dependem do número de workers.
+
+Formato: cabeçalho (mágico + tamanho do índice), índice JSON e os blocos de
+dados (um JSON por ação, os eventos de streaming e documentos extras, como
+a triagem do universo, as ações sob demanda e as métricas do produtor). O índice guarda a posição de cada bloco e os
+metadados de cada ação (momento da atualização e vencimento), de modo que
+conferir versões não exige decodificar os resumos.
+
+Ações fora das monitoradas são pedidas pelos workers em um diretório ao lado
+do arquivo (um arquivo vazio por ação, ver FilaSobDemanda); o produtor as
+calcula e as publica no documento 'sob_demanda'.
+
+Uso (produtor avulso, ao lado de workers do gunicorn):
+    python -m trade_bot.src.web.snapshot_compartilhado [--arquivo snapshot.bin]
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Mapping, Sequence
+
+from trade_bot.config import ACOES, ARQUIVO_SNAPSHOT, LOG_NIVEL, SNAPSHOT_SINCRONIZACAO
+from trade_bot.src.calendario import mercado_aberto
+from trade_bot.src.metricas import registro
+from trade_bot.src.web import snapshot
+from trade_bot.src.web.snapshot import ArmazemSnapshot, Atualizador, FilaSobDemanda, com_metadados
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b'TBSNAP01'
+CABECALHO = struct.Struct('<8sQ')  # mágico, tamanho do índice em bytes
+
+def _json(valor):
+    return json.dumps(valor, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def diretorio_pedidos(caminho):
+    """Diretório onde os workers pedem ações sob demanda ao produtor do arquivo caminho"""
+    return f'{caminho}.pedidos'
+
+def publicar(armazem, caminho=ARQUIVO_SNAPSHOT, documentos=None):
+    """
+    Grava o estado do armazém em caminho, trocando o arquivo anterior de forma atômica
+
+    Args:
+        armazem: ArmazemSnapshot do produtor
+        documentos: {nome: texto} publicados junto (lidos com ArmazemCompartilhado.documento)
+    """
+    estado = armazem.exportar()
+    documentos = dict(documentos or {})
+    if estado['triagem'] is not None:
+        documentos['triagem'] = _json(estado['triagem']).decode('utf-8')
+    if estado['sob_demanda']:
+        documentos['sob_demanda'] = _json(estado['sob_demanda']).decode('utf-8')
+    blocos, tamanho_blocos = [], 0
+
+    def anexar(dados):
+        nonlocal tamanho_blocos
+        blocos.append(dados)
+        tamanho_blocos += len(dados)
+        return [tamanho_blocos - len(dados), len(dados)]
+
+    indice = _json({
+        'versao': estado['versao'],
+        'atualizado_em': estado['atualizado_em'],
+        'vence_em': estado['vence_em'],
+        'ultimo_erro': estado['ultimo_erro'],
+        'ultimo_evento': estado['ultimo_evento'],
+        'itens': {acao: [*anexar(_json(resumo)), momento, vencimento]
+                  for acao, (resumo, momento, vencimento) in estado['itens'].items()},
+        'eventos': anexar(_json(estado['eventos'])),
+        'documentos': {nome: anexar(texto.encode('utf-8')) for nome, texto in documentos.items()},
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    temporario = f'{caminho}.tmp'  # um único produtor por arquivo
+    with open(temporario, 'wb') as arquivo:
+        arquivo.write(CABECALHO.pack(MAGICO, len(indice)))
+        arquivo.write(indice)
+        arquivo.writelines(blocos)
+    os.replace(temporario, caminho)
+
+class _Itens(Mapping):
+    """{ação: (resumo, momento, vencimento)} sobre o arquivo mapeado; cada resumo é decodificado na primeira leitura"""
+
+    def __init__(self, mapa, base, indice):
+        self._mapa = mapa
+        self._base = base
+        self._indice = indice
+        self._decodificados = {}
+
+    def __getitem__(self, acao):
+        item = self._decodificados.get(acao)
+        if item is None:
+            inicio, tamanho, momento, vencimento = self._indice[acao]
+            inicio += self._base
+            item = self._decodificados[acao] = (json.loads(self._mapa[inicio:inicio + tamanho]), momento, vencimento)
+        return item
+
+    def __contains__(self, acao):
+        return acao in self._indice
+
+    def __iter__(self):
+        return iter(self._indice)
+
+    def __len__(self):
+        return len(self._indice)
+
+class _Eventos(Sequence):
+    """Eventos (id, delta) publicados, decodificados só quando um cliente de streaming precisa retomar"""
+
+    def __init__(self, mapa, base, posicao):
+        self._mapa = mapa
+        self._inicio = base + posicao[0]
+        self._fim = self._inicio + posicao[1]
+        self._eventos = None
+
+    def _lista(self):
+        if self._eventos is None:
+            self._eventos = [tuple(evento) for evento in json.loads(self._mapa[self._inicio:self._fim])]
+        return self._eventos
+
+    def __getitem__(self, posicao):
+        return self._lista()[posicao]
+
+    def __len__(self):
+        return len(self._lista())
+
+class ArmazemCompartilhado(ArmazemSnapshot):
+    """
+    Snapshot publicado pelo produtor, lido de um arquivo mapeado em memória
+
+    Cada leitura confere (stat) se há uma publicação nova e, nesse caso,
+    remapeia o arquivo e decodifica apenas o índice. Os resumos ficam nas
+    páginas do arquivo, compartilhadas pelos workers no cache de páginas do
+    sistema, e cada um é decodificado uma vez por versão, quando lido. Um
+    mapeamento antigo continua válido para quem ainda o está lendo.
+    """
+
+    compartilhado = True
+
+    def __init__(self, caminho=ARQUIVO_SNAPSHOT, intervalo=SNAPSHOT_SINCRONIZACAO, **kwargs):
+        super().__init__(**kwargs)
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self._identidade = None
+        self._itens = _Itens(None, 0, {})
+        self._documentos = {}
+        self._triagem_lida = (None, None)  # (identidade do arquivo, triagem decodificada)
+        self._sob_demanda_lida = (None, {})  # (identidade do arquivo, {ação: [resumo, momento, vencimento]})
+        self.pedidos = FilaSobDemanda(diretorio_pedidos(caminho))
+        self._lock_mapa = threading.Lock()
+
+    def _sincronizar(self):
+        """Remapeia o arquivo se houver publicação nova; False enquanto o produtor não publicar"""
+        try:
+            estado = os.stat(self.caminho)
+        except FileNotFoundError:
+            return False
+        if (estado.st_ino, estado.st_mtime_ns, estado.st_size) == self._identidade:
+            return True
+        with self._lock_mapa:
+            try:
+                arquivo = open(self.caminho, 'rb')
+            except FileNotFoundError:
+                return False
+            with arquivo:
+                # O arquivo pode ter sido trocado depois do stat: vale a identidade do que foi aberto
+                estado = os.fstat(arquivo.fileno())
+                identidade = (estado.st_ino, estado.st_mtime_ns, estado.st_size)
+                if identidade == self._identidade:
+                    return True
+                mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+            magico, tamanho = CABECALHO.unpack_from(mapa)
+            if magico != MAGICO:
+                raise ValueError(f"{self.caminho} não é um snapshot publicado pelo trade_bot")
+            indice = json.loads(mapa[CABECALHO.size:CABECALHO.size + tamanho])
+            base = CABECALHO.size + tamanho
+            with self._lock:
+                self._itens = _Itens(mapa, base, indice['itens'])
+                self._eventos = _Eventos(mapa, base, indice['eventos'])
+                self._documentos = {nome: (mapa, base + inicio, tamanho)
+                                    for nome, (inicio, tamanho) in indice['documentos'].items()}
+                self._ultimo_evento = indice['ultimo_evento']
+                self.versao = indice['versao']
+                self.atualizado_em = indice['atualizado_em']
+                self.vence_em = indice['vence_em']
+                self.ultimo_erro = indice['ultimo_erro']
+                self._identidade = identidade
+                self._novos_eventos.notify_all()
+        return True
+
+    def atualizar(self, itens, momento=None):
+        raise TypeError("O snapshot compartilhado é somente leitura: quem o atualiza é o produtor")
+
+    def aguardar(self, timeout=None):
+        """Espera a primeira publicação do produtor (retorna False se o tempo esgotar)"""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while not self._sincronizar():
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(self.intervalo)
+        return True
+
+    def obter(self, acao):
+        self._sincronizar()
+        return super().obter(acao)
+
+    def listar(self, acoes):
+        self._sincronizar()
+        return super().listar(acoes)
+
+    def versao_itens(self, acoes):
+        self._sincronizar()
+        return super().versao_itens(acoes)
+
+    def completo(self, acoes=None):
+        self._sincronizar()
+        return super().completo(acoes)
+
+    def eventos_desde(self, ultimo_id):
+        self._sincronizar()
+        return super().eventos_desde(ultimo_id)
+
+    def aguardar_eventos(self, ultimo_id, timeout):
+        """Como eventos_desde, mas confere o arquivo a cada intervalo até timeout segundos"""
+        limite = time.monotonic() + timeout
+        self._sincronizar()
+        while self._ultimo_evento == ultimo_id and time.monotonic() < limite:
+            time.sleep(min(self.intervalo, max(limite - time.monotonic(), 0)))
+            self._sincronizar()
+        return super().eventos_desde(ultimo_id)
+
+    def frescor(self, agora=None):
+        self._sincronizar()
+        return super().frescor(agora)
+
+    def metadados(self):
+        self._sincronizar()
+        return super().metadados()
+
+    def triagem(self):
+        """Triagem publicada pelo produtor, decodificada uma vez por publicação"""
+        self._sincronizar()
+        identidade = self._identidade
+        if self._triagem_lida[0] != identidade:
+            texto = self.documento('triagem')
+            self._triagem_lida = (identidade, tuple(json.loads(texto)) if texto else None)
+        return self._triagem_lida[1]
+
+    def obter_sob_demanda(self, acao):
+        """Resumo de uma ação fora das monitoradas publicado pelo produtor, ou None"""
+        self._sincronizar()
+        identidade = self._identidade
+        if self._sob_demanda_lida[0] != identidade:
+            texto = self.documento('sob_demanda')
+            self._sob_demanda_lida = (identidade, json.loads(texto) if texto else {})
+        item = self._sob_demanda_lida[1].get(acao)
+        return None if item is None else com_metadados(*item, time.time())
+
+    def documento(self, nome):
+        """Texto publicado junto com o snapshot (ex.: 'metricas'), ou None"""
+        self._sincronizar()
+        posicao = self._documentos.get(nome)
+        if posicao is None:
+            return None
+        mapa, inicio, tamanho = posicao
+        return mapa[inicio:inicio + tamanho].decode('utf-8')
+
+def produzir(caminho=ARQUIVO_SNAPSHOT, acoes=ACOES):
+    """
+    Calcula o snapshot pelo agendador e o publica em caminho a cada atualização (bloqueia)
+
+    As métricas do produtor (etapas do pipeline, coleta) são publicadas
+    junto, para o /metrics dos workers.
+    """
+    armazem = snapshot.configurar()
+    armazem.pedidos = FilaSobDemanda(diretorio_pedidos(caminho))
+
+    def publicar_estado(armazem):
+        try:
+            publicar(armazem, caminho, {'metricas': registro.exportar()})
+        except Exception as e:
+            logger.error("Erro ao publicar o snapshot em %s: %s", caminho, e, exc_info=True)
+
+    logger.info("Produtor do snapshot: %d ações, publicadas em %s", len(acoes), caminho)
+    Atualizador(armazem, acoes, mercado_aberto, publicar=publicar_estado).run()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Produtor do snapshot compartilhado pelos workers do servidor')
+    parser.add_argument('--arquivo', default=ARQUIVO_SNAPSHOT, help='Arquivo publicado (padrão: TRADE_BOT_SNAPSHOT)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=LOG_NIVEL, format='%(levelname)s %(name)s: %(message)s')
+    try:
+        produzir(args.arquivo)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,7 @@
 // Configurações
-const UPDATE_INTERVAL = 5 * 60 * 1000; // 5 minutos em milissegundos
+const UPDATE_INTERVAL = 5 * 60 * 1000; // 5 minutos em milissegundos (apenas sem suporte a streaming)
 const API_BASE_URL = window.location.origin;
+const STREAM_URL = `${API_BASE_URL}/api/stream`;
 
 // Cache para armazenar os dados das ações
 let acoesCache = new Map();
@@ -45,9 +46,14 @@ const formatarTempoRestante = (ms) => {
 // Função para atualizar o contador
 function atualizarContador() {
     const tempoRestante = proximaAtualizacao - Date.now();
+    definirStatus(formatarTempoRestante(tempoRestante));
+}
+
+// Função para exibir o estado das atualizações na barra de navegação
+function definirStatus(texto) {
     const contadorEl = document.getElementById('contador-atualizacao');
     if (contadorEl) {
-        contadorEl.textContent = formatarTempoRestante(tempoRestante);
+        contadorEl.textContent = texto;
     }
 }
 
@@ -159,33 +165,66 @@ async function abrirModalDetalhes(acao) {
     modal.show();
 }
 
-// Função principal para inicializar a aplicação
-async function inicializarApp() {
+// Função para criar ou atualizar o card de uma ação
+function aplicarDadosAcao(dadosAcao) {
     const container = document.querySelector('.acoes-container');
-    
-    // Carregar dados iniciais
-    const dados = await buscarTodasAcoes();
-    
-    // Criar cards para cada ação
-    dados.forEach(dadosAcao => {
-        const card = criarCardAcao(dadosAcao.symbol, dadosAcao);
-        container.appendChild(card);
-        acoesCache.set(dadosAcao.symbol, dadosAcao);
+    const botao = container.querySelector(`[data-acao="${dadosAcao.symbol}"]`);
+    if (botao) {
+        atualizarCardAcao(botao.closest('.card-wrapper'), dadosAcao);
+    } else {
+        container.appendChild(criarCardAcao(dadosAcao.symbol, dadosAcao));
+    }
+    acoesCache.set(dadosAcao.symbol, dadosAcao);
+}
+
+// Função para receber as atualizações por streaming (Server-Sent Events)
+function conectarStream() {
+    const fonte = new EventSource(STREAM_URL);
+
+    // Snapshot completo: na conexão ou quando não é possível retomar
+    fonte.addEventListener('snapshot', (evento) => {
+        JSON.parse(evento.data).forEach(aplicarDadosAcao);
+        definirStatus('ao vivo');
     });
-    
-    // Configurar atualização automática
+
+    // Apenas os campos alterados de uma ação
+    fonte.addEventListener('delta', (evento) => {
+        const delta = JSON.parse(evento.data);
+        aplicarDadosAcao({ ...(acoesCache.get(delta.symbol) || {}), ...delta });
+    });
+
+    fonte.addEventListener('heartbeat', (evento) => {
+        const meta = JSON.parse(evento.data);
+        definirStatus(meta.stale ? 'desatualizado' : 'ao vivo');
+    });
+
+    // O EventSource reconecta sozinho, enviando o Last-Event-ID
+    fonte.onerror = () => definirStatus('reconectando...');
+    fonte.onopen = () => definirStatus('ao vivo');
+}
+
+// Função para atualizar periodicamente (navegadores sem EventSource)
+async function iniciarAtualizacaoPeriodica() {
+    const dados = await buscarTodasAcoes();
+    dados.forEach(aplicarDadosAcao);
+
     setInterval(async () => {
         const novosDados = await buscarTodasAcoes();
-        novosDados.forEach(dadosAcao => {
-            const card = document.querySelector(`[data-acao="${dadosAcao.symbol}"]`).closest('.card-wrapper');
-            atualizarCardAcao(card, dadosAcao);
-            acoesCache.set(dadosAcao.symbol, dadosAcao);
-        });
+        novosDados.forEach(aplicarDadosAcao);
     }, UPDATE_INTERVAL);
-    
+
     // Iniciar o contador regressivo
     setInterval(atualizarContador, 1000);
 }
 
+// Função principal para inicializar a aplicação
+function inicializarApp() {
+    if (window.EventSource) {
+        conectarStream();
+    } else {
+        iniciarAtualizacaoPeriodica();
+    }
+}
+
 // Inicializar quando o DOM estiver pronto
 document.addEventListener('DOMContentLoaded', inicializarApp);